@@ -0,0 +1,34 @@
+"""add service_state
+
+Revision ID: 3c9a1e7d2b64
+Revises: b7e31c9d5f40
+Create Date: 2026-10-17 19:05:12.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1e7d2b64'
+down_revision: Union[str, Sequence[str], None] = 'b7e31c9d5f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'service_state',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('service_state')
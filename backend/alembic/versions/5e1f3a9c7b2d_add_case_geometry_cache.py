@@ -0,0 +1,41 @@
+"""add case_geometry_cache
+
+Revision ID: 5e1f3a9c7b2d
+Revises: 0c02b898183a
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1f3a9c7b2d'
+down_revision: Union[str, Sequence[str], None] = '0c02b898183a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'case_geometry_cache',
+        sa.Column('caseid', sa.String(length=32), nullable=False),
+        sa.Column('xystring', sa.Text(), nullable=True),
+        sa.Column('geometry', sa.JSON(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_attempt_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('failure_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_retry_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint('caseid'),
+    )
+    op.create_index(op.f('ix_case_geometry_cache_next_retry_at'), 'case_geometry_cache', ['next_retry_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_case_geometry_cache_next_retry_at'), table_name='case_geometry_cache')
+    op.drop_table('case_geometry_cache')
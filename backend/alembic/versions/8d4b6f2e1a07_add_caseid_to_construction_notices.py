@@ -0,0 +1,53 @@
+"""add caseid to construction_notices
+
+Revision ID: 8d4b6f2e1a07
+Revises: 5e1f3a9c7b2d
+Create Date: 2026-10-17 14:03:27.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b6f2e1a07'
+down_revision: Union[str, Sequence[str], None] = '5e1f3a9c7b2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('construction_notices', sa.Column('caseid', sa.String(length=32), nullable=True))
+
+    # Backfill from the detail URL (...ShowPWorkData.aspx?caseid=11200814)
+    op.execute(
+        "UPDATE construction_notices "
+        "SET caseid = substring(url from 'caseid=([0-9]+)') "
+        "WHERE url IS NOT NULL"
+    )
+
+    # Drop duplicates before the unique index: keep one row per caseid,
+    # preferring a row that already has geometry, then the oldest
+    op.execute(
+        "DELETE FROM construction_notices WHERE id IN ("
+        "  SELECT id FROM ("
+        "    SELECT id, row_number() OVER ("
+        "      PARTITION BY caseid"
+        "      ORDER BY (geometry IS NULL OR geometry::text IN ('null', '{}')), id"
+        "    ) AS rn"
+        "    FROM construction_notices"
+        "    WHERE caseid IS NOT NULL"
+        "  ) ranked WHERE rn > 1"
+        ")"
+    )
+
+    op.create_index(op.f('ix_construction_notices_caseid'), 'construction_notices', ['caseid'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_construction_notices_caseid'), table_name='construction_notices')
+    op.drop_column('construction_notices', 'caseid')
@@ -0,0 +1,36 @@
+"""add construction_changes
+
+Revision ID: 9f2d4b8a6c13
+Revises: 3c9a1e7d2b64
+Create Date: 2026-10-17 20:14:37.865210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f2d4b8a6c13'
+down_revision: Union[str, Sequence[str], None] = '3c9a1e7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'construction_changes',
+        sa.Column('generation', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('added', sa.JSON(), nullable=False),
+        sa.Column('changed', sa.JSON(), nullable=False),
+        sa.Column('removed', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('generation'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('construction_changes')
@@ -0,0 +1,38 @@
+"""add favorite_construction_matches
+
+Revision ID: b7e31c9d5f40
+Revises: 8d4b6f2e1a07
+Create Date: 2026-10-17 16:41:08.527730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e31c9d5f40'
+down_revision: Union[str, Sequence[str], None] = '8d4b6f2e1a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'favorite_construction_matches',
+        sa.Column('favorite_id', sa.Integer(), nullable=False),
+        sa.Column('notice_id', sa.Integer(), nullable=False),
+        sa.Column('distance_m', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['favorite_id'], ['favorites.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['notice_id'], ['construction_notices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('favorite_id', 'notice_id'),
+    )
+    op.create_index(op.f('ix_favorite_construction_matches_notice_id'), 'favorite_construction_matches', ['notice_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_favorite_construction_matches_notice_id'), table_name='favorite_construction_matches')
+    op.drop_table('favorite_construction_matches')
@@ -10,6 +10,34 @@ class Settings(BaseSettings):
     # Path to store construction.geojson file
     # Default: /app/data/construction.geojson (inside container)
     CONSTRUCTION_GEOJSON_PATH: str = str(Path("/app/data/construction.geojson"))
+    # Age (seconds) after which /readyz reports construction data as stale
+    # Default: 36 hours, i.e. one missed daily update
+    CONSTRUCTION_STALE_AFTER_SECONDS: int = 36 * 60 * 60
+    # Number of concurrent HTTP sessions used to fetch PWorkData.aspx pages
+    # Set to 1 to walk the pages sequentially
+    NOTICE_SCRAPE_CONCURRENCY: int = 4
+    # Incremental notice scraping stops after this many consecutive pages
+    # containing only already-ingested notices
+    NOTICE_INCREMENTAL_STOP_PAGES: int = 1
+    # Hours between full notice scans when the scheduled update runs incrementally
+    # Default: 7 days
+    NOTICE_FULL_SCAN_INTERVAL_HOURS: int = 7 * 24
+    # Cached caseid geometries are refetched after this many days
+    GEOMETRY_CACHE_TTL_DAYS: int = 30
+    # Failed geometry lookups are retried with exponential backoff:
+    # base delay after the first failure, doubling up to the maximum (7 days)
+    GEOMETRY_RETRY_BASE_SECONDS: int = 60 * 60
+    GEOMETRY_RETRY_MAX_SECONDS: int = 7 * 24 * 60 * 60
+    # Request budget for caseMap3.ashx geometry lookups; concurrency adapts
+    # (AIMD) between 1 and the maximum within this rate
+    GEOMETRY_FETCH_MAX_RPS: float = 20.0
+    GEOMETRY_FETCH_MAX_CONCURRENCY: int = 16
+    # Alerts are pushed when notices, favorites or connections change; this is
+    # the interval (seconds) of the safety sweep that re-checks every online user
+    NOTIFICATION_SWEEP_SECONDS: int = 5 * 60
+    # How API workers share notification events: "memory" for a single worker,
+    # "postgres" (LISTEN/NOTIFY on DATABASE_URL) to run several workers or replicas
+    NOTIFICATION_BACKPLANE: str = "memory"
 
     class Config:
         env_file = ".env"
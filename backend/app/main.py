@@ -1,18 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.triggers.interval import IntervalTrigger
 import logging
 import sys
 import asyncio
+import functools
+import time
+from datetime import datetime
 from .database import Base, engine, SessionLocal
 from .routers.api import router
-from .routers.websocket import router as websocket_router, check_and_notify_all_users
+from .routers.websocket import router as websocket_router, run_notification_engine
 from .config import settings
-from .services.construction_scraper import update_construction_geojson_file
+from .services.construction_scraper import (
+    get_construction_snapshot,
+    peek_construction_snapshot,
+    update_construction_geojson_file,
+)
 from .services.notice_contruction import update_construction_notices
+from .services import health
+from .services.leader import scheduler_leader
+from .services.http_client import upstream
 import os
 
 # Configure logging
@@ -27,6 +36,22 @@ logger = logging.getLogger(__name__)
 # Initialize scheduler
 scheduler = BackgroundScheduler()
 
+def leader_only(job):
+    """Run a scheduled job only in the worker holding the scheduler leader lock"""
+    @functools.wraps(job)
+    def run():
+        try:
+            leader = scheduler_leader.is_leader()
+        except Exception as e:
+            logger.error(f"Skipping {job.__name__}: leader election failed: {e}")
+            return
+        if not leader:
+            logger.info(f"Skipping {job.__name__}: another worker is the scheduler leader")
+            return
+        job()
+    return run
+
+@leader_only
 def scheduled_update():
     """Scheduled task to update construction.geojson file"""
     logger.info(f"Running scheduled construction data update...")
@@ -34,60 +59,57 @@ def scheduled_update():
     data_dir = os.path.dirname(settings.CONSTRUCTION_GEOJSON_PATH)
     os.makedirs(data_dir, exist_ok=True)
     
-    success = update_construction_geojson_file(settings.CONSTRUCTION_GEOJSON_PATH)
+    health.record_job_start("construction_update")
+    try:
+        success = update_construction_geojson_file(settings.CONSTRUCTION_GEOJSON_PATH)
+    except Exception as e:
+        logger.error(f"Scheduled update failed with exception: {e}", exc_info=True)
+        health.record_job_result("construction_update", False, str(e))
+        return
+    health.record_job_result("construction_update", success)
     if success:
         logger.info("Scheduled update completed successfully")
     else:
         logger.error("Scheduled update failed")
 
+@leader_only
 def scheduled_notice_update():
     """Scheduled task to update construction notices"""
     logger.info("Running scheduled construction notices update...")
+    health.record_job_start("construction_notices_update")
     db = SessionLocal()
     try:
-        result = update_construction_notices(db, max_pages=None, clear_existing=False)
+        result = update_construction_notices(db, max_pages=None, clear_existing=False, incremental=True)
         if result.get("status") == "success":
-            logger.info(f"Construction notices update completed: scraped {result.get('scraped_count', 0)}, saved {result.get('saved_count', 0)}")
+            logger.info(f"Construction notices update completed ({result.get('mode')}): scraped {result.get('scraped_count', 0)}, saved {result.get('saved_count', 0)}")
+            health.record_job_result("construction_notices_update", True)
         else:
             logger.error(f"Construction notices update failed: {result.get('message', 'Unknown error')}")
+            health.record_job_result("construction_notices_update", False, result.get("message"))
     except Exception as e:
         logger.error(f"Construction notices update failed with exception: {e}", exc_info=True)
+        health.record_job_result("construction_notices_update", False, str(e))
     finally:
         db.close()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifespan context manager for startup and shutdown events"""
-    # Startup
-    logger.info("=" * 60)
-    logger.info("Application starting up...")
-    logger.info("=" * 60)
-    
-    # Ensure data directory exists
-    data_dir = os.path.dirname(settings.CONSTRUCTION_GEOJSON_PATH)
-    os.makedirs(data_dir, exist_ok=True)
-    logger.info(f"Data directory ensured: {data_dir}")
-    
-    # Run initial update on startup (create/update file) - BLOCKING
-    # This must complete before the application accepts requests
-    logger.info("Running initial construction data update on startup...")
-    try:
-        success = update_construction_geojson_file(settings.CONSTRUCTION_GEOJSON_PATH)
-        if success:
-            logger.info("Initial construction data update completed successfully")
-        else:
-            logger.error("Initial construction data update failed (check logs above for details)")
-            logger.warning("Application will continue to start, but construction data may be unavailable")
-    except Exception as e:
-        logger.error(f"Initial update failed with exception: {e}", exc_info=True)
-        logger.warning("Application will continue to start, but construction data may be unavailable")
-    
-    # Check if construction notices exist in database, only update if empty
+def load_construction_snapshot():
+    """Startup task: load the last persisted construction data"""
+    started = time.monotonic()
+    snapshot = get_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
+    if snapshot is not None:
+        logger.info(f"Loaded last-known-good construction data ({len(snapshot.feature_bodies)} features, modified {snapshot.last_modified}) in {time.monotonic() - started:.1f}s")
+    else:
+        logger.warning("No persisted construction data yet; /readyz reports not ready until the first refresh completes")
+
+@leader_only
+def initial_notice_sync():
+    """Startup task: fill an empty notices table, otherwise backfill missing geometries"""
     logger.info("Checking construction notices in database...")
+    health.record_job_start("initial_notice_sync")
     db = SessionLocal()
     try:
         from .models import ConstructionNotice
-        from .services.notice_contruction import update_construction_notices, update_missing_geometries
+        from .services.notice_contruction import update_missing_geometries
         
         notice_count = db.query(ConstructionNotice).count()
         if notice_count == 0:
@@ -97,7 +119,8 @@ async def lifespan(app: FastAPI):
                 logger.info(f"Initial construction notices update completed: scraped {result.get('scraped_count', 0)}, saved {result.get('saved_count', 0)}")
             else:
                 logger.error(f"Initial construction notices update failed: {result.get('message', 'Unknown error')}")
-                logger.warning("Application will continue to start, but construction notices may be unavailable")
+                health.record_job_result("initial_notice_sync", False, result.get("message"))
+                return
         else:
             logger.info(f"Found {notice_count} construction notices in database. Skipping initial update.")
             
@@ -113,12 +136,27 @@ async def lifespan(app: FastAPI):
                     logger.info("所有施工通知記錄都已包含 geometry 資料")
             else:
                 logger.error(f"Geometry 更新失敗: {geometry_result.get('message', 'Unknown error')}")
-                logger.warning("Application will continue to start, but some notices may lack geometry")
+                health.record_job_result("initial_notice_sync", False, geometry_result.get("message"))
+                return
+        health.record_job_result("initial_notice_sync", True)
     except Exception as e:
         logger.error(f"Failed to check/update construction notices: {e}", exc_info=True)
-        logger.warning("Application will continue to start, but construction notices may be unavailable")
+        health.record_job_result("initial_notice_sync", False, str(e))
     finally:
         db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan context manager for startup and shutdown events"""
+    # Startup
+    logger.info("=" * 60)
+    logger.info("Application starting up...")
+    logger.info("=" * 60)
+    
+    # Ensure data directory exists
+    data_dir = os.path.dirname(settings.CONSTRUCTION_GEOJSON_PATH)
+    os.makedirs(data_dir, exist_ok=True)
+    logger.info(f"Data directory ensured: {data_dir}")
     
     # Initialize default user if not exists
     logger.info("Checking default user in database...")
@@ -191,27 +229,34 @@ async def lifespan(app: FastAPI):
     )
     logger.info(f"Scheduled construction notices update: {settings.CONSTRUCTION_UPDATE_SCHEDULE}")
     
-    # 添加定期檢查並推送通知的任務（每5秒檢查一次）
-    # 取得目前的事件迴圈，讓 WebSocket 推播在同一個 loop 中執行，避免跨執行緒存取
-    loop = asyncio.get_running_loop()
-
-    def check_and_notify_async_safe():
-        """在主事件迴圈中執行推播檢查，確保 WebSocket 操作 thread-safe"""
-        try:
-            future = asyncio.run_coroutine_threadsafe(check_and_notify_all_users(), loop)
-            future.result()
-        except Exception as e:
-            logger.error(f"Error running check_and_notify_all_users in event loop: {e}", exc_info=True)
-
-    # 使用 IntervalTrigger 每 5 秒執行一次
+    # 通知引擎在主事件迴圈中執行，WebSocket 推播不跨執行緒；
+    # 施工資料或收藏變動時才檢查，另有 NOTIFICATION_SWEEP_SECONDS 的定期全面檢查
+    notification_task = asyncio.create_task(run_notification_engine())
+    
+    # Startup loading and refreshes run once in the scheduler's worker threads
+    # instead of blocking the application from accepting traffic; /readyz
+    # reports not ready until the last persisted snapshot is loaded
+    scheduler.add_job(
+        load_construction_snapshot,
+        next_run_time=datetime.now(),
+        id="construction_snapshot_load",
+        name="Load persisted construction.geojson",
+        replace_existing=True
+    )
+    scheduler.add_job(
+        scheduled_update,
+        next_run_time=datetime.now(),
+        id="construction_update_startup",
+        name="Initial construction.geojson refresh",
+        replace_existing=True
+    )
     scheduler.add_job(
-        check_and_notify_async_safe,
-        trigger=IntervalTrigger(seconds=5),
-        id="construction_notification_check",
-        name="Check and notify construction alerts",
+        initial_notice_sync,
+        next_run_time=datetime.now(),
+        id="initial_notice_sync",
+        name="Initial construction notices sync",
         replace_existing=True
     )
-    logger.info("Scheduled construction notification check: every 5 seconds")
     
     scheduler.start()
     logger.info("=" * 60)
@@ -222,8 +267,17 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down...")
+    notification_task.cancel()
+    try:
+        await notification_task
+    except asyncio.CancelledError:
+        pass
+    logger.info("Notification engine stopped")
     scheduler.shutdown()
+    scheduler_leader.release()
     logger.info("Scheduler stopped")
+    upstream.close()
+    logger.info("Upstream HTTP client closed")
 
 app = FastAPI(
     title="Taipei Hackathon Microservice",
@@ -257,3 +311,31 @@ app.include_router(websocket_router, tags=["WebSocket"])
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Taipei Hackathon Microservice!"}
+
+@app.get("/healthz")
+def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readiness(response: Response):
+    """Readiness probe: construction data is loaded; freshness is reported separately."""
+    # Never load here: the probe must answer while the startup load is running
+    snapshot = peek_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
+    status_info = health.job_status()
+    if snapshot is None:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "not_ready", "construction": None, **status_info}
+    
+    age_seconds = max(0, int(time.time() - snapshot.mtime_ns / 1e9))
+    return {
+        "status": "ready",
+        "construction": {
+            "features": len(snapshot.feature_bodies),
+            "last_modified": snapshot.last_modified,
+            "age_seconds": age_seconds,
+            "stale": age_seconds > settings.CONSTRUCTION_STALE_AFTER_SECONDS,
+            "generation": snapshot.generation,
+        },
+        **status_info,
+    }
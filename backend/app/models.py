@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, JSON, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, JSON, Date, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -39,8 +39,20 @@ class ConstructionNotice(Base):
     unit = Column(String(200), nullable=True)  # 執行單位
     road = Column(String(500), nullable=True)  # 道路/地點
     url = Column(String(1000), nullable=True)  # 詳細資訊連結
+    caseid = Column(String(32), nullable=True, unique=True, index=True)  # dig.taipei 案件 ID（從 url 取出）
     geometry = Column(JSON, nullable=True)     # GeoJSON 格式的幾何資料（Point 點座標）
 
+class CaseGeometryCache(Base):
+    __tablename__ = "case_geometry_cache"
+    caseid = Column(String(32), primary_key=True)                # dig.taipei 案件 ID
+    xystring = Column(Text, nullable=True)                       # caseMap3.ashx 回傳的原始 XYSTRING
+    geometry = Column(JSON, nullable=True)                       # 解析後的 GeoJSON Point
+    fetched_at = Column(DateTime(timezone=True), nullable=True)  # 最近一次成功取得的時間
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0)   # 連續失敗次數，成功時歸零
+    next_retry_at = Column(DateTime(timezone=True), nullable=True, index=True)  # 失敗後下次可重試的時間
+    last_error = Column(String(500), nullable=True)
+
 class Favorite(Base):
     __tablename__ = "favorites"
     
@@ -83,4 +95,27 @@ class Favorite(Base):
     
     # 時間戳
     added_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class FavoriteConstructionMatch(Base):
+    """收藏與其通知距離內進行中施工的配對（由 services.favorite_matches 增量維護）"""
+    __tablename__ = "favorite_construction_matches"
+    favorite_id = Column(Integer, ForeignKey("favorites.id", ondelete="CASCADE"), primary_key=True)
+    notice_id = Column(Integer, ForeignKey("construction_notices.id", ondelete="CASCADE"), primary_key=True, index=True)
+    distance_m = Column(Float, nullable=False)  # 收藏到施工點的最短距離（公尺）
+
+class ServiceState(Base):
+    """各 worker 共用的服務狀態（例如上次完整爬取施工通知的時間），以 key 區分"""
+    __tablename__ = "service_state"
+    key = Column(String(100), primary_key=True)
+    value = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class ConstructionChange(Base):
+    """construction.geojson 每次更新（generation）新增、變更與移除的施工，供 /construction/geojson/changes 使用"""
+    __tablename__ = "construction_changes"
+    generation = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    added = Column(JSON, nullable=False)    # 新增的 GeoJSON features
+    changed = Column(JSON, nullable=False)  # 內容變更的 GeoJSON features
+    removed = Column(JSON, nullable=False)  # 移除的施工 key（AC_NO:SNO）
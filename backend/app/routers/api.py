@@ -1,14 +1,24 @@
+import hashlib
 import json
+import math
 import traceback
 
-from fastapi import APIRouter, Depends, Query, Response, status, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Query, Request, Response, status, HTTPException
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 from typing import Dict, Any
 from ..database import get_db
 from .. import models, schemas
 from ..config import settings
-from ..services.construction_scraper import get_construction_geojson, update_construction_geojson_file
+from ..services.construction_scraper import (
+    ConstructionSnapshot,
+    get_construction_changes,
+    get_construction_snapshot,
+    resolve_fields,
+    update_construction_geojson_file,
+)
+from ..services import favorite_matches, vector_tiles
+from .websocket import notify_favorites_changed
 import logging
 import os
 
@@ -118,13 +128,103 @@ def search_road_segments(
         "features": features,
     }
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """Parse 'minLon,minLat,maxLon,maxLat' into floats, clamped to valid lon/lat ranges."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'minLon,minLat,maxLon,maxLat'")
+    if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        raise HTTPException(status_code=400, detail="bbox values must be finite numbers")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox min values must not exceed max values")
+    clamp = lambda value, limit: min(max(value, -limit), limit)
+    return clamp(min_lon, 180.0), clamp(min_lat, 90.0), clamp(max_lon, 180.0), clamp(max_lat, 90.0)
+
+
+def _pick_encoding(accept_encoding: str | None, available) -> str | None:
+    """Choose a pre-compressed content-coding from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if coding in available and q > 0:
+            return coding
+    return None
+
+
+def _snapshot_response(
+    request: Request,
+    snapshot: ConstructionSnapshot,
+    bbox: tuple[float, float, float, float] | None = None,
+    limit: int | None = None,
+    fields: str | None = None,
+) -> Response:
+    """Serve the pre-encoded snapshot body, answering conditional requests with 304."""
+    headers = {
+        "Last-Modified": snapshot.last_modified,
+        "Cache-Control": "no-cache",
+        # Starting point for /construction/geojson/changes
+        "X-Construction-Generation": str(snapshot.generation),
+    }
+    profile, custom_fields = resolve_fields(fields) if fields else (None, None)
+
+    if bbox is None and limit is None and custom_fields is None:
+        view = snapshot.profiles[profile] if profile else snapshot
+        body, etag = view.body, view.etag
+        # Full documents are served pre-compressed; no per-request compression
+        coding = _pick_encoding(request.headers.get("accept-encoding"), view.encodings)
+        headers["Vary"] = "Accept-Encoding"
+        if coding:
+            body = view.encodings[coding]
+            etag = f'{etag[:-1]}-{coding}"'
+            headers["Content-Encoding"] = coding
+    else:
+        body = snapshot.query(bbox, limit, profile=profile, fields=custom_fields)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers["ETag"] = etag
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/construction/geojson", response_model=Dict[str, Any])
-def get_construction_data(response: Response):
+def get_construction_data(
+    request: Request,
+    response: Response,
+    bbox: str = Query(None, description="Only return features inside 'minLon,minLat,maxLon,maxLat'"),
+    limit: int = Query(None, ge=1, description="Maximum number of features to return"),
+    fields: str = Query(None, description="Property projection: a profile name (e.g. 'map') or comma-separated property names"),
+):
     """Get construction data as GeoJSON from file. If file doesn't exist, update it first."""
-    geojson = get_construction_geojson(settings.CONSTRUCTION_GEOJSON_PATH)
+    bbox_values = _parse_bbox(bbox) if bbox else None
+    snapshot = get_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
     
     # If file doesn't exist, try to update it first
-    if geojson is None:
+    if snapshot is None:
         logger.info("Construction GeoJSON file not found, attempting to update...")
         try:
             # Ensure data directory exists
@@ -135,10 +235,10 @@ def get_construction_data(response: Response):
             success = update_construction_geojson_file(settings.CONSTRUCTION_GEOJSON_PATH)
             if success:
                 # Read the newly created file
-                geojson = get_construction_geojson(settings.CONSTRUCTION_GEOJSON_PATH)
-                if geojson is not None:
+                snapshot = get_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
+                if snapshot is not None:
                     logger.info("Successfully updated and loaded construction data")
-                    return geojson
+                    return _snapshot_response(request, snapshot, bbox_values, limit, fields)
             
             # If update failed or file still doesn't exist
             response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
@@ -148,7 +248,15 @@ def get_construction_data(response: Response):
             response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
             return {"error": f"Failed to update construction data: {str(e)}"}
     
-    return geojson
+    return _snapshot_response(request, snapshot, bbox_values, limit, fields)
+
+
+@router.get("/construction/geojson/changes", response_model=Dict[str, Any])
+def get_construction_changes_feed(
+    since: int = Query(..., ge=0, description="Generation the client already has (X-Construction-Generation)"),
+):
+    """Added, changed and removed construction features since a generation, keyed by AC_NO:SNO."""
+    return get_construction_changes(since)
 
 
 @router.get("/construction/update", response_model=Dict[str, Any])
@@ -161,8 +269,8 @@ def manual_update():
         
         success = update_construction_geojson_file(settings.CONSTRUCTION_GEOJSON_PATH)
         if success:
-            geojson = get_construction_geojson(settings.CONSTRUCTION_GEOJSON_PATH)
-            feature_count = len(geojson['features']) if geojson else 0
+            snapshot = get_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
+            feature_count = len(snapshot.feature_bodies) if snapshot else 0
             return {
                 "status": "success",
                 "message": "Construction data updated successfully",
@@ -175,6 +283,29 @@ def manual_update():
         return {"status": "error", "message": str(e)}
 
 
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+def get_vector_tile(layer: str, z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """Mapbox Vector Tile for the construction snapshot or the road_segments table."""
+    if layer not in vector_tiles.LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown tile layer '{layer}'")
+    if not 0 <= z <= vector_tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    if layer == vector_tiles.CONSTRUCTION_LAYER:
+        snapshot = get_construction_snapshot(settings.CONSTRUCTION_GEOJSON_PATH)
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="Construction data not available")
+        tile = vector_tiles.render_construction_tile(snapshot, z, x, y)
+    else:
+        tile = vector_tiles.render_road_tile(db, z, x, y)
+
+    return Response(
+        content=tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": "public, max-age=300"},
+    )
+
+
 # Construction Notices endpoints
 @router.get("/construction/notices", response_model=list[schemas.ConstructionNoticeOut])
 def list_construction_notices(
@@ -191,18 +322,28 @@ def list_construction_notices(
 def update_construction_notices_endpoint(
     db: Session = Depends(get_db),
     max_pages: int = None,
-    clear_existing: bool = True
+    clear_existing: bool = True,
+    incremental: bool = False
 ):
     """手動觸發更新施工通知資料（爬取並保存）"""
     from ..services.notice_contruction import update_construction_notices
     try:
-        result = update_construction_notices(db, max_pages=max_pages, clear_existing=clear_existing)
+        result = update_construction_notices(db, max_pages=max_pages, clear_existing=clear_existing, incremental=incremental)
         return result
     except Exception as e:
         logger.error(f"Update construction notices failed: {e}", exc_info=True)
         return {"status": "error", "message": str(e)}
 
 
+@router.get("/construction/notices/caseid/{caseid}", response_model=schemas.ConstructionNoticeOut)
+def get_construction_notice_by_caseid(caseid: str, db: Session = Depends(get_db)):
+    """以 dig.taipei 案件 ID 查詢施工通知"""
+    notice = db.query(models.ConstructionNotice).filter(models.ConstructionNotice.caseid == caseid).first()
+    if not notice:
+        raise HTTPException(status_code=404, detail="Construction notice not found")
+    return notice
+
+
 # Favorite endpoints
 @router.get("/favorites", response_model=list[schemas.FavoriteOut])
 def list_favorites(
@@ -306,6 +447,8 @@ def create_favorite(
                 setattr(existing, key, value)
         db.commit()
         db.refresh(existing)
+        favorite_matches.refresh_favorite(db, existing.id)
+        notify_favorites_changed(existing.user_id)
         return existing
     
     # 創建新的收藏
@@ -314,6 +457,8 @@ def create_favorite(
         db.add(favorite)
         db.commit()
         db.refresh(favorite)
+        favorite_matches.refresh_favorite(db, favorite.id)
+        notify_favorites_changed(favorite.user_id)
         return favorite
     except Exception as e:
         db.rollback()
@@ -341,6 +486,51 @@ def get_favorite(
     return favorite
 
 
+@router.get("/favorites/{favorite_id}/constructions", response_model=list[schemas.NearbyConstructionOut])
+def list_favorite_constructions(
+    favorite_id: int,
+    user_id: int = Query(None, description="User ID (internal)"),
+    external_id: str = Query(None, description="External User ID (UUID from Flutter)"),
+    db: Session = Depends(get_db)
+):
+    """獲取收藏通知距離內進行中的施工（依距離排序）"""
+    if external_id and not user_id:
+        user = db.query(models.User).filter(models.User.external_id == external_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail=f"User with external_id {external_id} not found")
+        user_id = user.id
+    elif not user_id:
+        raise HTTPException(status_code=400, detail="Either user_id or external_id must be provided")
+    
+    favorite = (
+        db.query(models.Favorite)
+        .filter(
+            models.Favorite.id == favorite_id,
+            models.Favorite.user_id == user_id
+        )
+        .first()
+    )
+    if not favorite:
+        raise HTTPException(status_code=404, detail=f"Favorite with id {favorite_id} not found")
+    
+    snapshot = favorite_matches.sync(db)
+    rows = (
+        db.query(models.FavoriteConstructionMatch, models.ConstructionNotice)
+        .join(models.ConstructionNotice, models.ConstructionNotice.id == models.FavoriteConstructionMatch.notice_id)
+        .filter(
+            models.FavoriteConstructionMatch.favorite_id == favorite_id,
+            models.ConstructionNotice.start_date <= snapshot.day,
+            or_(models.ConstructionNotice.end_date >= snapshot.day, models.ConstructionNotice.end_date.is_(None)),
+        )
+        .order_by(models.FavoriteConstructionMatch.distance_m)
+        .all()
+    )
+    return [
+        {"favorite_id": favorite_id, "distance_meters": round(match.distance_m, 1), "notice": notice}
+        for match, notice in rows
+    ]
+
+
 @router.put("/favorites/{favorite_id}", response_model=schemas.FavoriteOut)
 def update_favorite(
     favorite_id: int,
@@ -376,6 +566,8 @@ def update_favorite(
     
     db.commit()
     db.refresh(favorite)
+    favorite_matches.refresh_favorite(db, favorite.id)
+    notify_favorites_changed(favorite.user_id)
     return favorite
 
 
@@ -409,4 +601,6 @@ def delete_favorite(
     
     db.delete(favorite)
     db.commit()
+    favorite_matches.refresh_favorite(db, favorite_id)
+    notify_favorites_changed(user_id)
     return {"status": "success", "message": "Favorite deleted"}
\ No newline at end of file
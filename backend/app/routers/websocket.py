@@ -1,13 +1,14 @@
+import asyncio
 import json
 import logging
-import math
-from typing import Dict, Set
-from datetime import datetime, date
+from typing import Dict, Optional, Set
+from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException
-from sqlalchemy.orm import Session
 from sqlalchemy import or_
+from ..config import settings
 from ..database import SessionLocal
 from .. import models
+from ..services import backplane, construction_index, favorite_matches
 
 logger = logging.getLogger(__name__)
 
@@ -16,139 +17,11 @@ router = APIRouter()
 # 儲存活躍的 WebSocket 連接
 # key: external_id, value: WebSocket
 active_connections: Dict[str, WebSocket] = {}
-
-
-def haversine_distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """計算兩點之間的距離（米）使用 Haversine 公式"""
-    R = 6371000  # 地球半徑（米）
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
-
-def get_favorite_coordinates(favorite: models.Favorite) -> list[tuple[float, float]]:
-    """從收藏中提取座標點列表"""
-    coordinates = []
-    
-    if favorite.type == 'place':
-        # 地點類型：使用 lat/lon
-        if favorite.lat is not None and favorite.lon is not None:
-            coordinates.append((favorite.lat, favorite.lon))
-    elif favorite.type == 'road':
-        # 道路類型：需要從 road_osmids 查詢道路段座標
-        # 這裡簡化處理，如果有 lat/lon 就使用
-        if favorite.lat is not None and favorite.lon is not None:
-            coordinates.append((favorite.lat, favorite.lon))
-        # TODO: 可以從 road_osmids 查詢道路段的所有座標點
-    elif favorite.type == 'route':
-        # 路線類型：使用起點和終點
-        if favorite.route_start_coords:
-            coords = favorite.route_start_coords
-            if isinstance(coords, dict) and 'lat' in coords and 'lon' in coords:
-                coordinates.append((coords['lat'], coords['lon']))
-        if favorite.route_end_coords:
-            coords = favorite.route_end_coords
-            if isinstance(coords, dict) and 'lat' in coords and 'lon' in coords:
-                coordinates.append((coords['lat'], coords['lon']))
-        # TODO: 可以從 route_feature_collection 提取路線上的所有點
-    
-    return coordinates
-
-
-def check_construction_near_favorites(user_id: int, db: Session) -> list[dict]:
-    """檢查用戶收藏地點附近的施工情況"""
-    # 獲取用戶所有啟用了通知的收藏
-    favorites = (
-        db.query(models.Favorite)
-        .filter(
-            models.Favorite.user_id == user_id,
-            models.Favorite.notification_enabled == True
-        )
-        .all()
-    )
-    
-    if not favorites:
-        return []
-    
-    # 獲取當前正在進行的施工通知
-    today = date.today()
-    construction_notices = (
-        db.query(models.ConstructionNotice)
-        .filter(
-            models.ConstructionNotice.start_date <= today,
-            or_(
-                models.ConstructionNotice.end_date >= today,
-                models.ConstructionNotice.end_date.is_(None)
-            )
-        )
-        .all()
-    )
-    
-    logger.debug(f"User {user_id}: Found {len(favorites)} favorites with notifications enabled, {len(construction_notices)} ongoing constructions")
-    
-    alerts = []
-    # 使用集合來追蹤已經添加的 (favorite_id, construction_id) 組合，避免重複
-    added_combinations = set()
-    
-    for favorite in favorites:
-        favorite_coords = get_favorite_coordinates(favorite)
-        if not favorite_coords:
-            logger.debug(f"User {user_id}: Favorite {favorite.id} ({favorite.name}) has no coordinates")
-            continue
-        
-        threshold_meters = favorite.distance_threshold or 1000.0
-        
-        for construction in construction_notices:
-            if not construction.geometry:
-                continue
-            
-            # 檢查是否已經添加過這個組合
-            combination_key = (favorite.id, construction.id)
-            if combination_key in added_combinations:
-                continue
-            
-            # 從 geometry 中提取座標
-            geometry = construction.geometry
-            if isinstance(geometry, dict) and geometry.get('type') == 'Point':
-                coords = geometry.get('coordinates')
-                if isinstance(coords, list) and len(coords) >= 2:
-                    con_lon = float(coords[0])
-                    con_lat = float(coords[1])
-                    
-                    # 檢查是否在收藏地點的閾值範圍內
-                    # 對於每個收藏地點的多個座標點，取最短距離
-                    min_distance = None
-                    for fav_lat, fav_lon in favorite_coords:
-                        distance = haversine_distance_meters(fav_lat, fav_lon, con_lat, con_lon)
-                        if distance <= threshold_meters:
-                            if min_distance is None or distance < min_distance:
-                                min_distance = distance
-                    
-                    # 如果找到匹配的距離，添加警報
-                    if min_distance is not None:
-                        alerts.append({
-                            'favorite_name': favorite.name,
-                            'construction_name': construction.name,
-                            'construction_road': construction.road,
-                            'distance_meters': round(min_distance),
-                        })
-                        added_combinations.add(combination_key)
-                        logger.info(
-                            f"User {user_id}: Found nearby construction - "
-                            f"Favorite '{favorite.name}' (id={favorite.id}) has construction "
-                            f"'{construction.name}' (id={construction.id}) at {round(min_distance)}m"
-                        )
-    
-    if alerts:
-        logger.info(f"User {user_id}: Generated {len(alerts)} unique alerts")
-    return alerts
+# key: external_id, value: user_id
+connection_users: Dict[str, int] = {}
+# 每個連線已推送、尚未解除的警報
+# key: external_id, value: {(favorite_id, construction_id): alert}
+delivered_alerts: Dict[str, Dict[tuple, dict]] = {}
 
 
 @router.websocket("/ws/notifications")
@@ -166,7 +39,7 @@ async def websocket_endpoint(websocket: WebSocket, external_id: str = Query(...)
         
         user_id = user.id
         
-        # 儲存連接
+        # 儲存連接（同一用戶在其他程序的舊連接由 connected 事件關閉）
         if external_id in active_connections:
             # 如果已有連接，關閉舊的
             try:
@@ -175,6 +48,8 @@ async def websocket_endpoint(websocket: WebSocket, external_id: str = Query(...)
                 pass
         
         active_connections[external_id] = websocket
+        connection_users[external_id] = user_id
+        delivered_alerts[external_id] = {}
         logger.info(f"WebSocket connected: external_id={external_id}, user_id={user_id}")
         
         # 發送連接成功訊息
@@ -184,6 +59,10 @@ async def websocket_endpoint(websocket: WebSocket, external_id: str = Query(...)
             "user_id": user_id
         })
         
+        _publish({"type": "connected", "external_id": external_id})
+        # 新連線：推送目前所有附近施工
+        notify_favorites_changed(user_id)
+        
         # 保持連接並處理訊息
         try:
             while True:
@@ -200,7 +79,7 @@ async def websocket_endpoint(websocket: WebSocket, external_id: str = Query(...)
         finally:
             # 清理連接
             if external_id in active_connections and active_connections[external_id] == websocket:
-                del active_connections[external_id]
+                _drop_connection(external_id)
             db.close()
     except Exception as e:
         logger.error(f"WebSocket error for external_id={external_id}: {e}", exc_info=True)
@@ -211,63 +90,249 @@ async def websocket_endpoint(websocket: WebSocket, external_id: str = Query(...)
         db.close()
 
 
-async def send_construction_alert(external_id: str, alerts: list[dict]):
-    """向指定用戶發送施工警報"""
+def _drop_connection(external_id: str) -> None:
+    active_connections.pop(external_id, None)
+    connection_users.pop(external_id, None)
+    delivered_alerts.pop(external_id, None)
+
+
+async def _send(external_id: str, message: dict) -> bool:
     if external_id not in active_connections:
         return False
     
     websocket = active_connections[external_id]
     try:
-        await websocket.send_json({
-            "type": "construction_alert",
-            "alerts": alerts,
-            "timestamp": datetime.now().isoformat()
-        })
+        await websocket.send_json(message)
         return True
     except Exception as e:
-        logger.error(f"Failed to send alert to {external_id}: {e}")
+        logger.error(f"Failed to send {message.get('type')} to {external_id}: {e}")
         # 連接可能已斷開，清理
-        if external_id in active_connections:
-            del active_connections[external_id]
+        if active_connections.get(external_id) is websocket:
+            _drop_connection(external_id)
         return False
 
 
-async def check_and_notify_all_users():
-    """檢查所有在線用戶的收藏地點並發送通知"""
-    if not active_connections:
-        logger.debug("No active WebSocket connections, skipping check")
-        return
+async def send_construction_alert(external_id: str, alerts: list[dict]):
+    """向指定用戶發送施工警報"""
+    return await _send(external_id, {
+        "type": "construction_alert",
+        "alerts": alerts,
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+async def send_construction_alert_resolved(external_id: str, resolved: list[dict]):
+    """通知用戶先前推送的警報已解除（施工結束或收藏變更）"""
+    return await _send(external_id, {
+        "type": "construction_alert_resolved",
+        "resolved": [
+            {
+                'favorite_id': alert['favorite_id'],
+                'construction_id': alert['construction_id'],
+                'favorite_name': alert['favorite_name'],
+                'construction_name': alert['construction_name'],
+            }
+            for alert in resolved
+        ],
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+def collect_alerts(user_ids: Set[int]) -> Dict[int, list[dict]]:
+    """
+    讀取多個用戶目前的施工警報（同步，在執行緒中執行）
     
-    logger.info(f"Checking notifications for {len(active_connections)} online users")
+    配對表先跟上進行中施工快照，之後只需一次有索引的查詢
     
+    Returns:
+        user_id 對應警報列表的字典
+    """
     db = SessionLocal()
     try:
-        # 獲取所有在線用戶的 external_id 和對應的 user_id
-        online_users = []
-        for external_id in list(active_connections.keys()):
-            user = db.query(models.User).filter(models.User.external_id == external_id).first()
-            if user:
-                online_users.append((external_id, user.id))
-            else:
-                logger.warning(f"User with external_id={external_id} not found in database")
-        
-        logger.info(f"Found {len(online_users)} valid online users")
-        
-        for external_id, user_id in online_users:
-            try:
-                alerts = check_construction_near_favorites(user_id, db)
-                if alerts:
-                    success = await send_construction_alert(external_id, alerts)
-                    if success:
-                        logger.info(f"✓ Successfully sent {len(alerts)} alerts to user {external_id} (user_id={user_id})")
-                    else:
-                        logger.warning(f"✗ Failed to send alerts to user {external_id} (user_id={user_id})")
-                else:
-                    logger.debug(f"No alerts for user {external_id} (user_id={user_id})")
-            except Exception as e:
-                logger.error(f"Error checking user {external_id} (user_id={user_id}): {e}", exc_info=True)
-    except Exception as e:
-        logger.error(f"Error in check_and_notify_all_users: {e}", exc_info=True)
+        snapshot = favorite_matches.sync(db)
+        match = models.FavoriteConstructionMatch
+        notice = models.ConstructionNotice
+        rows = (
+            db.query(
+                models.Favorite.user_id, match.favorite_id, match.notice_id, match.distance_m,
+                models.Favorite.name, notice.name, notice.road,
+            )
+            .join(models.Favorite, models.Favorite.id == match.favorite_id)
+            .join(notice, notice.id == match.notice_id)
+            .filter(
+                models.Favorite.user_id.in_(list(user_ids)),
+                models.Favorite.notification_enabled == True,
+                notice.start_date <= snapshot.day,
+                or_(notice.end_date >= snapshot.day, notice.end_date.is_(None)),
+            )
+            .order_by(match.favorite_id, match.notice_id)
+            .all()
+        )
+        results = {user_id: [] for user_id in user_ids}
+        for user_id, favorite_id, notice_id, distance, favorite_name, construction_name, construction_road in rows:
+            results[user_id].append({
+                'favorite_id': favorite_id,
+                'construction_id': notice_id,
+                'favorite_name': favorite_name,
+                'construction_name': construction_name,
+                'construction_road': construction_road,
+                'distance_meters': round(distance),
+            })
+        return results
     finally:
         db.close()
 
+
+async def push_alert_changes(external_id: str, alerts: list[dict]) -> None:
+    """只推送與已推送內容相比新增或解除的警報"""
+    delivered = delivered_alerts.get(external_id)
+    if delivered is None:
+        return
+    current = {(alert['favorite_id'], alert['construction_id']): alert for alert in alerts}
+    new_alerts = [alert for key, alert in current.items() if key not in delivered]
+    resolved = [alert for key, alert in delivered.items() if key not in current]
+    if not new_alerts and not resolved:
+        logger.debug(f"No alert changes for user {external_id}")
+        return
+    
+    if new_alerts and not await send_construction_alert(external_id, new_alerts):
+        logger.warning(f"✗ Failed to send alerts to user {external_id}")
+        return
+    if resolved and not await send_construction_alert_resolved(external_id, resolved):
+        logger.warning(f"✗ Failed to send resolved alerts to user {external_id}")
+        return
+    if external_id in delivered_alerts:
+        delivered_alerts[external_id] = current
+    logger.info(f"✓ Sent {len(new_alerts)} new and {len(resolved)} resolved alerts to user {external_id}")
+
+
+async def check_and_notify_users(user_ids: Optional[Set[int]] = None):
+    """
+    檢查在線用戶的收藏地點並推送警報變化
+    
+    Args:
+        user_ids: 只檢查這些用戶；None 表示所有在線用戶
+    """
+    targets = {
+        external_id: (active_connections[external_id], user_id)
+        for external_id, user_id in list(connection_users.items())
+        if external_id in active_connections and (user_ids is None or user_id in user_ids)
+    }
+    if not targets:
+        logger.debug("No matching WebSocket connections, skipping check")
+        return
+    
+    logger.info(f"Checking notifications for {len(targets)} online users")
+    results = await asyncio.to_thread(collect_alerts, {user_id for _, user_id in targets.values()})
+    
+    for external_id, (websocket, user_id) in targets.items():
+        # 計算期間連線已關閉或被取代
+        if active_connections.get(external_id) is not websocket or user_id not in results:
+            continue
+        await push_alert_changes(external_id, results[user_id])
+
+
+# --- 事件驅動的通知引擎 ---------------------------------------------------------
+# 施工資料匯入、收藏變更與新連線會喚醒引擎，只檢查受影響的用戶；
+# NOTIFICATION_SWEEP_SECONDS 的定期全面檢查處理其他變化（日期跨日、其他程序寫入等）
+#
+# 變更事件經由 backplane 送到所有程序（多個 worker 或 replica），每個程序只檢查
+# 並推送給自己持有的連線。
+
+_wakeup: Optional[asyncio.Event] = None
+_pending_users: Set[int] = set()
+_pending_all = False
+
+
+def _mark_pending(user_id: Optional[int]) -> None:
+    """在事件迴圈中執行：記錄待檢查的用戶並喚醒引擎"""
+    global _pending_all
+    if user_id is None:
+        _pending_all = True
+    else:
+        _pending_users.add(user_id)
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _publish(event: dict) -> None:
+    """發布事件到所有程序（包含自己）；可從任何執行緒呼叫"""
+    try:
+        backplane.get_backplane().publish({**event, "origin": backplane.ORIGIN})
+    except Exception as e:
+        logger.error(f"Failed to publish {event.get('type')} event: {e}")
+
+
+def notify_constructions_changed() -> None:
+    """施工資料變動：所有程序重新檢查各自的在線用戶"""
+    _publish({"type": "constructions_changed"})
+
+
+def notify_favorites_changed(user_id: int) -> None:
+    """用戶的收藏新增、更新或刪除：持有該用戶連線的程序重新檢查"""
+    _publish({"type": "favorites_changed", "user_id": user_id})
+
+
+async def _close_replaced(external_id: str) -> None:
+    """用戶在其他程序建立了新連線：關閉本程序的舊連線"""
+    websocket = active_connections.get(external_id)
+    if websocket is None:
+        return
+    _drop_connection(external_id)
+    logger.info(f"WebSocket for external_id={external_id} replaced by a connection on another worker")
+    try:
+        await websocket.close()
+    except:
+        pass
+
+
+async def _on_event(event: dict) -> None:
+    """處理 backplane 事件（在事件迴圈中執行）"""
+    kind = event.get("type")
+    remote = event.get("origin") != backplane.ORIGIN
+    if kind == "constructions_changed":
+        if remote:
+            # 其他程序寫入的施工資料：本程序的快照要重建（不再發布事件）
+            construction_index.invalidate(notify_listeners=False)
+        _mark_pending(None)
+    elif kind == "favorites_changed":
+        _mark_pending(event.get("user_id"))
+    elif kind == "connected":
+        if remote:
+            await _close_replaced(event.get("external_id"))
+    elif kind == backplane.RESYNC:
+        # 訂閱（重新）開始：期間的事件可能遺失，全部重新檢查
+        construction_index.invalidate(notify_listeners=False)
+        _mark_pending(None)
+
+
+async def run_notification_engine():
+    """通知引擎主迴圈；在應用程式的事件迴圈中以 task 執行，取消即停止"""
+    global _wakeup, _pending_all
+    _wakeup = asyncio.Event()
+    listener = asyncio.create_task(backplane.get_backplane().run(_on_event))
+    construction_index.add_listener(notify_constructions_changed)
+    logger.info(f"Notification engine started (safety sweep every {settings.NOTIFICATION_SWEEP_SECONDS}s)")
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.NOTIFICATION_SWEEP_SECONDS)
+            except asyncio.TimeoutError:
+                _pending_all = True
+            _wakeup.clear()
+            
+            user_ids = None if _pending_all else set(_pending_users)
+            _pending_all = False
+            _pending_users.clear()
+            try:
+                await check_and_notify_users(user_ids)
+            except Exception as e:
+                logger.error(f"Error in notification engine: {e}", exc_info=True)
+    finally:
+        construction_index.remove_listener(notify_constructions_changed)
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
+        _wakeup = None
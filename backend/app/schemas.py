@@ -59,6 +59,7 @@ class ConstructionNoticeOut(BaseModel):
     unit: str | None = None
     road: str | None = None
     url: str | None = None
+    caseid: str | None = None
     geometry: dict[str, Any] | None = None
     class Config:
         from_attributes = True
@@ -106,4 +107,10 @@ class FavoriteOut(FavoriteBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class NearbyConstructionOut(BaseModel):
+    favorite_id: int
+    distance_meters: float
+    notice: ConstructionNoticeOut
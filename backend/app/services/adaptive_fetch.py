@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class AIMDLimiter:
+    """
+    Concurrency window adjusted by additive increase / multiplicative decrease.
+
+    Every fast success grows the window by 1/limit (about +1 per window of
+    requests). A failure or a response slower than ``latency_target`` shrinks
+    it by ``decrease_factor``, at most once per round trip. Only requests
+    started after the last decrease can trigger another one.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 16,
+        latency_target: float = 1.0,
+        decrease_factor: float = 0.5,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.peak = self.limit
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns the request's start time."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, ok: Optional[bool]) -> None:
+        """Free a slot; ``ok`` is None when no request was made."""
+        latency = time.monotonic() - started
+        async with self._cond:
+            self.in_flight -= 1
+            if ok is None:
+                pass
+            elif ok and latency <= self.latency_target:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.peak = max(self.peak, self.limit)
+            elif started > self._last_decrease:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                self._last_decrease = time.monotonic()
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """Spaces request starts evenly so they never exceed ``rate`` per second."""
+
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    mean_latency: float = 0.0
+    final_concurrency: float = 0.0
+    peak_concurrency: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Completed requests per second."""
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.total,
+            "failed_requests": self.failed,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_rps": round(self.throughput, 2),
+            "mean_latency_seconds": round(self.mean_latency, 3),
+            "final_concurrency": round(self.final_concurrency, 2),
+            "peak_concurrency": round(self.peak_concurrency, 2),
+        }
+
+
+async def fetch_all(
+    keys: Iterable[K],
+    fetch: Callable[[K], Awaitable[T]],
+    *,
+    max_rps: Optional[float] = None,
+    initial_concurrency: int = 4,
+    min_concurrency: int = 1,
+    max_concurrency: int = 16,
+    latency_target: float = 1.0,
+    label: str = "fetch",
+) -> Tuple[Dict[K, Union[T, Exception]], BatchStats]:
+    """
+    Run ``fetch`` for every key under an AIMD concurrency window and an
+    optional requests-per-second budget.
+
+    An exception raised by ``fetch`` counts as a congestion signal and is
+    stored as that key's result; a returned value counts as a success.
+
+    Returns:
+        (key -> result or exception, batch statistics)
+    """
+    queue: "asyncio.Queue[K]" = asyncio.Queue()
+    for key in dict.fromkeys(keys):
+        queue.put_nowait(key)
+    total = queue.qsize()
+    stats = BatchStats(total=total)
+    results: Dict[K, Union[T, Exception]] = {}
+    if total == 0:
+        return results, stats
+
+    limiter = AIMDLimiter(initial_concurrency, min_concurrency, max_concurrency, latency_target)
+    pacer = RateLimiter(max_rps) if max_rps else None
+    latency_sum = 0.0
+    progress_step = max(10, total // 10)
+    batch_started = time.monotonic()
+
+    async def worker() -> None:
+        nonlocal latency_sum
+        while True:
+            started = await limiter.acquire()
+            try:
+                key = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                await limiter.release(started, None)
+                return
+            ok = False
+            try:
+                if pacer is not None:
+                    await pacer.wait()
+                    started = time.monotonic()
+                try:
+                    results[key] = await fetch(key)
+                    ok = True
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results[key] = e
+            finally:
+                latency_sum += time.monotonic() - started
+                await limiter.release(started, ok)
+            if ok:
+                stats.succeeded += 1
+            else:
+                stats.failed += 1
+            done = stats.succeeded + stats.failed
+            if done % progress_step == 0 and done < total:
+                logger.info(f"{label} progress: {done}/{total}, concurrency {limiter.limit:.1f}")
+
+    await asyncio.gather(*(worker() for _ in range(min(max_concurrency, total))))
+
+    stats.elapsed = time.monotonic() - batch_started
+    stats.mean_latency = latency_sum / total
+    stats.final_concurrency = limiter.limit
+    stats.peak_concurrency = limiter.peak
+    logger.info(
+        f"{label}: {total} requests in {stats.elapsed:.1f}s ({stats.throughput:.1f} req/s), "
+        f"{stats.failed} failed, mean latency {stats.mean_latency * 1000:.0f}ms, "
+        f"concurrency {stats.final_concurrency:.1f} (peak {stats.peak_concurrency:.1f})"
+    )
+    return results, stats
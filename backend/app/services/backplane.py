@@ -0,0 +1,162 @@
+"""
+Pub/sub backplane that lets the API worker processes share notification
+events, so a WebSocket held by one worker can be served by events raised in
+any other worker or replica.
+
+Every worker subscribes once (``run``, from the notification engine) and can
+``publish`` from any thread. Each event reaches every subscriber, including
+the publisher itself.
+
+- ``memory``: an in-process queue; enough for a single worker (the default)
+- ``postgres``: LISTEN/NOTIFY on the application database, for several
+  workers or replicas sharing it
+
+Events are JSON objects. Postgres rejects notification payloads of 8000
+bytes or more, so publishers must keep events under ``max_payload_bytes``.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+Handler = Callable[[Event], Awaitable[None]]
+
+# Identifies this process in the events it publishes
+ORIGIN = uuid.uuid4().hex
+# Delivered to the handler when a subscription (re)starts: events published
+# while it was down are lost, so the handler should resynchronize
+RESYNC = "resync"
+# LISTEN/NOTIFY channel shared by all workers
+CHANNEL = "townpass_notifications"
+# Postgres limit on a NOTIFY payload is 8000 bytes
+MAX_NOTIFY_PAYLOAD_BYTES = 7900
+# Seconds between reconnection attempts of the Postgres listener
+RECONNECT_SECONDS = 5
+
+
+def encode(event: Event) -> str:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+
+
+async def _dispatch(handler: Handler, event: Event) -> None:
+    try:
+        await handler(event)
+    except Exception as e:
+        logger.error(f"Backplane handler failed for {event.get('type')} event: {e}", exc_info=True)
+
+
+class InProcessBackplane:
+    """Events only reach the current process."""
+
+    max_payload_bytes: Optional[int] = None
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+
+    def publish(self, event: Event) -> None:
+        """Thread-safe; events published while nothing subscribes are dropped."""
+        loop, queue = self._loop, self._queue
+        if loop is None or queue is None:
+            return
+        # Round-trip through JSON so handlers see the same data as with Postgres
+        event = json.loads(encode(event))
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            # Event loop already closed (application shutting down)
+            pass
+
+    async def run(self, handler: Handler) -> None:
+        """Deliver events to ``handler`` until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        try:
+            await _dispatch(handler, {"type": RESYNC})
+            while True:
+                await _dispatch(handler, await self._queue.get())
+        finally:
+            self._loop = None
+            self._queue = None
+
+
+class PostgresBackplane:
+    """Events are sent with pg_notify and received on a dedicated LISTEN connection."""
+
+    max_payload_bytes: Optional[int] = MAX_NOTIFY_PAYLOAD_BYTES
+
+    def __init__(self, database_url: str):
+        # psycopg takes a plain libpq URL, without SQLAlchemy's "+psycopg" driver suffix
+        self._conninfo = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def publish(self, event: Event) -> None:
+        """Callable from any thread; on the event loop the database round trip runs in an executor."""
+        payload = encode(event)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_payload_bytes:
+            raise ValueError(f"Backplane event too large: {size} bytes (limit {self.max_payload_bytes})")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._notify(payload)
+            return
+        loop.run_in_executor(None, self._notify, payload)
+
+    @staticmethod
+    def _notify(payload: str) -> None:
+        try:
+            # Delivered to the listeners when the transaction commits
+            with engine.begin() as connection:
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload}
+                )
+        except Exception as e:
+            logger.error(f"Failed to publish backplane event: {e}")
+
+    async def run(self, handler: Handler) -> None:
+        """Listen and deliver events to ``handler`` until cancelled, reconnecting on errors."""
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self._conninfo, autocommit=True) as connection:
+                    await connection.execute(f"LISTEN {CHANNEL}")
+                    logger.info(f"Notification backplane listening on Postgres channel '{CHANNEL}'")
+                    await _dispatch(handler, {"type": RESYNC})
+                    async for notify in connection.notifies():
+                        try:
+                            event = json.loads(notify.payload)
+                        except ValueError:
+                            logger.warning(f"Ignoring malformed backplane payload: {notify.payload[:200]}")
+                            continue
+                        await _dispatch(handler, event)
+            except Exception as e:
+                logger.error(f"Notification backplane connection lost: {e}; reconnecting in {RECONNECT_SECONDS}s")
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+
+_backplane = None
+
+
+def get_backplane():
+    """The backplane selected by NOTIFICATION_BACKPLANE, created on first use."""
+    global _backplane
+    if _backplane is None:
+        kind = settings.NOTIFICATION_BACKPLANE.lower()
+        if kind == "memory":
+            _backplane = InProcessBackplane()
+        elif kind == "postgres":
+            _backplane = PostgresBackplane(settings.DATABASE_URL)
+        else:
+            raise ValueError(f"Unknown NOTIFICATION_BACKPLANE '{settings.NOTIFICATION_BACKPLANE}' (expected 'memory' or 'postgres')")
+        logger.info(f"Notification backplane: {kind}")
+    return _backplane
@@ -0,0 +1,183 @@
+"""
+Shared in-memory snapshot of ongoing construction notices for the
+notification engine: compact records plus a spatial index over them.
+
+The snapshot is rebuilt only when the notices change: ingest and geometry
+updates in this process call ``invalidate``; changes made by another process
+are picked up through a cheap table fingerprint; and the ongoing set is
+re-selected when the date rolls over. Each rebuild gets a new version, so
+callers can tell whether anything changed since they last looked, and
+listeners registered with ``add_listener`` are called on every invalidation.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from ..models import ConstructionNotice
+from .spatial_index import GridIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# About 1.1 km, the default favorite distance_threshold
+INDEX_CELL_SIZE = 0.01
+# How often (seconds) to check whether construction_notices changed in
+# another process
+FINGERPRINT_INTERVAL = 60
+
+
+class ActiveConstruction(NamedTuple):
+    id: int
+    lon: float
+    lat: float
+    name: str
+    road: Optional[str]
+
+
+@dataclass(frozen=True)
+class ActiveSnapshot:
+    version: int
+    day: date
+    constructions: Tuple[ActiveConstruction, ...]  # ordered by notice id
+    index: GridIndex[ActiveConstruction]
+    # Coordinates aligned with ``constructions`` for the batch distance
+    # kernels: float64 ndarrays, or tuples without NumPy
+    lons: Any
+    lats: Any
+
+    def __len__(self) -> int:
+        return len(self.constructions)
+
+
+def build_snapshot(version: int, day: date, constructions: Iterable[ActiveConstruction]) -> ActiveSnapshot:
+    constructions = tuple(constructions)
+    index: GridIndex[ActiveConstruction] = GridIndex(INDEX_CELL_SIZE)
+    for construction in constructions:
+        index.insert(construction, construction.lon, construction.lat)
+    lons = tuple(c.lon for c in constructions)
+    lats = tuple(c.lat for c in constructions)
+    if np is not None:
+        lons = np.array(lons, dtype=np.float64)
+        lats = np.array(lats, dtype=np.float64)
+    return ActiveSnapshot(version, day, constructions, index, lons, lats)
+
+
+def _point(geometry) -> Optional[tuple]:
+    if not isinstance(geometry, dict) or geometry.get("type") != "Point":
+        return None
+    coords = geometry.get("coordinates")
+    if not isinstance(coords, list) or len(coords) < 2:
+        return None
+    try:
+        return float(coords[0]), float(coords[1])
+    except (TypeError, ValueError):
+        return None
+
+
+class _ActiveConstructionSource:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ActiveSnapshot] = None
+        self._fingerprint: Optional[tuple] = None
+        self._version = 0
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._fingerprint = None
+
+    @staticmethod
+    def _read_fingerprint(db: Session) -> tuple:
+        row = db.execute(text(
+            "SELECT count(*), coalesce(max(id), 0), count(geometry) FROM construction_notices"
+        )).one()
+        return tuple(row)
+
+    def get(self, db: Session) -> ActiveSnapshot:
+        """Return the snapshot of constructions ongoing today, rebuilding it if the notices changed."""
+        with self._lock:
+            today = date.today()
+            now = time.monotonic()
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.day == today:
+                if now - self._checked_at < FINGERPRINT_INTERVAL:
+                    return snapshot
+                fingerprint = self._read_fingerprint(db)
+                self._checked_at = now
+                if fingerprint == self._fingerprint:
+                    return snapshot
+            else:
+                fingerprint = self._read_fingerprint(db)
+                self._checked_at = now
+
+            rows = (
+                db.query(ConstructionNotice.id, ConstructionNotice.geometry,
+                         ConstructionNotice.name, ConstructionNotice.road)
+                .filter(
+                    ConstructionNotice.start_date <= today,
+                    or_(ConstructionNotice.end_date >= today, ConstructionNotice.end_date.is_(None)),
+                )
+                .order_by(ConstructionNotice.id)
+                .all()
+            )
+            constructions = []
+            for notice_id, geometry, name, road in rows:
+                point = _point(geometry)
+                if point is not None:
+                    constructions.append(ActiveConstruction(notice_id, point[0], point[1], name, road))
+
+            self._version += 1
+            self._snapshot = build_snapshot(self._version, today, constructions)
+            self._fingerprint = fingerprint
+            logger.info(
+                f"Active construction snapshot v{self._version}: "
+                f"{len(constructions)} located of {len(rows)} ongoing notices"
+            )
+            return self._snapshot
+
+
+_active_source = _ActiveConstructionSource()
+_listeners: List[Callable[[], None]] = []
+
+
+def get_snapshot(db: Session) -> ActiveSnapshot:
+    """The current snapshot; take it once per notification tick and share it across users."""
+    return _active_source.get(db)
+
+
+def invalidate(notify_listeners: bool = True) -> None:
+    """
+    Rebuild the snapshot on next use (call after construction_notices changed).
+
+    Pass notify_listeners=False when reacting to a change another process
+    already announced.
+    """
+    _active_source.invalidate()
+    if not notify_listeners:
+        return
+    for listener in list(_listeners):
+        try:
+            listener()
+        except Exception as e:
+            logger.error(f"Construction change listener failed: {e}", exc_info=True)
+
+
+def add_listener(listener: Callable[[], None]) -> None:
+    """Call ``listener`` (from the invalidating thread) whenever the notices change."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
@@ -1,56 +1,169 @@
-import requests
 from bs4 import BeautifulSoup
-import urllib3
 import json
 import os
-from typing import List, Dict, Any, Optional
-from pathlib import Path
+import gzip
+import textwrap
+import hashlib
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import logging
 
-# Disable SSL warnings (not recommended for production)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from sqlalchemy import func
+
+from .. import models
+from ..database import SessionLocal
+from . import health, vector_tiles
+from .http_client import upstream
+from .json_stream import iter_json_array
+from .spatial_index import GridIndex
+
+try:
+    import brotli
+except ImportError:  # declared dependency; without it only gzip variants are produced
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
+if brotli is None:
+    logger.warning("brotli is not installed; construction GeoJSON is served without br variants")
+
 # Constants
 BASE_URL = "https://dig.taipei/Tpdig"
 MAP_URL = f"{BASE_URL}/Map/ShowPublic.aspx"
 USER_ID = "tpdig"
+# The AppKey is reused until it expires or GetAppWork rejects it
+APP_KEY_TTL_SECONDS = 6 * 60 * 60
+# Grid cell size (degrees) of the per-snapshot spatial index, roughly 1 km in Taipei
+INDEX_CELL_SIZE = 0.01
+# Number of generations kept in the change feed (construction_changes table)
+CHANGE_LOG_SIZE = 64
+# Read size when parsing the spooled GetAppWork payload
+SPOOL_READ_SIZE = 64 * 1024
+# Named property projections that are pre-encoded once per snapshot.
+# "map" covers what the map popup and the nearby lists read.
+FIELD_PROFILES: Dict[str, Tuple[str, ...]] = {
+    "map": ("AC_NO", "SNO", "DIGADD", "PURP", "AP_NAME", "TC_NA", "CB_DA", "CE_DA"),
+}
 
 
-def get_app_key() -> str:
-    """Fetch the AppKey from the public map page."""
-    try:
-        response = requests.get(MAP_URL, verify=False, timeout=30)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        app_key_input = soup.find("input", id="AppKey")
-        
-        if app_key_input is None:
-            raise ValueError("AppKey input not found on the page")
-        
-        return app_key_input["value"]
-    except Exception as e:
-        logger.error(f"Failed to get app key: {e}")
-        raise
+@dataclass(frozen=True)
+class EncodedView:
+    """A pre-encoded FeatureCollection for one property projection."""
+    body: bytes
+    etag: str
+    feature_bodies: Tuple[bytes, ...]
+    encodings: Dict[str, bytes]
+
+
+@dataclass(frozen=True)
+class ConstructionSnapshot:
+    """An immutable, pre-encoded view of construction.geojson.
+
+    A snapshot is identified by the (inode, mtime, size) of the file it was
+    built from, so a rewrite of the file is detected with a single ``stat``.
+    """
+    file_path: str
+    inode: int
+    mtime_ns: int
+    size: int
+    geojson: Dict[str, Any]
+    body: bytes
+    etag: str
+    last_modified: str
+    # Pre-encoded features, in file order, and a grid index of their positions
+    feature_bodies: Tuple[bytes, ...]
+    index: GridIndex[int]
+    # Pre-compressed copies of ``body`` keyed by content-coding ("br", "gzip")
+    encodings: Dict[str, bytes]
+    # Pre-encoded projections keyed by FIELD_PROFILES name
+    profiles: Dict[str, EncodedView]
+    # Change feed generation read before the file was; the file is never
+    # older than this generation (see ``_append_change``)
+    generation: int
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        return (
+            self.inode == stat_result.st_ino
+            and self.mtime_ns == stat_result.st_mtime_ns
+            and self.size == stat_result.st_size
+        )
+
+    def query(self, bbox: Optional[Tuple[float, float, float, float]] = None,
+              limit: Optional[int] = None, profile: Optional[str] = None,
+              fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """
+        Encode a FeatureCollection of the features inside ``bbox`` (all if None).
+
+        Properties are projected to a pre-encoded ``profile`` or, per request,
+        to an arbitrary list of ``fields``.
+        """
+        if bbox is None:
+            positions = range(len(self.feature_bodies))
+            if limit is not None:
+                positions = positions[:limit]
+        else:
+            positions = self.index.query_bbox(*bbox, limit=limit)
+
+        if fields is not None:
+            features = self.geojson.get("features") or []
+            return encode_feature_collection(
+                encode_geojson(project_feature(features[i], fields)) for i in positions
+            )
+        bodies = self.profiles[profile].feature_bodies if profile else self.feature_bodies
+        return encode_feature_collection(bodies[i] for i in positions)
+
+
+# Process-wide snapshot cache, keyed by file path
+_snapshots: Dict[str, ConstructionSnapshot] = {}
+_snapshot_lock = threading.Lock()
+
+
+class AppKeyRejected(Exception):
+    """GetAppWork did not accept the AppKey it was given."""
 
 
-def get_app_work(user_id: str, key: str) -> List[Dict[str, Any]]:
-    """Fetch app work data and return as JSON list."""
+# Cached AppKey scraped from ShowPublic.aspx
+_app_key_cache: Dict[str, Any] = {"value": None, "fetched_at": 0.0}
+_app_key_lock = threading.Lock()
+
+
+def _parse_app_key(html: str) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+    app_key_input = soup.find("input", id="AppKey")
+    
+    if app_key_input is None:
+        raise ValueError("AppKey input not found on the page")
+    
+    return app_key_input["value"]
+
+
+async def fetch_app_key(force_refresh: bool = False) -> str:
+    """Return the cached AppKey, scraping the public map page when expired or forced."""
+    with _app_key_lock:
+        key, fetched_at = _app_key_cache["value"], _app_key_cache["fetched_at"]
+    if not force_refresh and key and time.monotonic() - fetched_at < APP_KEY_TTL_SECONDS:
+        return key
+    
     try:
-        url = f"{BASE_URL}/APP/GetAppWork.ashx?userid={user_id}&key={key}&isrpic=1&isgland="
-        response = requests.get(url, verify=False, timeout=30)
-        response.raise_for_status()
-        return json.loads(response.text)
+        html = await upstream.get_text(MAP_URL, timeout=30)
+        key = _parse_app_key(html)
     except Exception as e:
-        logger.error(f"Failed to get app work data: {e}")
+        logger.error(f"Failed to get app key: {e}")
         raise
+    
+    with _app_key_lock:
+        _app_key_cache["value"] = key
+        _app_key_cache["fetched_at"] = time.monotonic()
+    logger.info("Fetched new AppKey from public map page")
+    return key
 
 
-def convert_to_geojson(data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Convert the API response data to GeoJSON format."""
-    features = []
-    
+def iter_geojson_features(data: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Convert API records to GeoJSON features one at a time."""
     for item in data:
         # Skip items without valid coordinates
         if item.get("LAT") is None or item.get("LON") is None:
@@ -64,7 +177,7 @@ def convert_to_geojson(data: List[Dict[str, Any]]) -> Dict[str, Any]:
             continue
         
         # Create GeoJSON feature
-        feature = {
+        yield {
             "type": "Feature",
             "geometry": {
                 "type": "Point",
@@ -75,79 +188,506 @@ def convert_to_geojson(data: List[Dict[str, Any]]) -> Dict[str, Any]:
                 if k not in ["LAT", "LON"]  # Exclude LAT/LON from properties
             }
         }
-        features.append(feature)
-    
+
+
+def encode_geojson(geojson_data: Dict[str, Any]) -> bytes:
+    """Encode GeoJSON exactly like FastAPI's JSONResponse would."""
+    return json.dumps(
+        geojson_data,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_feature_collection(feature_bodies) -> bytes:
+    """Join pre-encoded features into a FeatureCollection body."""
+    return b'{"type":"FeatureCollection","features":[' + b",".join(feature_bodies) + b"]}"
+
+
+def project_feature(feature: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """Copy a feature keeping only the requested properties."""
+    properties = feature.get("properties") or {}
     return {
-        "type": "FeatureCollection",
-        "features": features
+        "type": "Feature",
+        "geometry": feature.get("geometry"),
+        "properties": {k: properties[k] for k in fields if k in properties},
     }
 
 
-def save_geojson(geojson_data: Dict[str, Any], filepath: str) -> None:
-    """Save GeoJSON data to a file."""
+def resolve_fields(fields: str) -> Tuple[Optional[str], Optional[Tuple[str, ...]]]:
+    """
+    Parse a ``fields=`` value into (profile, custom_fields).
+
+    A profile name, or a field list equal to a profile's, maps to that
+    pre-encoded profile; anything else is a per-request projection.
+    """
+    if fields in FIELD_PROFILES:
+        return fields, None
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    for name, profile_fields in FIELD_PROFILES.items():
+        if set(requested) == set(profile_fields):
+            return name, None
+    return None, requested
+
+
+def _encode_view(feature_bodies: Tuple[bytes, ...]) -> EncodedView:
+    body = encode_feature_collection(feature_bodies)
+    return EncodedView(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        feature_bodies=feature_bodies,
+        encodings=compress_body(body),
+    )
+
+
+def _point_coordinates(feature: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """Return (lon, lat) of a Point feature, or None."""
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        return None
+    coords = geometry.get("coordinates")
+    if not isinstance(coords, list) or len(coords) < 2:
+        return None
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # Write file atomically (write to temp file first, then rename)
-        temp_filepath = f"{filepath}.tmp"
-        with open(temp_filepath, "w", encoding="utf-8") as f:
-            json.dump(geojson_data, f, ensure_ascii=False, indent=2)
-        
-        # Atomic rename
-        os.replace(temp_filepath, filepath)
-        logger.info(f"GeoJSON saved successfully to {filepath} ({len(geojson_data['features'])} features)")
-    except Exception as e:
-        logger.error(f"Failed to save GeoJSON to {filepath}: {e}")
-        raise
+        return float(coords[0]), float(coords[1])
+    except (TypeError, ValueError):
+        return None
 
 
-def fetch_construction_geojson() -> Dict[str, Any]:
+def variant_paths(filepath: str) -> Dict[str, str]:
+    """Paths of the minified and pre-compressed variants written next to a GeoJSON file."""
+    root, ext = os.path.splitext(filepath)
+    minified = f"{root}.min{ext or '.geojson'}"
+    return {
+        "identity": minified,
+        "gzip": f"{minified}.gz",
+        "br": f"{minified}.br",
+    }
+
+
+def compress_body(body: bytes) -> Dict[str, bytes]:
+    """Compress a response body once for every supported content-coding."""
+    encodings = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=11)
+    return encodings
+
+
+def _decompress(coding: str, data: bytes) -> bytes:
+    if coding == "gzip":
+        return gzip.decompress(data)
+    return brotli.decompress(data)
+
+
+def _load_encodings(filepath: str, body: bytes) -> Dict[str, bytes]:
     """
-    Fetch construction data and convert to GeoJSON format.
-    
-    Returns:
-        GeoJSON dictionary
+    Read the pre-compressed variants from disk, keeping only those that decode
+    to ``body``. Missing or stale variants are compressed in memory instead.
     """
-    logger.info("Fetching construction data from API...")
-    
-    # Get app key
-    app_key = get_app_key()
-    
-    # Fetch data
-    data = get_app_work(USER_ID, app_key)
-    logger.info(f"Fetched {len(data)} records from API")
-    
-    # Convert to GeoJSON
-    geojson = convert_to_geojson(data)
-    logger.info(f"Converted to GeoJSON with {len(geojson['features'])} features")
-    
-    return geojson
+    paths = variant_paths(filepath)
+    encodings: Dict[str, bytes] = {}
+    for coding in ("gzip", "br"):
+        if coding == "br" and brotli is None:
+            continue
+        try:
+            with open(paths[coding], "rb") as f:
+                data = f.read()
+            if _decompress(coding, data) == body:
+                encodings[coding] = data
+        except Exception:
+            pass
+
+    missing = {"gzip", "br"} - set(encodings)
+    if brotli is None:
+        missing.discard("br")
+    if missing:
+        logger.info(f"Pre-compressed variants missing or stale for {filepath}: {sorted(missing)}")
+        compressed = compress_body(body)
+        for coding in missing:
+            encodings[coding] = compressed[coding]
+    return encodings
+
+
+def _temp_path(filepath: str) -> str:
+    """Temp file next to ``filepath``, unique per process and thread so concurrent updates never share one."""
+    return f"{filepath}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def _atomic_write_bytes(filepath: str, data: bytes) -> None:
+    temp_filepath = _temp_path(filepath)
+    with open(temp_filepath, "wb") as f:
+        f.write(data)
+    os.replace(temp_filepath, filepath)
 
 
-def get_construction_geojson(file_path: str) -> Optional[Dict[str, Any]]:
+def _build_snapshot(file_path: str, stat_result: os.stat_result, geojson: Dict[str, Any],
+                    generation: int) -> ConstructionSnapshot:
+    """Pre-encode a GeoJSON document, index its points and wrap it as a snapshot."""
+    body = encode_geojson(geojson)
+    encodings = _load_encodings(file_path, body)
+    features = geojson.get("features") or []
+    feature_bodies = tuple(encode_geojson(feature) for feature in features)
+    index: GridIndex[int] = GridIndex(INDEX_CELL_SIZE)
+    for position, feature in enumerate(features):
+        coords = _point_coordinates(feature)
+        if coords is not None:
+            index.insert(position, *coords)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return ConstructionSnapshot(
+        file_path=file_path,
+        inode=stat_result.st_ino,
+        mtime_ns=stat_result.st_mtime_ns,
+        size=stat_result.st_size,
+        geojson=geojson,
+        body=body,
+        etag=f'"{digest}"',
+        last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+        feature_bodies=feature_bodies,
+        index=index,
+        encodings=encodings,
+        profiles={
+            name: _encode_view(tuple(encode_geojson(project_feature(f, fields)) for f in features))
+            for name, fields in FIELD_PROFILES.items()
+        },
+        generation=generation,
+    )
+
+
+def get_construction_snapshot(file_path: str) -> Optional[ConstructionSnapshot]:
     """
-    Read construction GeoJSON data from file.
-    
+    Return the cached snapshot of a construction GeoJSON file.
+
+    The file is only re-read and re-encoded when its inode, mtime or size
+    changed since the snapshot was built.
+
     Args:
         file_path: Path to the GeoJSON file
-        
+
     Returns:
-        GeoJSON dictionary or None if file doesn't exist or can't be read
+        ConstructionSnapshot or None if file doesn't exist or can't be read
     """
     try:
-        if not os.path.exists(file_path):
-            logger.warning(f"Construction GeoJSON file not found: {file_path}")
-            return None
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            geojson = json.load(f)
-            logger.debug(f"Loaded construction GeoJSON from {file_path}")
-            return geojson
-    except Exception as e:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        logger.warning(f"Construction GeoJSON file not found: {file_path}")
+        return None
+    except OSError as e:
         logger.error(f"Error reading construction GeoJSON file: {e}", exc_info=True)
         return None
 
+    snapshot = _snapshots.get(file_path)
+    if snapshot is not None and snapshot.matches(stat_result):
+        return snapshot
+
+    with _snapshot_lock:
+        # Another thread may have rebuilt it while we were waiting
+        snapshot = _snapshots.get(file_path)
+        if snapshot is not None and snapshot.matches(stat_result):
+            return snapshot
+
+        # Read before the file: a generation is recorded only after its file is in place
+        generation = current_generation()
+        try:
+            with open(file_path, "rb") as f:
+                # Stat the handle we actually read, in case the file was swapped meanwhile
+                stat_result = os.fstat(f.fileno())
+                geojson = json.load(f)
+            snapshot = _build_snapshot(file_path, stat_result, geojson, generation)
+        except Exception as e:
+            logger.error(f"Error reading construction GeoJSON file: {e}", exc_info=True)
+            return None
+
+        _snapshots[file_path] = snapshot
+        logger.debug(f"Loaded construction GeoJSON snapshot from {file_path} (etag {snapshot.etag})")
+        return snapshot
+
+
+def peek_construction_snapshot(file_path: str) -> Optional[ConstructionSnapshot]:
+    """
+    Return the snapshot already loaded for a file without touching the disk.
+
+    Unlike ``get_construction_snapshot`` this never blocks on reading and
+    encoding the file; the snapshot may predate the file's latest version.
+    """
+    return _snapshots.get(file_path)
+
+
+class _VariantWriter:
+    """
+    Streams a FeatureCollection into temp files for the pretty-printed file
+    and its minified, gzip and brotli variants, one feature at a time.
+    ``commit`` renames the variants and then the main file into place.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.paths = {"main": filepath, **variant_paths(filepath)}
+        self.temp_paths = {name: _temp_path(path) for name, path in self.paths.items()}
+        self.files = {name: open(self.temp_paths[name], "wb") for name in self.paths
+                      if name != "br" or brotli is not None}
+        self.gzip = gzip.GzipFile(filename="", fileobj=self.files["gzip"], mode="wb", compresslevel=9, mtime=0)
+        self.brotli = brotli.Compressor(quality=11) if brotli is not None else None
+        self.count = 0
+        self.files["main"].write(b'{\n  "type": "FeatureCollection",\n  "features": [')
+        self._write_min(b'{"type":"FeatureCollection","features":[')
+
+    def _write_min(self, data: bytes) -> None:
+        self.files["identity"].write(data)
+        self.gzip.write(data)
+        if self.brotli is not None:
+            self.files["br"].write(self.brotli.process(data))
+
+    def write(self, feature: Dict[str, Any], body: bytes) -> None:
+        pretty = textwrap.indent(json.dumps(feature, ensure_ascii=False, indent=2), "    ")
+        separator = ",\n" if self.count else "\n"
+        self.files["main"].write((separator + pretty).encode("utf-8"))
+        self._write_min(b"," + body if self.count else body)
+        self.count += 1
+
+    def close(self) -> None:
+        self.files["main"].write(b"\n  ]\n}" if self.count else b"]\n}")
+        self._write_min(b"]}")
+        self.gzip.close()
+        if self.brotli is not None:
+            self.files["br"].write(self.brotli.finish())
+        for f in self.files.values():
+            f.close()
+
+    def commit(self) -> None:
+        # Variants first: the main file's rename is what readers key on
+        for name in sorted(self.files, key=lambda n: n == "main"):
+            os.replace(self.temp_paths[name], self.paths[name])
+
+    def discard(self) -> None:
+        for name, f in self.files.items():
+            f.close()
+            try:
+                os.remove(self.temp_paths[name])
+            except OSError:
+                pass
+
+
+def stream_construction_update(file_path: str, key: str,
+                               previous: Optional[ConstructionSnapshot],
+                               allow_empty: bool = True) -> Dict[str, Any]:
+    """
+    Stream GetAppWork straight into construction.geojson and its variants.
+
+    The raw payload is hashed while it is spooled to an anonymous temp file;
+    if it matches the hash behind the current file, nothing is converted or
+    written. Otherwise the spool is parsed incrementally, converted feature
+    by feature and written to temp files, so peak memory does not grow with
+    the number of records.
+
+    Returns:
+        {"skipped": bool, "feature_count": int, "digest": str}
+    """
+    url = f"{BASE_URL}/APP/GetAppWork.ashx?userid={USER_ID}&key={key}&isrpic=1&isgland="
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with tempfile.TemporaryFile(dir=os.path.dirname(file_path) or None) as spool:
+        hasher = hashlib.sha256()
+        for chunk in upstream.iterate(upstream.iter_chunks(url, timeout=30)):
+            hasher.update(chunk)
+            spool.write(chunk)
+        digest = hasher.hexdigest()
+
+        # An empty snapshot is not trusted when empty payloads are suspect:
+        # the same empty list may come from an expired key
+        if (previous is not None and digest == _read_payload_digest(file_path)
+                and (allow_empty or previous.feature_bodies)):
+            return {"skipped": True, "feature_count": len(previous.feature_bodies), "digest": digest}
+
+        spool.seek(0)
+        feature_count = _convert_payload(file_path, iter(lambda: spool.read(SPOOL_READ_SIZE), b""),
+                                         previous, allow_empty)
+
+    _atomic_write_bytes(payload_digest_path(file_path), digest.encode("ascii"))
+    return {"skipped": False, "feature_count": feature_count, "digest": digest}
+
+
+def _convert_payload(file_path: str, chunks: Iterable[bytes],
+                     previous: Optional[ConstructionSnapshot], allow_empty: bool) -> int:
+    """
+    Convert a raw GetAppWork payload into construction.geojson and its
+    variants, recording the differences to ``previous`` in the change feed.
+
+    Returns:
+        The number of features written
+    """
+    record_count = 0
+
+    def records() -> Iterator[Dict[str, Any]]:
+        nonlocal record_count
+        try:
+            for item in iter_json_array(chunks):
+                record_count += 1
+                if isinstance(item, dict):
+                    yield item
+        except ValueError as e:
+            raise AppKeyRejected(f"GetAppWork returned an invalid payload: {e}")
+
+    old_keyed = _keyed_bodies(previous.geojson.get("features") or [], previous.feature_bodies) \
+        if previous is not None else None
+    added, changed, seen = [], [], set()
+
+    writer = _VariantWriter(file_path)
+    try:
+        for feature in iter_geojson_features(records()):
+            body = encode_geojson(feature)
+            writer.write(feature, body)
+            key = feature_key(feature)
+            if old_keyed is None or key is None:
+                continue
+            seen.add(key)
+            old_body = old_keyed.get(key)
+            if old_body is None:
+                added.append(feature)
+            elif old_body != body:
+                changed.append(feature)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    logger.info(f"Fetched {record_count} records from API, converted {writer.count} features")
+
+    if record_count == 0 and not allow_empty:
+        writer.discard()
+        # An expired key may also show up as an empty list
+        raise AppKeyRejected("GetAppWork returned no records")
+
+    writer.commit()
+    if old_keyed is not None:
+        removed = [k for k in old_keyed if k not in seen]
+        _append_change(added, changed, removed)
+    return writer.count
+
+
+def payload_digest_path(filepath: str) -> str:
+    """Sidecar file holding the hash of the upstream payload behind a GeoJSON file."""
+    return f"{filepath}.upstream.sha256"
+
+
+def _read_payload_digest(filepath: str) -> Optional[str]:
+    try:
+        with open(payload_digest_path(filepath), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def feature_key(feature: Dict[str, Any]) -> Optional[str]:
+    """Stable identity of a dig.taipei feature: permit number (AC_NO) and serial (SNO)."""
+    properties = feature.get("properties") or {}
+    ac_no = properties.get("AC_NO")
+    if ac_no is None:
+        return None
+    return f"{ac_no}:{properties.get('SNO')}"
+
+
+def _keyed_bodies(features, bodies) -> Dict[str, bytes]:
+    keyed = {}
+    for feature, body in zip(features, bodies):
+        key = feature_key(feature)
+        if key is not None:
+            keyed[key] = body
+    return keyed
+
+
+def _append_change(added: List[Dict[str, Any]], changed: List[Dict[str, Any]],
+                   removed: List[str]) -> Optional[int]:
+    """
+    Record a generation in the shared change feed, unless it is empty. Called
+    after the new file is in place, so no worker serves a generation whose
+    file it cannot see yet.
+
+    Returns:
+        The new generation, or None if nothing changed
+    """
+    if not (added or changed or removed):
+        return None
+
+    with SessionLocal() as db:
+        change = models.ConstructionChange(added=added, changed=changed, removed=removed)
+        db.add(change)
+        db.flush()
+        generation = change.generation
+        db.query(models.ConstructionChange).filter(
+            models.ConstructionChange.generation <= generation - CHANGE_LOG_SIZE
+        ).delete(synchronize_session=False)
+        db.commit()
+    logger.info(
+        f"Construction generation {generation}: "
+        f"{len(added)} added, {len(changed)} changed, {len(removed)} removed"
+    )
+    return generation
+
+
+def current_generation() -> int:
+    """Latest generation of the change feed; 0 if none is recorded or the database is unavailable."""
+    try:
+        with SessionLocal() as db:
+            return db.query(func.max(models.ConstructionChange.generation)).scalar() or 0
+    except Exception as e:
+        logger.error(f"Failed to read the construction change feed generation: {e}")
+        return 0
+
+
+def get_construction_changes(since: int) -> Dict[str, Any]:
+    """
+    Net changes between generation ``since`` and the current generation.
+
+    If ``since`` is no longer (or not yet) covered by the last CHANGE_LOG_SIZE
+    generations, the result has ``resync`` set and the client should refetch
+    the full GeoJSON.
+    """
+    table = models.ConstructionChange
+    with SessionLocal() as db:
+        oldest, generation = db.query(func.min(table.generation), func.max(table.generation)).one()
+        generation = generation or 0
+        oldest = oldest or generation + 1
+        entries = db.query(table).filter(table.generation > since).order_by(table.generation).all()
+
+    result: Dict[str, Any] = {
+        "generation": generation,
+        "since": since,
+        "resync": False,
+        "added": [],
+        "changed": [],
+        "removed": [],
+    }
+    if since > generation or (since < generation and since < oldest - 1):
+        result["resync"] = True
+        return result
+
+    # Fold generations into a net delta per key
+    existed_before: Dict[str, bool] = {}
+    latest: Dict[str, Optional[Dict[str, Any]]] = {}
+    for change in entries:
+        for feature in change.added:
+            key = feature_key(feature)
+            existed_before.setdefault(key, False)
+            latest[key] = feature
+        for feature in change.changed:
+            key = feature_key(feature)
+            existed_before.setdefault(key, True)
+            latest[key] = feature
+        for key in change.removed:
+            existed_before.setdefault(key, True)
+            latest[key] = None
+
+    for key, feature in latest.items():
+        if feature is None:
+            if existed_before[key]:
+                result["removed"].append(key)
+        elif existed_before[key]:
+            result["changed"].append(feature)
+        else:
+            result["added"].append(feature)
+    return result
+
 
 def update_construction_geojson_file(file_path: str) -> bool:
     """
@@ -160,9 +700,27 @@ def update_construction_geojson_file(file_path: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        geojson = fetch_construction_geojson()
-        save_geojson(geojson, file_path)
-        logger.info(f"Construction data file updated successfully: {file_path}")
+        previous = get_construction_snapshot(file_path)
+        logger.info("Fetching construction data from API...")
+        key = upstream.run(fetch_app_key())
+        try:
+            result = stream_construction_update(file_path, key, previous, allow_empty=False)
+        except AppKeyRejected as e:
+            logger.warning(f"{e}; retrying with a fresh AppKey")
+            key = upstream.run(fetch_app_key(force_refresh=True))
+            result = stream_construction_update(file_path, key, previous)
+        
+        # Identical upstream data: nothing was renamed into place, so the
+        # snapshot, change feed and tiles stay as they are
+        if result["skipped"]:
+            health.increment("construction_refresh_skipped")
+            logger.info(f"Upstream construction data unchanged ({result['digest'][:12]}), skipping update")
+            return True
+        
+        health.increment("construction_refresh_applied")
+        get_construction_snapshot(file_path)  # rebuild the snapshot from the new file
+        vector_tiles.invalidate_layer(vector_tiles.CONSTRUCTION_LAYER)
+        logger.info(f"Construction data file updated successfully: {file_path} ({result['feature_count']} features)")
         return True
         
     except Exception as e:
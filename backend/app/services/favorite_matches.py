@@ -0,0 +1,371 @@
+"""
+收藏與進行中施工的配對表（favorite_construction_matches）維護
+
+配對以 construction_index 的進行中施工快照為準，增量更新：
+- 收藏新增、更新或刪除時，只重算該收藏的配對（refresh_favorite）
+- 快照版本變更時（匯入、座標更新、跨日、其他程序寫入），只把新增或移動的施工點
+  與所有收藏比對，已不在快照中的施工刪除配對（sync）
+多個程序（worker）共用配對表，PostgreSQL 上以 advisory lock 讓改寫依序進行；
+配對表對應的施工點位置存在 service_state，任何程序都從它比對差異，不會各自整表重建。
+通知檢查與「附近施工」列表因此只需讀取有索引的配對表。
+
+距離取收藏的座標點與線形（favorite_shapes：路線與道路收藏的整條線）中較近者。
+座標點用 distance_threshold；線形用道路或路線各自的通知距離（road_distance_threshold、
+route_distance_threshold），避免整條線套用地點的大半徑。
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import construction_index, favorite_shapes, proximity, service_state
+from .construction_index import ActiveConstruction, ActiveSnapshot
+from .proximity import Polyline, np
+from .spatial_index import GridIndex, bbox_window, haversine_meters, radius_window
+
+logger = logging.getLogger(__name__)
+
+# 收藏沒有設定通知距離時的預設值（公尺）
+DEFAULT_THRESHOLD_METERS = 1000.0
+# 道路與路線收藏沒有設定線形通知距離時的預設值（公尺），與 models.Favorite 欄位預設一致
+DEFAULT_ROAD_THRESHOLD_METERS = 15.0
+DEFAULT_ROUTE_THRESHOLD_METERS = 50.0
+# IN 條件每批的 id 數量
+CHUNK_SIZE = 500
+# 收藏空間索引的格子大小（度）
+FAVORITE_INDEX_CELL_SIZE = 0.01
+# 改寫配對表時持有的 PostgreSQL advisory lock 編號
+MATCH_LOCK_KEY = 0x66636D31
+# service_state 中配對表目前對應的施工點位置（notice id 對應 [lon, lat]）
+MATCH_POINTS_KEY = "favorite_match_points"
+
+
+def get_favorite_coordinates(favorite: models.Favorite) -> list[tuple[float, float]]:
+    """從收藏中提取座標點列表"""
+    coordinates = []
+
+    if favorite.type == 'place':
+        # 地點類型：使用 lat/lon
+        if favorite.lat is not None and favorite.lon is not None:
+            coordinates.append((favorite.lat, favorite.lon))
+    elif favorite.type == 'road':
+        # 道路類型：需要從 road_osmids 查詢道路段座標
+        # 這裡簡化處理，如果有 lat/lon 就使用
+        if favorite.lat is not None and favorite.lon is not None:
+            coordinates.append((favorite.lat, favorite.lon))
+        # 道路段的線形見 favorite_shapes（點到線距離）
+    elif favorite.type == 'route':
+        # 路線類型：使用起點和終點
+        if favorite.route_start_coords:
+            coords = favorite.route_start_coords
+            if isinstance(coords, dict) and 'lat' in coords and 'lon' in coords:
+                coordinates.append((coords['lat'], coords['lon']))
+        if favorite.route_end_coords:
+            coords = favorite.route_end_coords
+            if isinstance(coords, dict) and 'lat' in coords and 'lon' in coords:
+                coordinates.append((coords['lat'], coords['lon']))
+        # 路線全線見 favorite_shapes（點到線距離）
+
+    return coordinates
+
+
+def favorite_threshold(favorite: models.Favorite) -> float:
+    """收藏座標點的通知距離"""
+    return favorite.distance_threshold or DEFAULT_THRESHOLD_METERS
+
+
+def line_threshold(favorite: models.Favorite) -> float:
+    """道路或路線收藏線形的通知距離（點到線距離）"""
+    if favorite.type == 'road':
+        return favorite.road_distance_threshold or DEFAULT_ROAD_THRESHOLD_METERS
+    return favorite.route_distance_threshold or DEFAULT_ROUTE_THRESHOLD_METERS
+
+
+def _favorite_points(favorites: Iterable[models.Favorite]) -> Tuple[List[int], List[float], List[float], List[float]]:
+    """所有收藏的座標點攤平成 (favorite_id, lat, lon, 通知距離) 四個對齊的列表；同一收藏的點相鄰"""
+    favorite_ids, lats, lons, thresholds = [], [], [], []
+    for favorite in favorites:
+        threshold_meters = favorite_threshold(favorite)
+        for fav_lat, fav_lon in get_favorite_coordinates(favorite):
+            favorite_ids.append(favorite.id)
+            lats.append(fav_lat)
+            lons.append(fav_lon)
+            thresholds.append(threshold_meters)
+    return favorite_ids, lats, lons, thresholds
+
+
+def _point_pairs(favorite_ids: List[int], lats: List[float], lons: List[float], thresholds: List[float],
+                 con_lats, con_lons) -> tuple:
+    """
+    收藏座標點與施工點的批次距離比對（proximity.within_distance，需要 NumPy）
+
+    Returns:
+        (favorite_id, 施工位置, 距離) 三個對齊的 ndarray，同一配對可能出現多次
+    """
+    rows, cols, distances = proximity.within_distance(lats, lons, thresholds, con_lats, con_lons)
+    owners = np.asarray(favorite_ids, dtype=np.int64)[np.asarray(rows, dtype=np.intp)]
+    return owners, np.asarray(cols, dtype=np.intp), np.asarray(distances, dtype=np.float64)
+
+
+def _polyline_pairs(favorites: List[models.Favorite], shapes: Dict[int, Polyline],
+                    con_lats, con_lons) -> tuple:
+    """
+    收藏線形與施工點的距離比對（需要 NumPy）：先以線形外框加通知距離篩出候選施工，
+    再計算點到線距離
+
+    Returns:
+        (favorite_id, 施工位置, 距離) 三個對齊的 ndarray
+    """
+    group_parts = [np.empty(0, dtype=np.int64)]
+    col_parts = [np.empty(0, dtype=np.intp)]
+    distance_parts = [np.empty(0, dtype=np.float64)]
+    for favorite in favorites:
+        polyline = shapes.get(favorite.id)
+        if polyline is None:
+            continue
+        threshold_meters = line_threshold(favorite)
+        min_lon, min_lat, max_lon, max_lat = bbox_window(polyline.bbox, threshold_meters)
+        candidates = np.nonzero(
+            (con_lons >= min_lon) & (con_lons <= max_lon) & (con_lats >= min_lat) & (con_lats <= max_lat)
+        )[0]
+        if not len(candidates):
+            continue
+        distances = proximity.polyline_distances(
+            con_lats[candidates], con_lons[candidates], polyline, threshold_meters
+        )
+        keep = distances <= threshold_meters
+        group_parts.append(np.full(int(keep.sum()), favorite.id, dtype=np.int64))
+        col_parts.append(candidates[keep])
+        distance_parts.append(distances[keep])
+    return np.concatenate(group_parts), np.concatenate(col_parts), np.concatenate(distance_parts)
+
+
+def _nearest_pairs(point_pairs: tuple, polyline_pairs: tuple, n_cols: int) -> Tuple[List[int], List[int], List[float]]:
+    """合併座標點與線形的比對結果，每個 (收藏, 施工) 取最短距離"""
+    return proximity.nearest_per_group(
+        *(np.concatenate((a, b)) for a, b in zip(point_pairs, polyline_pairs)), max(n_cols, 1)
+    )
+
+
+def _polyline_hits(polyline: Polyline, threshold_meters: float,
+                   constructions: List[ActiveConstruction]) -> List[Tuple[ActiveConstruction, float]]:
+    """候選施工中距離線形在通知距離內者（沒有 NumPy 時逐一計算）"""
+    distances = proximity.polyline_distances(
+        [c.lat for c in constructions], [c.lon for c in constructions], polyline, threshold_meters
+    )
+    return [(c, float(d)) for c, d in zip(constructions, distances) if d <= threshold_meters]
+
+
+def nearby_by_favorite(favorites: Iterable[models.Favorite],
+                       snapshot: ActiveSnapshot) -> Dict[int, List[Tuple[ActiveConstruction, float]]]:
+    """
+    多個收藏通知距離內的進行中施工；有 NumPy 時所有座標點與所有施工一次向量化計算，
+    否則逐點查詢快照的空間索引；路線與道路收藏另以線形計算點到線距離
+
+    Returns:
+        favorite_id 對應 (施工, 最短距離公尺) 列表的字典，列表依施工 id 排序；
+        沒有附近施工的收藏不在其中
+    """
+    favorites = list(favorites)
+    favorite_ids, lats, lons, thresholds = _favorite_points(favorites)
+    shapes = favorite_shapes.polylines(favorites)
+    constructions = snapshot.constructions
+    if np is not None:
+        found = _nearest_pairs(
+            _point_pairs(favorite_ids, lats, lons, thresholds, snapshot.lats, snapshot.lons),
+            _polyline_pairs(favorites, shapes, snapshot.lats, snapshot.lons),
+            len(constructions),
+        )
+    else:
+        position = {construction.id: i for i, construction in enumerate(constructions)}
+        groups, cols, distances = [], [], []
+        for favorite_id, fav_lat, fav_lon, threshold_meters in zip(favorite_ids, lats, lons, thresholds):
+            for construction, distance in snapshot.index.query_radius(fav_lon, fav_lat, threshold_meters):
+                groups.append(favorite_id)
+                cols.append(position[construction.id])
+                distances.append(distance)
+        for favorite in favorites:
+            polyline = shapes.get(favorite.id)
+            if polyline is None:
+                continue
+            threshold_meters = line_threshold(favorite)
+            candidates = snapshot.index.query_bbox(*bbox_window(polyline.bbox, threshold_meters))
+            for construction, distance in _polyline_hits(polyline, threshold_meters, candidates):
+                groups.append(favorite.id)
+                cols.append(position[construction.id])
+                distances.append(distance)
+        # 多個座標點或線形時取最短距離
+        found = proximity.nearest_per_group(groups, cols, distances, max(len(constructions), 1))
+
+    # 快照依施工 id 排序，依位置排序即依 id 排序
+    result: Dict[int, List[Tuple[ActiveConstruction, float]]] = {}
+    for favorite_id, col, distance in zip(*found):
+        result.setdefault(favorite_id, []).append((constructions[col], distance))
+    return result
+
+
+def nearby_constructions(favorite: models.Favorite,
+                         snapshot: ActiveSnapshot) -> List[Tuple[ActiveConstruction, float]]:
+    """
+    收藏通知距離內的進行中施工
+
+    Returns:
+        (施工, 最短距離公尺) 列表，依施工 id 排序
+    """
+    return nearby_by_favorite([favorite], snapshot).get(favorite.id, [])
+
+
+def _chunks(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = list(ids)
+    for i in range(0, len(ids), CHUNK_SIZE):
+        yield ids[i:i + CHUNK_SIZE]
+
+
+def _insert_matches(db: Session, matches: Dict[Tuple[int, int], float]) -> None:
+    if matches:
+        db.execute(
+            models.FavoriteConstructionMatch.__table__.insert(),
+            [
+                {"favorite_id": favorite_id, "notice_id": notice_id, "distance_m": distance}
+                for (favorite_id, notice_id), distance in matches.items()
+            ],
+        )
+
+
+def _lock_matches(db: Session) -> None:
+    """在目前交易中取得配對表的跨程序鎖（commit 時釋放）；SQLite 只有單一寫入者，不需要"""
+    if db.get_bind().dialect.name == 'postgresql':
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MATCH_LOCK_KEY})
+
+
+class _MatchSync:
+    """記錄本程序上次同步的快照版本（每個程序各自一份；施工點位置存在資料庫）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version: Optional[int] = None
+
+
+_state = _MatchSync()
+
+
+def refresh_favorite(db: Session, favorite_id: int) -> int:
+    """
+    重算單一收藏的配對（收藏新增、更新或刪除後呼叫）
+
+    Returns:
+        該收藏目前的配對數量
+    """
+    favorite_shapes.invalidate(favorite_id)
+    with _state.lock:
+        _lock_matches(db)
+        db.query(models.FavoriteConstructionMatch).filter(
+            models.FavoriteConstructionMatch.favorite_id == favorite_id
+        ).delete(synchronize_session=False)
+        favorite = db.get(models.Favorite, favorite_id)
+        matches = {}
+        if favorite is not None:
+            snapshot = construction_index.get_snapshot(db)
+            matches = {
+                (favorite.id, construction.id): distance
+                for construction, distance in nearby_constructions(favorite, snapshot)
+            }
+            _insert_matches(db, matches)
+        db.commit()
+    logger.debug(f"Favorite {favorite_id}: {len(matches)} nearby constructions")
+    return len(matches)
+
+
+def _match_constructions(db: Session, constructions: List[ActiveConstruction]) -> Dict[Tuple[int, int], float]:
+    """所有收藏與指定施工的配對：有 NumPy 時一次向量化計算，否則用收藏座標點與線形的空間索引"""
+    favorites = db.query(models.Favorite).order_by(models.Favorite.id).all()
+    favorite_ids, lats, lons, thresholds = _favorite_points(favorites)
+    shapes = favorite_shapes.polylines(favorites)
+    matches: Dict[Tuple[int, int], float] = {}
+
+    def add(favorite_id: int, construction: ActiveConstruction, distance: float) -> None:
+        key = (favorite_id, construction.id)
+        if key not in matches or distance < matches[key]:
+            matches[key] = distance
+
+    if np is not None:
+        con_lats = np.array([c.lat for c in constructions], dtype=np.float64)
+        con_lons = np.array([c.lon for c in constructions], dtype=np.float64)
+        for favorite_id, col, distance in zip(*_nearest_pairs(
+            _point_pairs(favorite_ids, lats, lons, thresholds, con_lats, con_lons),
+            _polyline_pairs(favorites, shapes, con_lats, con_lons),
+            len(constructions),
+        )):
+            matches[(favorite_id, constructions[col].id)] = distance
+        return matches
+
+    index: GridIndex = GridIndex(FAVORITE_INDEX_CELL_SIZE)
+    for point in zip(favorite_ids, lats, lons, thresholds):
+        index.insert(point, *radius_window(point[2], point[1], point[3]))
+    line_index: GridIndex = GridIndex(FAVORITE_INDEX_CELL_SIZE)
+    for favorite in favorites:
+        polyline = shapes.get(favorite.id)
+        if polyline is not None:
+            threshold_meters = line_threshold(favorite)
+            line_index.insert((favorite.id, polyline, threshold_meters), *bbox_window(polyline.bbox, threshold_meters))
+
+    for construction in constructions:
+        for favorite_id, fav_lat, fav_lon, threshold_meters in index.query_bbox(
+            construction.lon, construction.lat, construction.lon, construction.lat
+        ):
+            distance = haversine_meters(fav_lat, fav_lon, construction.lat, construction.lon)
+            if distance <= threshold_meters:
+                add(favorite_id, construction, distance)
+        for favorite_id, polyline, threshold_meters in line_index.query_bbox(
+            construction.lon, construction.lat, construction.lon, construction.lat
+        ):
+            for _, distance in _polyline_hits(polyline, threshold_meters, [construction]):
+                add(favorite_id, construction, distance)
+    return matches
+
+
+def sync(db: Session) -> ActiveSnapshot:
+    """
+    讓配對表跟上目前的進行中施工快照；快照版本沒變時不做任何事
+
+    Returns:
+        配對表對應的快照
+    """
+    with _state.lock:
+        snapshot = construction_index.get_snapshot(db)
+        if snapshot.version == _state.version:
+            return snapshot
+
+        points = {c.id: (c.lon, c.lat) for c in snapshot.constructions}
+        table = models.FavoriteConstructionMatch.__table__
+        _lock_matches(db)
+        stored = service_state.get_state(db, MATCH_POINTS_KEY)
+        if stored is None:
+            # 配對表從未同步過：整表重建
+            changed = set(points)
+            db.execute(table.delete())
+        else:
+            previous = {int(notice_id): tuple(point) for notice_id, point in stored.items()}
+            changed = {notice_id for notice_id, point in points.items() if previous.get(notice_id) != point}
+            stale = changed | (set(previous) - set(points))
+            for chunk in _chunks(stale):
+                db.execute(table.delete().where(table.c.notice_id.in_(chunk)))
+
+        matches = {}
+        if changed:
+            matches = _match_constructions(db, [c for c in snapshot.constructions if c.id in changed])
+            _insert_matches(db, matches)
+        service_state.set_state(
+            db, MATCH_POINTS_KEY, {str(notice_id): list(point) for notice_id, point in points.items()}
+        )
+        db.commit()
+
+        _state.version = snapshot.version
+        logger.info(
+            f"Favorite matches synced to snapshot v{snapshot.version}: "
+            f"{len(changed)} constructions evaluated, {len(matches)} matches"
+        )
+        return snapshot
@@ -0,0 +1,166 @@
+"""
+收藏的線形快取（路線與道路收藏的點到線距離用）
+
+- 路線收藏：route_feature_collection 中的 LineString / MultiLineString
+- 道路收藏：road_osmids 對應的 road_segments 幾何
+
+線形簡化後存成 proximity.Polyline（含每段外框），依收藏 id 快取；收藏的類型、
+更新時間或 road_osmids 改變時重建，收藏更新後 favorite_matches.refresh_favorite 也會
+呼叫 invalidate。road_segments 被其他程序重新匯入時，由資料表指紋偵測（最多延遲
+ROAD_FINGERPRINT_INTERVAL 秒）並重建道路收藏的線形。
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+from sqlalchemy import text
+from sqlalchemy.orm import Session, object_session
+
+from .. import models
+from .proximity import Polyline, build_polyline
+from .spatial_index import Point, linestrings
+
+logger = logging.getLogger(__name__)
+
+# 快取的收藏線形數量
+SHAPE_CACHE_SIZE = 4096
+# IN 條件每批的 osmid 數量
+CHUNK_SIZE = 500
+# 檢查 road_segments 是否被其他程序更新的間隔（秒）
+ROAD_FINGERPRINT_INTERVAL = 60
+
+
+def route_lines(geojson: Any) -> List[List[Point]]:
+    """從路線 GeoJSON（FeatureCollection、Feature 或 geometry，可為 JSON 字串）取出所有線的 (lon, lat) 座標"""
+    if isinstance(geojson, str):
+        try:
+            geojson = json.loads(geojson)
+        except ValueError:
+            return []
+    if not isinstance(geojson, dict):
+        return []
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        return [line for feature in geojson.get('features') or [] for line in route_lines(feature)]
+    if kind == 'Feature':
+        return route_lines(geojson.get('geometry'))
+    if kind == 'GeometryCollection':
+        return [line for geometry in geojson.get('geometries') or [] for line in route_lines(geometry)]
+    return linestrings(geojson)
+
+
+def road_osmids(favorite: models.Favorite) -> Tuple[str, ...]:
+    """道路收藏的 osmid（統一為字串，去除重複）"""
+    osmids = getattr(favorite, 'road_osmids', None)
+    if isinstance(osmids, str):
+        try:
+            osmids = json.loads(osmids)
+        except ValueError:
+            osmids = [osmids]
+    if not isinstance(osmids, (list, tuple)):
+        return ()
+    return tuple(dict.fromkeys(str(osmid) for osmid in osmids if osmid is not None))
+
+
+def _version(favorite: models.Favorite) -> tuple:
+    """快取紀錄的版本：任何一項改變都要重建線形"""
+    osmids = road_osmids(favorite) if favorite.type == 'road' else ()
+    return favorite.type, getattr(favorite, 'updated_at', None), osmids
+
+
+def _road_geometries(db: Session, osmids: Iterable[str]) -> Dict[str, Any]:
+    """批次讀取 osmid 對應的道路幾何"""
+    osmids = list(dict.fromkeys(osmids))
+    geometries = {}
+    for i in range(0, len(osmids), CHUNK_SIZE):
+        chunk = osmids[i:i + CHUNK_SIZE]
+        for osmid, geometry in db.query(models.RoadSegment.osmid, models.RoadSegment.geometry).filter(
+            models.RoadSegment.osmid.in_(chunk)
+        ):
+            geometries[osmid] = geometry
+    return geometries
+
+
+class _ShapeCache:
+    """收藏 id 對應 (版本, 線形或 None) 的 LRU 快取（每個程序各自一份）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: LRUCache = LRUCache(maxsize=SHAPE_CACHE_SIZE)
+        self.road_fingerprint: Optional[tuple] = None
+        self.checked_at = 0.0
+
+    def check_roads(self, db: Session) -> None:
+        """road_segments 有變動時丟棄道路收藏的線形；呼叫者需持有 lock"""
+        now = time.monotonic()
+        if now - self.checked_at < ROAD_FINGERPRINT_INTERVAL:
+            return
+        fingerprint = tuple(db.execute(text(
+            "SELECT count(*), coalesce(max(id), 0), coalesce(sum(length_m), 0) FROM road_segments"
+        )).one())
+        self.checked_at = now
+        if self.road_fingerprint is not None and fingerprint != self.road_fingerprint:
+            for favorite_id in [k for k, (version, _) in self.entries.items() if version[0] == 'road']:
+                del self.entries[favorite_id]
+            logger.info("road_segments changed, dropped cached road favorite shapes")
+        self.road_fingerprint = fingerprint
+
+
+_cache = _ShapeCache()
+
+
+def polylines(favorites: Iterable[models.Favorite]) -> Dict[int, Polyline]:
+    """
+    路線與道路收藏的線形；未快取的道路收藏一次批次查詢 road_segments
+
+    Returns:
+        favorite_id 對應線形的字典；沒有線形的收藏（地點、缺少路線或道路資料）不在其中
+    """
+    favorites = [f for f in favorites if f.type in ('route', 'road')]
+    result: Dict[int, Polyline] = {}
+    if not favorites:
+        return result
+
+    with _cache.lock:
+        # 道路幾何要用收藏所屬的 session 查詢；沒有 session（未存入資料庫）的道路收藏不建線形
+        db = next((s for s in map(object_session, (f for f in favorites if f.type == 'road')) if s), None)
+        if db is not None:
+            _cache.check_roads(db)
+
+        missing = []
+        for favorite in favorites:
+            version = _version(favorite)
+            entry = _cache.entries.get(favorite.id)
+            if entry is not None and entry[0] == version:
+                if entry[1] is not None:
+                    result[favorite.id] = entry[1]
+            else:
+                missing.append((favorite, version))
+
+        geometries = {}
+        if db is not None:
+            geometries = _road_geometries(db, (
+                osmid for favorite, version in missing if favorite.type == 'road' for osmid in version[2]
+            ))
+
+        for favorite, version in missing:
+            if favorite.type == 'route':
+                lines = route_lines(favorite.route_feature_collection)
+            elif db is not None:
+                lines = [line for osmid in version[2] for line in linestrings(geometries.get(osmid))]
+            else:
+                continue
+            polyline = build_polyline(lines)
+            _cache.entries[favorite.id] = (version, polyline)
+            if polyline is not None:
+                result[favorite.id] = polyline
+    return result
+
+
+def invalidate(favorite_id: int) -> None:
+    """丟棄收藏的快取線形（收藏更新或刪除後呼叫）"""
+    with _cache.lock:
+        _cache.entries.pop(favorite_id, None)
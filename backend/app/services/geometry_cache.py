@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import CaseGeometryCache
+
+# IN 查詢每批的 caseid 數量
+LOOKUP_CHUNK_SIZE = 500
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """資料庫不保留時區時（如 SQLite）視為 UTC"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def retry_delay(failure_count: int) -> timedelta:
+    """連續失敗 failure_count 次後的重試間隔：指數退避，上限 GEOMETRY_RETRY_MAX_SECONDS"""
+    seconds = settings.GEOMETRY_RETRY_BASE_SECONDS * (2 ** max(failure_count - 1, 0))
+    return timedelta(seconds=min(seconds, settings.GEOMETRY_RETRY_MAX_SECONDS))
+
+
+def load_entries(session: Session, caseids: Iterable[str]) -> Dict[str, CaseGeometryCache]:
+    """
+    批次讀取 caseid 的快取紀錄
+
+    Returns:
+        caseid 對應快取紀錄的字典（沒有紀錄的 caseid 不在其中）
+    """
+    caseids = list(dict.fromkeys(c for c in caseids if c))
+    entries = {}
+    for i in range(0, len(caseids), LOOKUP_CHUNK_SIZE):
+        chunk = caseids[i:i + LOOKUP_CHUNK_SIZE]
+        for entry in session.query(CaseGeometryCache).filter(CaseGeometryCache.caseid.in_(chunk)):
+            entries[entry.caseid] = entry
+    return entries
+
+
+def cached_geometry(entry: Optional[CaseGeometryCache], now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """快取中仍在 GEOMETRY_CACHE_TTL_DAYS 內的 geometry，沒有或已過期時返回 None"""
+    if entry is None or not entry.geometry or entry.fetched_at is None:
+        return None
+    now = now or utcnow()
+    if now - _as_utc(entry.fetched_at) >= timedelta(days=settings.GEOMETRY_CACHE_TTL_DAYS):
+        return None
+    return entry.geometry
+
+
+def is_backing_off(entry: Optional[CaseGeometryCache], now: Optional[datetime] = None) -> bool:
+    """先前失敗且尚未到下次重試時間（負面快取）"""
+    if entry is None or not entry.failure_count or entry.next_retry_at is None:
+        return False
+    return _as_utc(entry.next_retry_at) > (now or utcnow())
+
+
+def record_success(session: Session, entries: Dict[str, CaseGeometryCache], caseid: str,
+                   xystring: str, geometry: Dict[str, Any], now: Optional[datetime] = None) -> CaseGeometryCache:
+    """記錄成功取得的座標（尚未 commit）"""
+    now = now or utcnow()
+    entry = entries.get(caseid)
+    if entry is None:
+        entry = entries[caseid] = CaseGeometryCache(caseid=caseid)
+    entry.xystring = xystring
+    entry.geometry = geometry
+    entry.fetched_at = now
+    entry.last_attempt_at = now
+    entry.failure_count = 0
+    entry.next_retry_at = None
+    entry.last_error = None
+    session.add(entry)
+    return entry
+
+
+def record_failure(session: Session, entries: Dict[str, CaseGeometryCache], caseid: str,
+                   error: str, xystring: Optional[str] = None,
+                   now: Optional[datetime] = None) -> CaseGeometryCache:
+    """記錄失敗並排定下次重試時間（尚未 commit）；先前成功取得的 geometry 保留"""
+    now = now or utcnow()
+    entry = entries.get(caseid)
+    if entry is None:
+        entry = entries[caseid] = CaseGeometryCache(caseid=caseid, failure_count=0)
+    if xystring is not None:
+        entry.xystring = xystring
+    entry.failure_count = (entry.failure_count or 0) + 1
+    entry.last_attempt_at = now
+    entry.next_retry_at = now + retry_delay(entry.failure_count)
+    entry.last_error = (error or "unknown error")[:500]
+    session.add(entry)
+    return entry
@@ -0,0 +1,45 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Process-wide record of background job runs, reported by /readyz
+_lock = threading.Lock()
+_started_at = datetime.now()
+_jobs: Dict[str, Dict[str, Any]] = {}
+_counters: Dict[str, int] = {}
+
+
+def record_job_start(name: str) -> None:
+    """Mark a background job as running."""
+    with _lock:
+        job = _jobs.setdefault(name, {"runs": 0, "last_success_at": None, "last_error": None})
+        job["running"] = True
+        job["last_started_at"] = datetime.now().isoformat()
+
+
+def record_job_result(name: str, success: bool, message: Optional[str] = None) -> None:
+    """Record the outcome of a background job run."""
+    with _lock:
+        job = _jobs.setdefault(name, {"runs": 0, "last_success_at": None, "last_error": None})
+        job["running"] = False
+        job["runs"] += 1
+        job["last_finished_at"] = datetime.now().isoformat()
+        if success:
+            job["last_success_at"] = job["last_finished_at"]
+        else:
+            job["last_error"] = message or "failed"
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Bump a process-wide counter metric."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def job_status() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "started_at": _started_at.isoformat(),
+            "jobs": {name: dict(job) for name, job in _jobs.items()},
+            "counters": dict(_counters),
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import random
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, TypeVar
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Statuses worth retrying: throttling and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 10.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class UpstreamClient:
+    """
+    Shared, pooled aiohttp client for upstream (dig.taipei) requests.
+
+    The session lives on a dedicated event loop thread so both async code and
+    the scheduler's worker threads (through ``run``) reuse the same keep-alive
+    connections, and a slow upstream never ties up the application's loop.
+    """
+
+    def __init__(self, limit: int = 32, limit_per_host: int = 16):
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="upstream-http", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the client's loop from synchronous code and wait for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Return the shared session; must be awaited on the client's loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                ttl_dns_cache=300,
+                ssl=False,  # dig.taipei's certificate chain does not verify
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _open(
+        self,
+        method: str,
+        url: str,
+        client_timeout: aiohttp.ClientTimeout,
+        retries: int,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a request and return the open response, retrying connection
+        errors, timeouts and RETRY_STATUSES with jittered exponential backoff.
+        The caller must release the response.
+        """
+        session = await self.session()
+        attempt = 0
+        while True:
+            try:
+                response = await session.request(method, url, timeout=client_timeout, **kwargs)
+                if response.status in RETRY_STATUSES and attempt < retries:
+                    response.release()
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history,
+                        status=response.status, message=response.reason or "",
+                    )
+                response.raise_for_status()
+                return response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if not retryable or attempt >= retries:
+                    raise
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.warning(f"{method} {url} failed ({type(e).__name__}: {e}); retry {attempt}/{retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        timeout: float = 30,
+        retries: int = 3,
+        **kwargs: Any,
+    ) -> bytes:
+        """Perform a request with retries and return the whole response body."""
+        client_timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 10))
+        response = await self._open(method, url, client_timeout, retries, **kwargs)
+        async with response:
+            return await response.read()
+
+    async def iter_chunks(
+        self,
+        url: str,
+        *,
+        timeout: float = 30,
+        retries: int = 3,
+        chunk_size: int = 64 * 1024,
+        **kwargs: Any,
+    ) -> AsyncIterator[bytes]:
+        """
+        GET a URL and yield its body in chunks. Only establishing the response
+        is retried; ``timeout`` bounds each read rather than the whole body.
+        """
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=min(timeout, 10), sock_read=timeout)
+        response = await self._open("GET", url, client_timeout, retries, **kwargs)
+        async with response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """Consume an async iterator running on the client's loop from synchronous code."""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
+
+    async def get_text(self, url: str, *, encoding: str = "utf-8", **kwargs: Any) -> str:
+        body = await self.request("GET", url, **kwargs)
+        return body.decode(encoding, errors="replace")
+
+    async def _close_session(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close(self) -> None:
+        """Close the session and stop the loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), loop).result(5)
+        except Exception as e:
+            logger.debug(f"Error closing upstream HTTP session: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        loop.close()
+
+
+# Process-wide client shared by all dig.taipei fetchers
+upstream = UpstreamClient()
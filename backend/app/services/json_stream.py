@@ -0,0 +1,72 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally parse a top-level JSON array from byte chunks, yielding each
+    element as soon as it is complete. Only the unparsed tail of the input is
+    buffered, so memory stays bounded by the largest single element.
+
+    Raises:
+        ValueError: if the input is not a well-formed JSON array
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    source = iter(chunks)
+    buf, pos, eof = "", 0, False
+    started, expect_value = False, True
+
+    def fill() -> None:
+        nonlocal buf, pos, eof
+        chunk = next(source, None)
+        if chunk is None:
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+            eof = True
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        ch = buf[pos]
+        if not started:
+            if ch != "[":
+                raise ValueError(f"Expected a JSON array, got {buf[pos:pos + 200]!r}")
+            started = True
+            pos += 1
+            continue
+
+        if ch == "]":
+            return
+        if not expect_value:
+            if ch != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array at {buf[pos:pos + 50]!r}")
+            expect_value = True
+            pos += 1
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        # A scalar ending exactly at the buffer edge may continue in the next chunk
+        if end == len(buf) and not eof:
+            fill()
+            continue
+        yield value
+        pos = end
+        expect_value = False
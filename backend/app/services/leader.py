@@ -0,0 +1,84 @@
+"""
+Leader election for the scheduled background jobs.
+
+Every API worker starts the same APScheduler jobs, but they write shared
+files (construction.geojson and its variants) and shared tables, so only one
+worker per database runs them. The leader is the worker holding a
+session-level Postgres advisory lock on a dedicated connection. The lock is
+released when that connection closes, so if the leader dies another worker
+takes over at its next job run.
+
+On other databases (SQLite in development and tests) there is a single
+process and it is always the leader.
+"""
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key held by the scheduler leader ("tpjb")
+LEADER_LOCK_KEY = 0x74706A62
+
+
+class SchedulerLeader:
+    """Tracks whether this process holds the leader lock, trying to take it when asked."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connection: Optional[Connection] = None
+
+    def is_leader(self) -> bool:
+        """True if this process holds the leader lock, acquiring it if no other worker does."""
+        if engine.dialect.name != "postgresql":
+            return True
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute(text("SELECT 1"))
+                    return True
+                except Exception as e:
+                    # The lock went away with the connection
+                    logger.warning(f"Lost the scheduler leader connection: {e}")
+                    self._close()
+
+            connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = connection.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}
+                ).scalar()
+            except Exception:
+                connection.close()
+                raise
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+            logger.info("This worker is now the scheduler leader")
+            return True
+
+    def release(self) -> None:
+        """Give up leadership (on shutdown)."""
+        with self._lock:
+            if self._connection is None:
+                return
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_KEY})
+            except Exception as e:
+                logger.warning(f"Failed to release the scheduler leader lock: {e}")
+            self._close()
+
+    def _close(self) -> None:
+        try:
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+
+scheduler_leader = SchedulerLeader()
@@ -1,17 +1,33 @@
 import requests
 import re
 import json
-from bs4 import BeautifulSoup
+import threading
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import (
+    JSON, Boolean, Column, Date, Integer, MetaData, String, Table, Text,
+    and_, bindparam, case, cast, func, or_, select,
+)
 from typing import List, Dict, Any, Optional
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue
+from ..config import settings
 from ..models import ConstructionNotice
+from . import adaptive_fetch, construction_index, geometry_cache, service_state
+from .http_client import upstream
+from .notice_page import NoticePage, parse_notice_page
 import logging
 
+try:
+    import numpy as np
+except ImportError:  # 已列為依賴；缺少時批次座標轉換改用 list
+    np = None
+
 logger = logging.getLogger(__name__)
 
+if np is None:
+    logger.warning("numpy 未安裝，TWD97 批次座標轉換改用 list")
+
 BASE_URL = "https://dig.taipei/Tpdig/PWorkData.aspx"
 COORDINATE_API_URL = "https://dig.taipei/TpdigR.net/Map/caseMap3.ashx"
 
@@ -32,6 +48,35 @@ def extract_caseid_from_url(url: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
+# pyproj 的 Transformer 不可跨執行緒共用，每個執行緒各自建立一次並重複使用
+_transformer_local = threading.local()
+
+
+def get_twd97_transformer():
+    """
+    取得目前執行緒的 TWD97 → WGS84 Transformer（建立成本遠高於轉換本身，因此快取）
+    
+    Raises:
+        ImportError: 未安裝 pyproj
+    """
+    transformer = getattr(_transformer_local, "transformer", None)
+    if transformer is None:
+        from pyproj import Transformer
+        
+        # TWD97 / TM2 zone 121 (EPSG:3826) -> WGS84 (EPSG:4326)
+        transformer = Transformer.from_crs("EPSG:3826", "EPSG:4326", always_xy=True)
+        _transformer_local.transformer = transformer
+    return transformer
+
+
+def _approximate_twd97_to_wgs84(x, y):
+    """簡化的近似轉換（不精確，建議安裝 pyproj）；x, y 可為數值、list 或 NumPy 陣列"""
+    if isinstance(x, (list, tuple)):
+        return ([121.0 + (v - 250000) / 111320.0 for v in x],
+                [24.0 + (v - 2750000) / 110540.0 for v in y])
+    return 121.0 + (x - 250000) / 111320.0, 24.0 + (y - 2750000) / 110540.0
+
+
 def twd97_to_wgs84(x: float, y: float) -> tuple[float, float]:
     """
     將 TWD97 座標轉換為 WGS84 經緯度
@@ -44,122 +89,209 @@ def twd97_to_wgs84(x: float, y: float) -> tuple[float, float]:
         (longitude, latitude) 元組
     """
     try:
-        # 使用 pyproj 進行座標轉換
-        from pyproj import Transformer
-        
-        # TWD97 / TM2 zone 121 (EPSG:3826) -> WGS84 (EPSG:4326)
-        transformer = Transformer.from_crs("EPSG:3826", "EPSG:4326", always_xy=True)
-        lon, lat = transformer.transform(x, y)
+        lon, lat = get_twd97_transformer().transform(x, y)
         return float(lon), float(lat)
     except ImportError:
         logger.warning("pyproj not installed, using approximate conversion")
-        # 簡化的近似轉換（不精確，建議安裝 pyproj）
-        # TWD97 到 WGS84 的近似轉換
-        lon = 121.0 + (x - 250000) / 111320.0
-        lat = 24.0 + (y - 2750000) / 110540.0
-        return lon, lat
+        return _approximate_twd97_to_wgs84(x, y)
     except Exception as e:
         logger.error(f"Failed to convert coordinates ({x}, {y}): {e}")
         return None, None
 
 
-def parse_xystring_to_geojson(xystring: str) -> Optional[Dict[str, Any]]:
+def twd97_to_wgs84_batch(x, y):
     """
-    將 XYSTRING 座標字串轉換為 GeoJSON Point（只取第一個座標點）
+    一次轉換多個 TWD97 座標為 WGS84 經緯度
     
     Args:
-        xystring: 座標字串，格式如 "306329.019,2768888.675,306343.515,2768885.437,..."
+        x: TWD97 X 座標序列（list 或 NumPy 陣列）
+        y: TWD97 Y 座標序列，長度與 x 相同
     
     Returns:
-        GeoJSON Point 格式的字典，如果解析失敗則返回 None
+        (longitudes, latitudes) 陣列（缺少 NumPy 時為 list）。轉換失敗時返回 (None, None)
     """
-    if not xystring or not xystring.strip():
-        return None
-    
+    if np is not None:
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+    else:
+        x = [float(v) for v in x]
+        y = [float(v) for v in y]
     try:
+        return get_twd97_transformer().transform(x, y)
+    except ImportError:
+        logger.warning("pyproj not installed, using approximate conversion")
+        return _approximate_twd97_to_wgs84(x, y)
+    except Exception as e:
+        logger.error(f"Failed to convert {len(x)} coordinates: {e}")
+        return None, None
+
+
+def parse_xystrings_to_geojson(xystrings: List[Optional[str]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    將多個 XYSTRING 座標字串轉換為 GeoJSON Point（每個只取第一個座標點），座標一次批次轉換
+    
+    Args:
+        xystrings: 座標字串列表，格式如 "306329.019,2768888.675,306343.515,2768885.437,..."
+    
+    Returns:
+        與輸入等長的列表，解析失敗的位置為 None
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(xystrings)
+    indices, xs, ys = [], [], []
+    for idx, xystring in enumerate(xystrings):
+        if not xystring or not xystring.strip():
+            continue
+        
         # 只分割並取前兩個座標值（第一個座標點），不解析所有座標
-        parts = xystring.split(',')
+        parts = xystring.split(',', 2)
         if len(parts) < 2:
             logger.warning(f"Invalid coordinate string: not enough values")
-            return None
-        
-        # 只解析第一個座標點 (x, y)
-        first_x = float(parts[0].strip())
-        first_y = float(parts[1].strip())
-        
-        # 轉換為 WGS84 座標
-        lon, lat = twd97_to_wgs84(first_x, first_y)
-        if lon is None or lat is None:
-            logger.warning(f"Failed to convert coordinates ({first_x}, {first_y})")
-            return None
-        
+            continue
+        try:
+            first_x = float(parts[0].strip())
+            first_y = float(parts[1].strip())
+        except ValueError as e:
+            logger.warning(f"Failed to parse first coordinate from XYSTRING: {e}")
+            continue
+        indices.append(idx)
+        xs.append(first_x)
+        ys.append(first_y)
+    
+    if not indices:
+        return results
+    
+    # 轉換為 WGS84 座標
+    lons, lats = twd97_to_wgs84_batch(xs, ys)
+    if lons is None or lats is None:
+        return results
+    
+    for idx, lon, lat in zip(indices, lons, lats):
         # 構建 GeoJSON Point
-        return {
+        results[idx] = {
             "type": "Point",
-            "coordinates": [lon, lat]
+            "coordinates": [float(lon), float(lat)]
         }
-    except (ValueError, IndexError) as e:
-        logger.warning(f"Failed to parse first coordinate from XYSTRING: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Failed to parse XYSTRING '{xystring}': {e}", exc_info=True)
-        return None
+    return results
 
 
-def fetch_coordinates_for_case(caseid: str, http_session: requests.Session = None) -> Optional[Dict[str, Any]]:
+def parse_xystring_to_geojson(xystring: str) -> Optional[Dict[str, Any]]:
     """
-    從 API 獲取指定 caseid 的座標資料
+    將 XYSTRING 座標字串轉換為 GeoJSON Point（只取第一個座標點）
     
     Args:
-        caseid: 案件 ID
-        http_session: 可選的 requests.Session 用於連接復用
+        xystring: 座標字串，格式如 "306329.019,2768888.675,306343.515,2768885.437,..."
     
     Returns:
-        包含座標資料的字典，如果獲取失敗則返回 None
+        GeoJSON Point 格式的字典，如果解析失敗則返回 None
     """
-    if not caseid:
-        return None
+    return parse_xystrings_to_geojson([xystring])[0]
+
+
+async def fetch_case_xystring_async(caseid: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    以共用的 aiohttp client 獲取 caseid 的原始 XYSTRING
     
+    Returns:
+        (XYSTRING, 錯誤訊息) 元組；API 回應但沒有座標時 XYSTRING 為 None
+    
+    Raises:
+        連線錯誤、逾時與 HTTP 錯誤會直接拋出，讓 adaptive_fetch 視為壅塞訊號
+    """
+    url = f"{COORDINATE_API_URL}?cmode=DIGPWORK&caseid={caseid}"
+    body = await upstream.request("GET", url, timeout=5, retries=1)
     try:
-        url = f"{COORDINATE_API_URL}?cmode=DIGPWORK&caseid={caseid}"
-        if http_session:
-            response = http_session.get(url, timeout=5)
-        else:
-            response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
-        if isinstance(data, list) and len(data) > 0:
-            return data[0]  # 返回第一個結果
-        return None
-    except requests.exceptions.Timeout:
-        logger.debug(f"Timeout fetching coordinates for caseid {caseid}")
-        return None
-    except Exception as e:
-        logger.debug(f"Failed to fetch coordinates for caseid {caseid}: {e}")
-        return None
+        data = json.loads(body)
+    except ValueError:
+        return None, "invalid JSON response"
+    
+    if not isinstance(data, list) or len(data) == 0:
+        return None, "no coordinates returned"
+    xystring = data[0].get('XYSTRING') if isinstance(data[0], dict) else None
+    if not xystring:
+        return None, "no XYSTRING in response"
+    return xystring, None
 
 
-def fetch_geometry_for_notice(notice_data: Dict[str, Any], http_session: requests.Session) -> Optional[Dict[str, Any]]:
+def resolve_case_geometries(session: Session, caseids, commit: bool = True) -> tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
     """
-    為單個 notice 獲取 geometry（用於並行處理）
+    取得多個 caseid 的 geometry，先查 case_geometry_cache，只對沒有快取、快取過期
+    或已到重試時間的 caseid 呼叫 API，結果（含失敗）寫回快取
+    
+    API 以 asyncio 並行呼叫，並行數依延遲與錯誤率自動調整（AIMD），
+    且不超過 GEOMETRY_FETCH_MAX_RPS
     
     Args:
-        notice_data: notice 資料字典
-        http_session: requests.Session 用於連接復用
+        session: 資料庫 session
+        caseids: caseid 序列
+        commit: 是否提交快取的變更；False 時只 flush，由呼叫端在同一個交易中提交
     
     Returns:
-        (notice_data, geometry) 元組，如果獲取失敗則 geometry 為 None
+        (caseid 對應 geometry 的字典, 統計資料) 元組
     """
-    caseid = extract_caseid_from_url(notice_data.get('url')) if notice_data.get('url') else None
-    if not caseid:
-        return None
+    now = geometry_cache.utcnow()
+    caseids = list(dict.fromkeys(c for c in caseids if c))
+    entries = geometry_cache.load_entries(session, caseids)
     
-    coord_data = fetch_coordinates_for_case(caseid, http_session)
-    if coord_data and coord_data.get('XYSTRING'):
-        geometry = parse_xystring_to_geojson(coord_data['XYSTRING'])
-        return geometry
-    return None
+    geometries = {}
+    to_fetch = []
+    stats = {"cache_hits": 0, "backoff_skipped": 0, "fetched": 0, "failed": 0}
+    for caseid in caseids:
+        entry = entries.get(caseid)
+        geometry = geometry_cache.cached_geometry(entry, now)
+        if geometry:
+            geometries[caseid] = geometry
+            stats["cache_hits"] += 1
+        elif geometry_cache.is_backing_off(entry, now):
+            # 先前失敗，等到下次重試時間再呼叫；過期的 geometry 仍可使用
+            if entry.geometry:
+                geometries[caseid] = entry.geometry
+            stats["backoff_skipped"] += 1
+        else:
+            to_fetch.append(caseid)
+    
+    if to_fetch:
+        # 並行獲取座標，取得後再一次批次轉換
+        raw_results, batch = upstream.run(adaptive_fetch.fetch_all(
+            to_fetch,
+            fetch_case_xystring_async,
+            max_rps=settings.GEOMETRY_FETCH_MAX_RPS,
+            max_concurrency=settings.GEOMETRY_FETCH_MAX_CONCURRENCY,
+            label="caseMap3.ashx",
+        ))
+        stats.update(batch.as_dict())
+        results = {
+            caseid: (None, f"{type(result).__name__}: {result}") if isinstance(result, Exception) else result
+            for caseid, result in raw_results.items()
+        }
+        
+        fetched = [(caseid, xystring) for caseid, (xystring, _) in results.items() if xystring]
+        parsed = dict(zip(
+            (caseid for caseid, _ in fetched),
+            parse_xystrings_to_geojson([xystring for _, xystring in fetched]),
+        ))
+        for caseid, (xystring, error) in results.items():
+            geometry = parsed.get(caseid)
+            if geometry:
+                geometry_cache.record_success(session, entries, caseid, xystring, geometry, now)
+                geometries[caseid] = geometry
+                stats["fetched"] += 1
+            else:
+                entry = geometry_cache.record_failure(
+                    session, entries, caseid, error or "unparseable XYSTRING", xystring, now
+                )
+                if entry.geometry:
+                    geometries[caseid] = entry.geometry
+                stats["failed"] += 1
+        if commit:
+            session.commit()
+        else:
+            session.flush()
+    
+    logger.info(
+        f"座標查詢完成: 快取命中 {stats['cache_hits']} 筆，退避中略過 {stats['backoff_skipped']} 筆，"
+        f"API 成功 {stats['fetched']} 筆，失敗 {stats['failed']} 筆"
+    )
+    return geometries, stats
 
 
 def parse_roc_date_range(date_range_str: str) -> tuple[date | None, date | None]:
@@ -215,125 +347,251 @@ def parse_roc_date_range(date_range_str: str) -> tuple[date | None, date | None]
         return None, None
 
 
-def scrape_construction_notices(session: Session, max_pages: int = None) -> List[Dict[str, Any]]:
+def notice_key(notice_data: Dict[str, Any]) -> Optional[tuple]:
+    """
+    取得 notice 的比對鍵：優先用 caseid，其次 URL，否則用名稱
+    
+    Returns:
+        ('caseid', caseid)、('url', url) 或 ('name', name)，都沒有時返回 None
+    """
+    caseid = notice_data.get('caseid') or extract_caseid_from_url(notice_data.get('url'))
+    if caseid:
+        return ('caseid', caseid)
+    if notice_data.get('url'):
+        return ('url', notice_data['url'])
+    if notice_data.get('name'):
+        return ('name', notice_data['name'])
+    return None
+
+
+def load_notice_watermark(session: Session) -> set:
+    """
+    取得資料庫中已匯入的 notice 比對鍵（增量爬取的水位線）
+    
+    Args:
+        session: 資料庫 session
+    
+    Returns:
+        notice_key 的集合
+    """
+    rows = session.query(ConstructionNotice.caseid, ConstructionNotice.url, ConstructionNotice.name).all()
+    return {notice_key({'caseid': caseid, 'url': url, 'name': name}) for caseid, url, name in rows} - {None}
+
+
+class StaleFormStateError(Exception):
+    """伺服器拒絕重複使用的 ASP.NET 表單狀態（__VIEWSTATE 等）"""
+
+
+def parse_notice_rows(page: NoticePage) -> List[Dict[str, Any]]:
+    """
+    解析 GridView 中的施工通知資料列
+    
+    Args:
+        page: parse_notice_page 的解析結果
+    
+    Returns:
+        該頁的 notice 資料列表
+    """
+    notices = []
+    for row in page.rows:  # 已跳過表頭
+        tds = row.cells
+        if len(tds) >= 4:
+            # 解析欄位
+            date_range_str = tds[0]  # 日期範圍字串
+            notice_type = tds[1]  # 類型
+            unit = tds[2]  # 單位
+            name = tds[3]  # 名稱/道路
+            
+            # 數據驗證：跳過明顯異常的數據（名稱太短、只包含數字、或為空）
+            if not name or len(name) < 3 or (name.isdigit() and len(name) <= 2):
+                logger.debug(f"跳過異常數據: name='{name}', type='{notice_type}', unit='{unit}'")
+                continue
+            
+            # 解析日期範圍
+            start_date, end_date = parse_roc_date_range(date_range_str)
+            
+            # 提取 URL
+            url = None
+            if row.link_onclick is not None:
+                onclick = row.link_onclick
+                if onclick:
+                    match = re.search(r"window\.open\('([^']+)'\)", onclick)
+                    if match:
+                        url = match.group(1)
+            
+            # 提取道路名稱（從 name 中，如果包含括號）
+            road = None
+            if '(' in name and ')' in name:
+                match = re.search(r'\(([^)]+)\)', name)
+                if match:
+                    road = match.group(1)
+            
+            notice_data = {
+                'start_date': start_date,
+                'end_date': end_date,
+                'name': name,
+                'type': notice_type if notice_type else None,
+                'unit': unit if unit else None,
+                'road': road if road else name,  # 如果沒有提取到道路，就用名稱
+                'url': url,
+                'caseid': extract_caseid_from_url(url),
+                'geometry': None  # 稍後在保存時獲取
+            }
+            notices.append(notice_data)
+    return notices
+
+
+def post_page(http_session: requests.Session, form_state: Dict[str, str], page_num: int) -> tuple[NoticePage, int]:
+    """
+    以指定的表單狀態送出 GridView 分頁 postback
+    
+    Args:
+        http_session: requests.Session
+        form_state: 要送出的表單欄位
+        page_num: 頁碼
+    
+    Returns:
+        (回應頁面的解析結果, HTTP 狀態碼) 元組
+    """
+    form_data = dict(form_state)
+    form_data["__EVENTTARGET"] = "GridView1"
+    form_data["__EVENTARGUMENT"] = f"Page${page_num}"
+    
+    resp = http_session.post(BASE_URL, data=form_data, timeout=30)
+    resp.encoding = "utf-8"
+    return parse_notice_page(resp.text), resp.status_code
+
+
+def _scrape_sequential(http_session: requests.Session, page: NoticePage, total_pages: int) -> List[Dict[str, Any]]:
+    """逐頁爬取：每次 postback 使用上一頁回應中的表單狀態"""
+    all_notices = []
+    for page_num in range(1, total_pages + 1):
+        logger.info(f"正在爬取第 {page_num} 頁...")
+        page, _ = post_page(http_session, page.form_state, page_num)
+        page_notices = parse_notice_rows(page)
+        all_notices.extend(page_notices)
+        logger.info(f"第 {page_num} 頁解析完成，共 {len(page_notices)} 筆資料")
+    return all_notices
+
+
+def _scrape_incremental(http_session: requests.Session, page: NoticePage, total_pages: int,
+                        known_keys: set, stop_after_known_pages: int) -> List[Dict[str, Any]]:
+    """
+    增量爬取：新資料只會出現在列表前面，因此逐頁爬取到連續
+    stop_after_known_pages 頁都只有已匯入的資料時就停止
+    """
+    all_notices = []
+    known_pages = 0
+    for page_num in range(1, total_pages + 1):
+        page, _ = post_page(http_session, page.form_state, page_num)
+        page_notices = parse_notice_rows(page)
+        all_notices.extend(page_notices)
+        new_count = sum(1 for n in page_notices if notice_key(n) not in known_keys)
+        logger.info(f"第 {page_num} 頁解析完成，共 {len(page_notices)} 筆資料，{new_count} 筆新資料")
+        
+        known_pages = known_pages + 1 if page_notices and new_count == 0 else 0
+        if known_pages >= stop_after_known_pages:
+            logger.info(f"連續 {known_pages} 頁皆為已匯入資料，停止爬取（共爬取 {page_num}/{total_pages} 頁）")
+            break
+    return all_notices
+
+
+def _scrape_concurrent(http_session: requests.Session, page: NoticePage, total_pages: int,
+                       concurrency: int) -> List[Dict[str, Any]]:
+    """
+    並行爬取：只擷取一次首頁的表單狀態，由固定數量的 HTTP session 同時送出各頁 postback
+    
+    Raises:
+        StaleFormStateError: 伺服器不接受重複使用的表單狀態
+    """
+    form_state = page.form_state
+    
+    # 每個 worker 使用自己的 session，沿用首頁取得的 cookies
+    sessions: Queue = Queue()
+    pool = []
+    for _ in range(concurrency):
+        s = requests.Session()
+        s.cookies.update(http_session.cookies)
+        pool.append(s)
+        sessions.put(s)
+    
+    def fetch_page(page_num: int) -> List[Dict[str, Any]]:
+        s = sessions.get()
+        try:
+            result, status = post_page(s, form_state, page_num)
+        finally:
+            sessions.put(s)
+        current = result.current_page
+        if status >= 400 or (current is not None and current != page_num):
+            raise StaleFormStateError(f"第 {page_num} 頁被拒絕（HTTP {status}，回應頁碼 {current}）")
+        return parse_notice_rows(result)
+    
+    pages: Dict[int, List[Dict[str, Any]]] = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            future_to_page = {executor.submit(fetch_page, n): n for n in range(1, total_pages + 1)}
+            try:
+                for future in as_completed(future_to_page):
+                    page_num = future_to_page[future]
+                    pages[page_num] = future.result()
+                    logger.info(f"第 {page_num} 頁解析完成，共 {len(pages[page_num])} 筆資料（{len(pages)}/{total_pages}）")
+            except BaseException:
+                for future in future_to_page:
+                    future.cancel()
+                raise
+    finally:
+        for s in pool:
+            s.close()
+    
+    # 依頁碼順序組合，結果與逐頁爬取一致
+    return [notice for page_num in sorted(pages) for notice in pages[page_num]]
+
+
+def scrape_construction_notices(session: Session, max_pages: int = None, concurrency: int = None,
+                                known_keys: Optional[set] = None,
+                                stop_after_known_pages: int = None) -> List[Dict[str, Any]]:
     """
     爬取施工通知資料並返回列表
     
     Args:
         session: 資料庫 session
         max_pages: 最大爬取頁數，None 表示爬取所有頁面
+        concurrency: 並行 HTTP session 數量，None 使用設定值；1 表示逐頁爬取
+        known_keys: 已匯入資料的 notice_key 集合；提供時進行增量爬取
+        stop_after_known_pages: 增量爬取時，連續幾頁皆為已匯入資料就停止，None 使用設定值
     
     Returns:
         爬取到的資料列表
     """
+    if concurrency is None:
+        concurrency = settings.NOTICE_SCRAPE_CONCURRENCY
+    if stop_after_known_pages is None:
+        stop_after_known_pages = settings.NOTICE_INCREMENTAL_STOP_PAGES
     http_session = requests.Session()
-    all_notices = []
     
     try:
         # Step 1: 先取得首頁
-        r = http_session.get(BASE_URL)
+        r = http_session.get(BASE_URL, timeout=30)
         r.encoding = "utf-8"
-        soup = BeautifulSoup(r.text, "html.parser")
+        page = parse_notice_page(r.text)
         
         # 獲取總頁數（如果有限制）
-        total_pages = 1
-        page_links = soup.select("a[href*='Page$']")
-        if page_links:
-            page_numbers = []
-            for link in page_links:
-                match = re.search(r"Page\$(\d+)", link.get('href', ''))
-                if match:
-                    page_numbers.append(int(match.group(1)))
-            if page_numbers:
-                total_pages = max(page_numbers)
-        
+        total_pages = page.total_pages
         if max_pages:
             total_pages = min(total_pages, max_pages)
         
         logger.info(f"開始爬取施工通知，共 {total_pages} 頁")
         
-        # 爬取每一頁
-        for page_num in range(1, total_pages + 1):
-            logger.info(f"正在爬取第 {page_num} 頁...")
-            
-            # Step 2: 擷取整個 <form> 中所有欄位
-            form_data = {}
-            for inp in soup.select("form input"):
-                name = inp.get("name")
-                value = inp.get("value", "")
-                if name:
-                    form_data[name] = value
-            
-            # Step 3: 設置分頁參數
-            form_data["__EVENTTARGET"] = "GridView1"
-            form_data["__EVENTARGUMENT"] = f"Page${page_num}"
-            
-            # Step 4: 送出 POST
-            resp = http_session.post(BASE_URL, data=form_data)
-            resp.encoding = "utf-8"
-            soup = BeautifulSoup(resp.text, "html.parser")
-            
-            # Step 5: 解析結果
-            rows = soup.select("tr")[1:]  # 跳過表頭
-            row_count = 0
-            for tr in rows:
-                tds = tr.select("td")
-                if len(tds) >= 4:
-                    # 解析欄位
-                    date_range_str = tds[0].text.strip()  # 日期範圍字串
-                    notice_type = tds[1].text.strip()  # 類型
-                    unit = tds[2].text.strip()  # 單位
-                    name = tds[3].text.strip()  # 名稱/道路
-                    
-                    # 數據驗證：跳過明顯異常的數據（名稱太短、只包含數字、或為空）
-                    if not name or len(name) < 3 or (name.isdigit() and len(name) <= 2):
-                        logger.debug(f"跳過異常數據: name='{name}', type='{notice_type}', unit='{unit}'")
-                        continue
-                    
-                    row_count += 1
-                    
-                    # 解析日期範圍
-                    start_date, end_date = parse_roc_date_range(date_range_str)
-                    
-                    # 提取 URL
-                    url = None
-                    if tds[3].a:
-                        onclick = tds[3].a.get('onclick', '')
-                        if onclick:
-                            match = re.search(r"window\.open\('([^']+)'\)", onclick)
-                            if match:
-                                url = match.group(1)
-                    
-                    # 提取道路名稱（從 name 中，如果包含括號）
-                    road = None
-                    if '(' in name and ')' in name:
-                        match = re.search(r'\(([^)]+)\)', name)
-                        if match:
-                            road = match.group(1)
-                    
-                    # 提取 caseid 並獲取座標（先不獲取，在保存時再獲取以加快速度）
-                    # geometry = None
-                    # caseid = extract_caseid_from_url(url) if url else None
-                    # if caseid:
-                    #     coord_data = fetch_coordinates_for_case(caseid)
-                    #     if coord_data and coord_data.get('XYSTRING'):
-                    #         geometry = parse_xystring_to_geojson(coord_data['XYSTRING'])
-                    #         if geometry:
-                    #             logger.debug(f"Successfully parsed coordinates for caseid {caseid}")
-                    
-                    notice_data = {
-                        'start_date': start_date,
-                        'end_date': end_date,
-                        'name': name,
-                        'type': notice_type if notice_type else None,
-                        'unit': unit if unit else None,
-                        'road': road if road else name,  # 如果沒有提取到道路，就用名稱
-                        'url': url,
-                        'geometry': None  # 稍後在保存時獲取
-                    }
-                    all_notices.append(notice_data)
-            
-            logger.info(f"第 {page_num} 頁解析完成，共 {row_count} 筆資料")
+        all_notices = None
+        if known_keys is not None:
+            all_notices = _scrape_incremental(http_session, page, total_pages, known_keys, max(1, stop_after_known_pages))
+        elif concurrency > 1 and total_pages > 1:
+            try:
+                all_notices = _scrape_concurrent(http_session, page, total_pages, min(concurrency, total_pages))
+            except StaleFormStateError as e:
+                logger.warning(f"並行爬取失敗，改為逐頁爬取: {e}")
+        if all_notices is None:
+            all_notices = _scrape_sequential(http_session, page, total_pages)
         
         logger.info(f"爬取完成，共 {len(all_notices)} 筆資料")
         return all_notices
@@ -341,11 +599,119 @@ def scrape_construction_notices(session: Session, max_pages: int = None) -> List
     except Exception as e:
         logger.error(f"爬取施工通知時發生錯誤: {e}", exc_info=True)
         raise
+    finally:
+        http_session.close()
 
 
-def save_construction_notices(session: Session, notices: List[Dict[str, Any]], clear_existing: bool = False) -> int:
+# 暫存表：每次匯入時建立，批次寫入後以 INSERT ... SELECT ... ON CONFLICT (caseid) 合併
+_staging_metadata = MetaData()
+notice_staging = Table(
+    "construction_notices_staging",
+    _staging_metadata,
+    Column("idx", Integer, primary_key=True),
+    Column("start_date", Date),
+    Column("end_date", Date),
+    Column("name", String(500)),
+    Column("type", String(200)),
+    Column("unit", String(200)),
+    Column("road", String(500)),
+    Column("url", String(1000)),
+    Column("caseid", String(32)),
+    Column("is_first", Boolean),  # 同一批中同一個 notice_key 只插入第一筆
+    Column("match_id", Integer),  # 對應的既有記錄 id
+    Column("geometry", JSON),
+    prefixes=["TEMPORARY"],
+)
+
+STAGING_COLUMNS = ("idx", "start_date", "end_date", "name", "type", "unit", "road", "url", "caseid", "is_first")
+
+# 爬蟲提供、重複匯入時以新資料覆蓋的欄位
+NOTICE_FIELDS = ("start_date", "end_date", "name", "type", "unit", "road", "url")
+
+
+def _load_staging(session: Session, rows: List[tuple]) -> None:
+    """將資料列寫入暫存表：PostgreSQL（psycopg）使用 COPY，其他資料庫使用 executemany"""
+    connection = session.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg":
+        cursor = connection.connection.driver_connection.cursor()
+        with cursor.copy(f"COPY {notice_staging.name} ({', '.join(STAGING_COLUMNS)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+        return
+    for i in range(0, len(rows), 5000):
+        session.execute(notice_staging.insert(), [dict(zip(STAGING_COLUMNS, row)) for row in rows[i:i + 5000]])
+
+
+def _match_existing(session: Session, notice_table) -> None:
+    """
+    標記暫存列對應的既有記錄：有 caseid 時走 caseid 唯一索引，沒有 caseid 時比對 URL，
+    都沒有時比對沒有 URL 的同名記錄。各條件分開以等值 join 執行，避免 OR 條件造成逐列比對
+    """
+    session.execute(
+        notice_staging.update()
+        .where(notice_staging.c.caseid.isnot(None))
+        .where(notice_table.c.caseid == notice_staging.c.caseid)
+        .values(match_id=notice_table.c.id)
+    )
+    session.execute(
+        notice_staging.update()
+        .where(notice_staging.c.caseid.is_(None))
+        .where(notice_staging.c.url.isnot(None))
+        .where(notice_table.c.url == notice_staging.c.url)
+        .values(match_id=notice_table.c.id)
+    )
+    session.execute(
+        notice_staging.update()
+        .where(notice_staging.c.url.is_(None))
+        .where(notice_table.c.url.is_(None))
+        .where(notice_table.c.name == notice_staging.c.name)
+        .values(match_id=notice_table.c.id)
+    )
+
+
+def _missing_geometry(notice_table):
+    """geometry 為 NULL、JSON null 或空物件"""
+    return or_(notice_table.c.geometry.is_(None), cast(notice_table.c.geometry, Text).in_(["null", "{}"]))
+
+
+def _upsert_statement(session: Session, notice_table):
+    """
+    有 caseid 的暫存列以 caseid 唯一索引 upsert：新的插入，既有的更新爬蟲欄位並補上缺少的座標；
+    內容沒有變化的既有記錄不寫入
+    """
+    dialect = session.connection().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT upsert is not supported on {dialect}")
+
+    insert_columns = [*NOTICE_FIELDS, "caseid", "geometry"]
+    stmt = insert(notice_table).from_select(
+        insert_columns,
+        select(*(notice_staging.c[c] for c in insert_columns))
+        .where(notice_staging.c.is_first)
+        .where(notice_staging.c.caseid.isnot(None))
+        .order_by(notice_staging.c.idx),
+    )
+    fill_geometry = and_(_missing_geometry(notice_table), stmt.excluded.geometry.isnot(None))
+    return stmt.on_conflict_do_update(
+        index_elements=[notice_table.c.caseid],
+        set_={
+            **{c: stmt.excluded[c] for c in NOTICE_FIELDS},
+            "geometry": case((fill_geometry, stmt.excluded.geometry), else_=notice_table.c.geometry),
+        },
+        where=or_(
+            fill_geometry,
+            *(notice_table.c[c].is_distinct_from(stmt.excluded[c]) for c in NOTICE_FIELDS),
+        ),
+    )
+
+
+def ingest_construction_notices(session: Session, notices: List[Dict[str, Any]], clear_existing: bool = False) -> Dict[str, int]:
     """
-    將爬取的資料保存到資料庫（優化版本：批量查詢 + 並行獲取座標）
+    批次匯入爬取的資料：寫入暫存表後以少數幾個集合式 SQL 合併，不逐筆經過 ORM
     
     Args:
         session: 資料庫 session
@@ -353,141 +719,97 @@ def save_construction_notices(session: Session, notices: List[Dict[str, Any]], c
         clear_existing: 是否先清除現有資料
     
     Returns:
-        保存的資料筆數
+        {"inserted": 新增筆數, "updated": 內容或座標有更新的既有筆數, "unchanged": 其餘筆數}
     """
     try:
         if clear_existing:
-            deleted_count = session.query(ConstructionNotice).count()
-            session.query(ConstructionNotice).delete()
+            deleted_count = session.query(ConstructionNotice).delete()
             session.commit()
+            construction_index.invalidate()
             logger.info(f"已清除現有資料（刪除 {deleted_count} 筆記錄）")
         
         if not notices:
-            return 0
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
         
         total = len(notices)
         logger.info(f"開始處理 {total} 筆資料...")
         
-        # 批量查詢所有已存在的記錄（一次性查詢，避免 N+1 問題）
-        # 如果 clear_existing=True，此時資料庫應該是空的
-        urls = [n.get('url') for n in notices if n.get('url')]
-        names = [n.get('name') for n in notices if n.get('name')]
-        
-        existing_map = {}
-        if urls and not clear_existing:  # 如果已清除，跳過查詢（資料庫是空的）
-            existing_by_url = session.query(ConstructionNotice).filter(
-                ConstructionNotice.url.in_(urls)
-            ).all()
-            for notice in existing_by_url:
-                if notice.url:
-                    existing_map[('url', notice.url)] = notice
-        
-        if names and not clear_existing:  # 如果已清除，跳過查詢（資料庫是空的）
-            existing_by_name = session.query(ConstructionNotice).filter(
-                ConstructionNotice.name.in_(names)
-            ).all()
-            for notice in existing_by_name:
-                if notice.name:
-                    # 优先使用 URL 作为 key，如果没有 URL 或 URL 已存在，则使用 name
-                    if notice.url and ('url', notice.url) not in existing_map:
-                        existing_map[('url', notice.url)] = notice
-                    elif ('name', notice.name) not in existing_map:
-                        existing_map[('name', notice.name)] = notice
-        
-        if clear_existing:
-            logger.info(f"已清除模式：所有 {total} 筆都是新記錄，需要獲取座標")
-        else:
-            logger.info(f"找到 {len(existing_map)} 筆已存在的記錄")
-        
-        # 找出需要獲取座標的 notices（不存在或沒有 geometry）
-        notices_needing_geometry = []
-        for idx, notice_data in enumerate(notices):
-            key = None
-            if notice_data.get('url'):
-                key = ('url', notice_data['url'])
-            elif notice_data.get('name'):
-                key = ('name', notice_data['name'])
-            
-            existing = existing_map.get(key) if key else None
-            if not existing or not existing.geometry:
-                notices_needing_geometry.append((idx, notice_data))
-        
-        logger.info(f"需要獲取座標的記錄: {len(notices_needing_geometry)} 筆")
-        
-        # 並行獲取座標（使用線程池）
-        geometry_map = {}
-        if notices_needing_geometry:
-            http_session = requests.Session()
-            max_workers = min(10, len(notices_needing_geometry))  # 最多 10 個並行請求
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交所有任務
-                future_to_idx = {
-                    executor.submit(fetch_geometry_for_notice, notice_data, http_session): idx
-                    for idx, notice_data in notices_needing_geometry
-                }
-                
-                # 收集結果
-                completed = 0
-                for future in as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    completed += 1
-                    if completed % 10 == 0 or completed == len(notices_needing_geometry):
-                        logger.info(f"獲取座標進度: {completed}/{len(notices_needing_geometry)}")
-                    
-                    try:
-                        geometry = future.result()
-                        if geometry:
-                            geometry_map[idx] = geometry
-                    except Exception as e:
-                        logger.debug(f"獲取座標失敗 (index {idx}): {e}")
-            
-            http_session.close()
-            logger.info(f"成功獲取 {len(geometry_map)} 筆座標")
-        
-        # 批量保存資料
-        saved_count = 0
-        updated_count = 0
-        
-        for idx, notice_data in enumerate(notices):
-            if idx % 50 == 0 and idx > 0:
-                session.commit()  # 每 50 筆提交一次，減少內存占用
-            
-            key = None
-            if notice_data.get('url'):
-                key = ('url', notice_data['url'])
-            elif notice_data.get('name'):
-                key = ('name', notice_data['name'])
-            
-            existing = existing_map.get(key) if key else None
-            geometry = geometry_map.get(idx)
-            
-            if not existing:
-                # 確保 geometry 為 None 時不會被保存為字符串 'null'
-                geometry_value = geometry if geometry else None
-                
-                notice = ConstructionNotice(
-                    start_date=notice_data.get('start_date'),
-                    end_date=notice_data.get('end_date'),
-                    name=notice_data['name'],
-                    type=notice_data.get('type'),
-                    unit=notice_data.get('unit'),
-                    road=notice_data.get('road'),
-                    url=notice_data.get('url'),
-                    geometry=geometry_value
+        # Step 1: 寫入暫存表
+        seen_keys = set()
+        rows = []
+        for idx, n in enumerate(notices):
+            caseid = n.get('caseid') or extract_caseid_from_url(n.get('url'))
+            key = notice_key({**n, 'caseid': caseid})
+            is_first = key not in seen_keys
+            seen_keys.add(key)
+            rows.append((
+                idx, n.get('start_date'), n.get('end_date'), n['name'], n.get('type'), n.get('unit'),
+                n.get('road'), n.get('url') or None, caseid, is_first,
+            ))
+        
+        notice_table = ConstructionNotice.__table__
+        connection = session.connection()
+        notice_staging.drop(connection, checkfirst=True)
+        notice_staging.create(connection)
+        _load_staging(session, rows)
+        _match_existing(session, notice_table)
+        
+        # Step 2: 找出已存在且已有座標的資料，其餘有 caseid 的都需要座標
+        has_geometry = {
+            idx for (idx,) in session.execute(
+                select(notice_staging.c.idx)
+                .select_from(notice_staging.join(notice_table, notice_table.c.id == notice_staging.c.match_id))
+                .where(~_missing_geometry(notice_table))
+            )
+        }
+        caseid_by_idx = {row[0]: row[8] for row in rows if row[8] and row[0] not in has_geometry}
+        logger.info(f"需要獲取座標的記錄: {len(caseid_by_idx)} 筆")
+        
+        # Step 3: 獲取座標（先查快取，其餘並行呼叫 API），寫回暫存表
+        if caseid_by_idx:
+            geometries, _ = resolve_case_geometries(session, caseid_by_idx.values(), commit=False)
+            geometry_rows = [
+                {"b_idx": idx, "b_geometry": geometries[caseid]}
+                for idx, caseid in caseid_by_idx.items() if caseid in geometries
+            ]
+            logger.info(f"成功獲取 {len(geometry_rows)} 筆座標")
+            if geometry_rows:
+                session.execute(
+                    notice_staging.update()
+                    .where(notice_staging.c.idx == bindparam("b_idx"))
+                    .values(geometry=bindparam("b_geometry")),
+                    geometry_rows,
                 )
-                session.add(notice)
-                saved_count += 1
-            else:
-                # 如果已存在但沒有座標，嘗試更新座標
-                if not existing.geometry and geometry:
-                    existing.geometry = geometry if geometry else None
-                    session.add(existing)
-                    updated_count += 1
         
+        # Step 4: 有 caseid 的記錄以 upsert 合併；寫入筆數扣掉新增筆數即為更新筆數
+        new_with_caseid = session.execute(
+            select(func.count())
+            .select_from(notice_staging)
+            .where(notice_staging.c.is_first)
+            .where(notice_staging.c.caseid.isnot(None))
+            .where(notice_staging.c.match_id.is_(None))
+        ).scalar_one()
+        written = session.execute(_upsert_statement(session, notice_table)).rowcount
+        updated = written - new_with_caseid
+        
+        # Step 5: 沒有 caseid 的記錄只插入不存在的
+        inserted = new_with_caseid + session.execute(
+            notice_table.insert().from_select(
+                list(NOTICE_FIELDS),
+                select(*(notice_staging.c[c] for c in NOTICE_FIELDS))
+                .where(notice_staging.c.is_first)
+                .where(notice_staging.c.caseid.is_(None))
+                .where(notice_staging.c.match_id.is_(None))
+                .order_by(notice_staging.c.idx),
+            )
+        ).rowcount
+        
+        notice_staging.drop(connection)
         session.commit()
-        logger.info(f"成功保存 {saved_count} 筆新資料，更新 {updated_count} 筆座標")
-        return saved_count
+        if inserted or updated:
+            construction_index.invalidate()
+        logger.info(f"成功保存 {inserted} 筆新資料，更新 {updated} 筆既有資料")
+        return {"inserted": inserted, "updated": updated, "unchanged": total - inserted - updated}
         
     except Exception as e:
         session.rollback()
@@ -495,6 +817,21 @@ def save_construction_notices(session: Session, notices: List[Dict[str, Any]], c
         raise
 
 
+def save_construction_notices(session: Session, notices: List[Dict[str, Any]], clear_existing: bool = False) -> int:
+    """
+    將爬取的資料保存到資料庫
+    
+    Args:
+        session: 資料庫 session
+        notices: 要保存的資料列表
+        clear_existing: 是否先清除現有資料
+    
+    Returns:
+        保存的資料筆數
+    """
+    return ingest_construction_notices(session, notices, clear_existing)["inserted"]
+
+
 def update_missing_geometries(session: Session) -> Dict[str, Any]:
     """
     更新缺少 geometry 的施工通知記錄
@@ -508,7 +845,6 @@ def update_missing_geometries(session: Session) -> Dict[str, Any]:
     try:
         # 查詢所有缺少 geometry 的記錄
         # 使用 is_(None) 檢查 NULL，並使用 JSON 函數檢查是否為空物件
-        from sqlalchemy import or_
         notices_without_geometry = session.query(ConstructionNotice).filter(
             or_(
                 ConstructionNotice.geometry.is_(None),
@@ -533,54 +869,28 @@ def update_missing_geometries(session: Session) -> Dict[str, Any]:
         
         logger.info(f"發現 {len(notices_without_geometry)} 筆缺少 geometry 的記錄，開始更新...")
         
-        # 並行獲取座標
-        http_session = requests.Session()
-        max_workers = min(10, len(notices_without_geometry))
-        
-        def fetch_geometry_for_existing_notice(notice):
-            """為已存在的 notice 獲取 geometry"""
-            caseid = extract_caseid_from_url(notice.url) if notice.url else None
-            if not caseid:
-                return None, None
-            
-            coord_data = fetch_coordinates_for_case(caseid, http_session)
-            if coord_data and coord_data.get('XYSTRING'):
-                geometry = parse_xystring_to_geojson(coord_data['XYSTRING'])
-                return notice, geometry
-            return notice, None
+        # 獲取座標（先查快取，其餘並行呼叫 API）
+        caseid_by_notice = [
+            (notice, notice.caseid)
+            for notice in notices_without_geometry
+        ]
+        geometries, stats = resolve_case_geometries(session, (caseid for _, caseid in caseid_by_notice))
         
         updated_count = 0
         failed_count = 0
         total = len(notices_without_geometry)
+        for notice, caseid in caseid_by_notice:
+            geometry = geometries.get(caseid) if caseid else None
+            if geometry:
+                notice.geometry = geometry
+                session.add(notice)
+                updated_count += 1
+            else:
+                failed_count += 1
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任務
-            future_to_notice = {
-                executor.submit(fetch_geometry_for_existing_notice, notice): notice
-                for notice in notices_without_geometry
-            }
-            
-            # 收集結果並更新
-            completed = 0
-            for future in as_completed(future_to_notice):
-                completed += 1
-                if completed % 10 == 0 or completed == total:
-                    logger.info(f"更新 geometry 進度: {completed}/{total}")
-                
-                try:
-                    notice, geometry = future.result()
-                    if geometry:
-                        notice.geometry = geometry
-                        session.add(notice)
-                        updated_count += 1
-                    else:
-                        failed_count += 1
-                except Exception as e:
-                    logger.debug(f"獲取座標失敗: {e}")
-                    failed_count += 1
-        
-        http_session.close()
         session.commit()
+        if updated_count:
+            construction_index.invalidate()
         logger.info(f"成功更新 {updated_count} 筆記錄的 geometry，{failed_count} 筆失敗")
         
         return {
@@ -588,7 +898,8 @@ def update_missing_geometries(session: Session) -> Dict[str, Any]:
             "message": f"Updated {updated_count} notices with geometry",
             "updated_count": updated_count,
             "failed_count": failed_count,
-            "total": total
+            "total": total,
+            **stats
         }
         
     except Exception as e:
@@ -600,7 +911,24 @@ def update_missing_geometries(session: Session) -> Dict[str, Any]:
         }
 
 
-def update_construction_notices(session: Session, max_pages: int = None, clear_existing: bool = True) -> Dict[str, Any]:
+# service_state 中上次完整爬取的時間（增量模式用來判斷何時需要完整比對），
+# 存在資料庫中，重啟或換 worker 執行排程時不會重新計算
+LAST_FULL_SCAN_KEY = "notice_last_full_scan"
+
+
+def full_scan_due(session: Session, now: Optional[datetime] = None) -> bool:
+    """是否已超過 NOTICE_FULL_SCAN_INTERVAL_HOURS 未做完整爬取（從未完整爬取過時一定是）"""
+    value = service_state.get_state(session, LAST_FULL_SCAN_KEY)
+    try:
+        last_full_scan = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return True
+    now = now or datetime.now(timezone.utc)
+    return now - last_full_scan >= timedelta(hours=settings.NOTICE_FULL_SCAN_INTERVAL_HOURS)
+
+
+def update_construction_notices(session: Session, max_pages: int = None, clear_existing: bool = True,
+                                incremental: bool = False) -> Dict[str, Any]:
     """
     更新施工通知資料（爬取並保存）
     
@@ -608,17 +936,31 @@ def update_construction_notices(session: Session, max_pages: int = None, clear_e
         session: 資料庫 session
         max_pages: 最大爬取頁數
         clear_existing: 是否先清除現有資料
+        incremental: 是否增量爬取（遇到連續已匯入的頁面即停止）；
+            clear_existing 或到了定期完整比對的時間時仍會完整爬取
     
     Returns:
         更新結果
     """
     try:
-        notices = scrape_construction_notices(session, max_pages)
-        saved_count = save_construction_notices(session, notices, clear_existing)
+        mode = "incremental" if incremental and not clear_existing and not full_scan_due(session) else "full"
+        started_at = datetime.now(timezone.utc)
+        if mode == "incremental":
+            known_keys = load_notice_watermark(session)
+            logger.info(f"增量爬取施工通知，已匯入 {len(known_keys)} 筆")
+            notices = scrape_construction_notices(session, max_pages, known_keys=known_keys)
+        else:
+            notices = scrape_construction_notices(session, max_pages)
+        counts = ingest_construction_notices(session, notices, clear_existing)
+        if mode == "full" and not max_pages:
+            service_state.set_state(session, LAST_FULL_SCAN_KEY, started_at.isoformat())
+            session.commit()
         return {
             "status": "success",
+            "mode": mode,
             "scraped_count": len(notices),
-            "saved_count": saved_count
+            "saved_count": counts["inserted"],
+            "updated_count": counts["updated"]
         }
     except Exception as e:
         return {
@@ -0,0 +1,235 @@
+import html
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from bs4.dammit import EntitySubstitution
+
+# 不會有結束標籤的元素（與 BeautifulSoup 的 html.parser builder 一致）
+VOID_ELEMENTS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+    "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+})
+
+# 內容不計入 .text 的元素（BeautifulSoup 的 string containers）
+STRING_CONTAINERS = ("script", "style", "template", "rt", "rp")
+
+# 內容保留空白的元素
+PRESERVE_WHITESPACE = ("pre", "textarea")
+
+ASCII_SPACES = " \n\t\x0c\r"
+
+PAGE_LINK_RE = re.compile(r"Page\$(\d+)")
+
+
+class _TextNode:
+    """收集 <td>/<span> 內所有文字，以及 <td> 內第一個 <a> 的 onclick"""
+    __slots__ = ("parts", "onclick")
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.onclick: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class _Row:
+    __slots__ = ("cells", "spans")
+
+    def __init__(self):
+        self.cells: List[_TextNode] = []
+        self.spans: List[_TextNode] = []
+
+
+@dataclass
+class NoticeRow:
+    """GridView 的一列：各儲存格 strip 後的文字，及第 4 格第一個連結的 onclick"""
+    cells: List[str]
+    link_onclick: Optional[str] = None  # 沒有 <a> 時為 None；有 <a> 但沒有 onclick 時為 ""
+
+
+@dataclass
+class NoticePage:
+    """PWorkData.aspx 頁面中爬蟲需要的部分"""
+    rows: List[NoticeRow] = field(default_factory=list)
+    form_state: Dict[str, str] = field(default_factory=dict)
+    page_numbers: List[int] = field(default_factory=list)
+    current_page: Optional[int] = None
+
+    @property
+    def total_pages(self) -> int:
+        """從 GridView 分頁連結取得總頁數"""
+        return max(self.page_numbers) if self.page_numbers else 1
+
+
+class _NoticePageParser(HTMLParser):
+    """
+    串流式解析：只追蹤開啟中的元素堆疊，不建立整棵 DOM 樹。
+
+    巢狀規則模擬 BeautifulSoup 的 html.parser builder（結束標籤關閉最近一個同名元素，
+    沒有對應的開啟元素則忽略），因此結果與 soup.select("tr") / tr.select("td") /
+    td.text / td.a / soup.select("form input") 相同。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: List[tuple] = []  # (tag, text_node, row)
+        self.open_counts: Dict[str, int] = {}
+        self.open_rows: List[_Row] = []
+        self.open_nodes: List[_TextNode] = []
+        self.open_cells: List[_TextNode] = []
+        self.rows: List[_Row] = []
+        self.form_state: Dict[str, str] = {}
+        self.page_numbers: List[int] = []
+        self.pager_rows: List[_Row] = []  # 每個分頁連結所在的 <tr>
+        self.pending: List[str] = []  # 目前這段文字（到下一個標籤為止）
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in VOID_ELEMENTS:
+            if tag == "input" and self.open_counts.get("form"):
+                attr_map = dict(attrs)
+                name = attr_map.get("name")
+                if name:
+                    self.form_state[name] = attr_map.get("value") or ""
+            return
+
+        node = row = None
+        if tag == "tr":
+            row = _Row()
+            self.rows.append(row)
+            self.open_rows.append(row)
+        elif tag == "td":
+            node = _TextNode()
+            for r in self.open_rows:
+                r.cells.append(node)
+            self.open_cells.append(node)
+        elif tag == "span":
+            node = _TextNode()
+            for r in self.open_rows:
+                r.spans.append(node)
+        elif tag == "a":
+            attr_map = dict(attrs)
+            for cell in self.open_cells:
+                if cell.onclick is None:
+                    cell.onclick = attr_map.get("onclick") or ""
+            href = attr_map.get("href") or ""
+            if "Page$" in href:
+                match = PAGE_LINK_RE.search(href)
+                if match:
+                    self.page_numbers.append(int(match.group(1)))
+                if self.open_rows:
+                    self.pager_rows.append(self.open_rows[-1])
+
+        if node is not None:
+            self.open_nodes.append(node)
+        self.stack.append((tag, node, row))
+        self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if not self.open_counts.get(tag):
+            return
+        while self.stack:
+            name, node, row = self.stack.pop()
+            self.open_counts[name] -= 1
+            if node is not None:
+                self.open_nodes.pop()
+                if name == "td":
+                    self.open_cells.pop()
+            if row is not None:
+                self.open_rows.pop()
+            if name == tag:
+                break
+
+    def _flush(self):
+        """
+        結束目前的文字片段。與 BeautifulSoup 相同：只含空白的片段縮減為單一換行或空白，
+        位於 script/style 等元素內的文字不計入
+        """
+        if not self.pending:
+            return
+        data = "".join(self.pending)
+        self.pending = []
+        if not any(self.open_counts.get(tag) for tag in PRESERVE_WHITESPACE) and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        if any(self.open_counts.get(tag) for tag in STRING_CONTAINERS):
+            return
+        self._add_text(data)
+
+    def _add_text(self, data):
+        for node in self.open_nodes:
+            node.parts.append(data)
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    # 字元參照的處理方式與 BeautifulSoup 相同（未知的具名參照保留為 "&name"）
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.pending.append(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        self.pending.append(html.unescape(f"&#{name};"))
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        # <![CDATA[...]]> 在 BeautifulSoup 中也算文字
+        if data.upper().startswith("CDATA["):
+            self._add_text(data[len("CDATA["):])
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def parse_notice_page(page_html: str) -> NoticePage:
+    """
+    解析施工通知頁面的 GridView 資料列、<form> 欄位與分頁資訊
+
+    Args:
+        page_html: 頁面 HTML
+
+    Returns:
+        NoticePage；rows 與 soup.select("tr")[1:] 一一對應（跳過表頭）
+    """
+    parser = _NoticePageParser()
+    parser.feed(page_html)
+    parser.close()
+
+    rows = []
+    for row in parser.rows[1:]:
+        cells = [cell.text.strip() for cell in row.cells]
+        onclick = row.cells[3].onclick if len(row.cells) >= 4 else None
+        rows.append(NoticeRow(cells=cells, link_onclick=onclick))
+
+    # 目前頁碼在分頁列中以 <span> 呈現（非連結）
+    current_page = None
+    for pager in parser.pager_rows:
+        for span in pager.spans:
+            text = span.text.strip()
+            if text.isdigit():
+                current_page = int(text)
+                break
+        if current_page is not None:
+            break
+
+    return NoticePage(
+        rows=rows,
+        form_state=parser.form_state,
+        page_numbers=parser.page_numbers,
+        current_page=current_page,
+    )
@@ -0,0 +1,38 @@
+"""
+存在資料庫 service_state 表的服務狀態
+
+程序內的變數在重啟或多個 worker 之間不共用；需要跨程序保留的狀態（例如上次完整
+爬取施工通知的時間）以 key / JSON value 存在這裡。
+"""
+from typing import Any, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import ServiceState
+
+
+def _insert(session: Session):
+    dialect = session.connection().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT upsert is not supported on {dialect}")
+    return insert(ServiceState)
+
+
+def get_state(session: Session, key: str) -> Optional[Any]:
+    """讀取狀態值，沒有紀錄時回傳 None"""
+    state = session.get(ServiceState, key)
+    return state.value if state is not None else None
+
+
+def set_state(session: Session, key: str, value: Any) -> None:
+    """寫入狀態值（upsert，不 commit）"""
+    stmt = _insert(session).values(key=key, value=value)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[ServiceState.key],
+        set_={"value": stmt.excluded.value, "updated_at": func.now()},
+    ))
@@ -0,0 +1,219 @@
+from collections import defaultdict
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+import json
+import math
+
+T = TypeVar("T")
+
+BBox = Tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+Point = Tuple[float, float]
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE_LAT = EARTH_RADIUS_M * math.pi / 180
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def radius_window(lon: float, lat: float, radius_m: float) -> BBox:
+    """A lon/lat window that contains every point within radius_m of (lon, lat)."""
+    d_lat = radius_m / METERS_PER_DEGREE_LAT
+    # Use the latitude edge closest to the pole, where a degree of longitude is shortest
+    cos_lat = math.cos(math.radians(min(abs(lat) + d_lat, 90.0)))
+    d_lon = 180.0 if cos_lat < 1e-9 else min(d_lat / cos_lat, 180.0)
+    return lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat
+
+
+def bbox_window(bbox: BBox, radius_m: float) -> BBox:
+    """A lon/lat window that contains every point within radius_m of a bounding box."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    d_lat = radius_m / METERS_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(min(max(abs(min_lat), abs(max_lat)) + d_lat, 90.0)))
+    d_lon = 180.0 if cos_lat < 1e-9 else min(d_lat / cos_lat, 180.0)
+    return min_lon - d_lon, min_lat - d_lat, max_lon + d_lon, max_lat + d_lat
+
+
+def linestrings(geometry: Any) -> List[List[Point]]:
+    """(lon, lat) vertex lists of a GeoJSON LineString or MultiLineString (dict or JSON string)."""
+    if isinstance(geometry, str):
+        try:
+            geometry = json.loads(geometry)
+        except ValueError:
+            return []
+    if not isinstance(geometry, dict):
+        return []
+    coords = geometry.get("coordinates") or []
+    if geometry.get("type") == "LineString":
+        coords = [coords]
+    elif geometry.get("type") != "MultiLineString":
+        return []
+    lines = []
+    for line in coords:
+        points = [(float(p[0]), float(p[1])) for p in line if len(p) >= 2]
+        if len(points) >= 2:
+            lines.append(points)
+    return lines
+
+
+def simplify_line(points: List[Point], tolerance: float) -> List[Point]:
+    """Iterative Douglas-Peucker simplification of planar points."""
+    if len(points) < 3:
+        return points
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tol_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        ax, ay = points[start]
+        bx, by = points[end]
+        dx, dy = bx - ax, by - ay
+        seg_len_sq = dx * dx + dy * dy
+        max_dist, max_idx = -1.0, -1
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if seg_len_sq == 0:
+                dist = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg_len_sq))
+                dist = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+            if dist > max_dist:
+                max_dist, max_idx = dist, i
+        if max_dist > tol_sq:
+            keep[max_idx] = True
+            stack.append((start, max_idx))
+            stack.append((max_idx, end))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+class GridIndex(Generic[T]):
+    """
+    Uniform lon/lat grid index.
+
+    Items are stored with their bounding box (a point is a degenerate box) in
+    every grid cell the box overlaps. Queries only touch the cells covering the
+    query window, so their cost is proportional to the number of nearby items
+    instead of the total item count. Results keep insertion order.
+    """
+
+    def __init__(self, cell_size: float = 0.01):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._items: List[T] = []
+        self._bboxes: List[BBox] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        if not (math.isfinite(lon) and math.isfinite(lat)):
+            raise ValueError(f"Coordinates must be finite, got ({lon}, {lat})")
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def insert(
+        self,
+        item: T,
+        min_lon: float,
+        min_lat: float,
+        max_lon: Optional[float] = None,
+        max_lat: Optional[float] = None,
+    ) -> None:
+        """Insert an item at a point, or over a bounding box when max_lon/max_lat are given."""
+        if max_lon is None:
+            max_lon = min_lon
+        if max_lat is None:
+            max_lat = min_lat
+
+        idx = len(self._items)
+        self._items.append(item)
+        self._bboxes.append((min_lon, min_lat, max_lon, max_lat))
+
+        x0, y0 = self._cell(min_lon, min_lat)
+        x1, y1 = self._cell(max_lon, max_lat)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                self._cells[(x, y)].append(idx)
+
+    def query_bbox(
+        self,
+        min_lon: float,
+        min_lat: float,
+        max_lon: float,
+        max_lat: float,
+        limit: Optional[int] = None,
+    ) -> List[T]:
+        """Return items whose bounding box intersects the query window."""
+        ordered = self._query_indices(min_lon, min_lat, max_lon, max_lat)
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [self._items[idx] for idx in ordered]
+
+    def query_radius(
+        self,
+        lon: float,
+        lat: float,
+        radius_m: float,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[T, float]]:
+        """
+        Return (item, distance in meters) for items within radius_m of a point.
+
+        Distance is measured to the nearest point of the item's bounding box,
+        so it is exact for point items and a lower bound for boxes.
+        """
+        hits = []
+        for idx in self._query_indices(*radius_window(lon, lat, radius_m)):
+            b_min_lon, b_min_lat, b_max_lon, b_max_lat = self._bboxes[idx]
+            nearest_lon = min(max(lon, b_min_lon), b_max_lon)
+            nearest_lat = min(max(lat, b_min_lat), b_max_lat)
+            distance = haversine_meters(lat, lon, nearest_lat, nearest_lon)
+            if distance <= radius_m:
+                hits.append((self._items[idx], distance))
+                if limit is not None and len(hits) >= limit:
+                    break
+        return hits
+
+    def _query_indices(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[int]:
+        """Insertion indices of items whose bounding box intersects the window, in order."""
+        x0, y0 = self._cell(min_lon, min_lat)
+        x1, y1 = self._cell(max_lon, max_lat)
+
+        # A window wider than the populated area is cheaper to answer by
+        # scanning the occupied cells than by enumerating empty ones
+        window_cells = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if window_cells > len(self._cells):
+            buckets = [
+                bucket for (x, y), bucket in self._cells.items()
+                if x0 <= x <= x1 and y0 <= y <= y1
+            ]
+        else:
+            buckets = [
+                self._cells[(x, y)]
+                for x in range(x0, x1 + 1)
+                for y in range(y0, y1 + 1)
+                if (x, y) in self._cells
+            ]
+
+        hits = set()
+        for bucket in buckets:
+            for idx in bucket:
+                if idx in hits:
+                    continue
+                b_min_lon, b_min_lat, b_max_lon, b_max_lat = self._bboxes[idx]
+                if b_max_lon < min_lon or b_min_lon > max_lon or b_max_lat < min_lat or b_min_lat > max_lat:
+                    continue
+                hits.add(idx)
+
+        return sorted(hits)
@@ -0,0 +1,404 @@
+"""
+In-process Mapbox Vector Tile (MVT) encoding for the construction snapshot
+and the road_segments table.
+
+Tiles are rendered on demand, simplified per zoom level and kept in an LRU
+cache. Publishing new data calls ``invalidate_layer`` so stale tiles are
+dropped immediately.
+"""
+import logging
+import math
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cachetools import LRUCache
+from sqlalchemy import text
+
+from .spatial_index import GridIndex, Point, linestrings, simplify_line
+
+logger = logging.getLogger(__name__)
+
+EXTENT = 4096
+# Geometry outside the tile is kept up to this many tile units so lines
+# render seamlessly across tile edges
+BUFFER = 64
+MAX_ZOOM = 22
+TILE_CACHE_SIZE = 2048
+# How often (seconds) the road layer checks whether road_segments changed in
+# another process (e.g. `python -m scripts.load_road_segments`)
+ROAD_FINGERPRINT_INTERVAL = 60
+ROAD_INDEX_CELL_SIZE = 0.005
+# Below this zoom a road tile would cover most of the table; clients get an
+# empty tile instead (roads are drawn from the base map at those zooms)
+ROAD_MIN_ZOOM = 12
+
+CONSTRUCTION_LAYER = "construction"
+ROAD_LAYER = "road_segments"
+LAYERS = (CONSTRUCTION_LAYER, ROAD_LAYER)
+
+# Properties kept on construction points; tiles are for drawing, the popup
+# can still fetch the full feature from the GeoJSON endpoint
+CONSTRUCTION_TILE_FIELDS = ("AC_NO", "SNO", "DIGADD", "PURP", "AP_NAME", "CB_DA", "CE_DA")
+
+# --- Protobuf primitives ---------------------------------------------------
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _length_delimited(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value: Any) -> bytes:
+    """Encode a vector_tile.Tile.Value message."""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+# --- Geometry --------------------------------------------------------------
+
+def tile_bounds(z: int, x: int, y: int, buffer: int = 0) -> Tuple[float, float, float, float]:
+    """Return (min_lon, min_lat, max_lon, max_lat) of a tile, optionally buffered."""
+    n = 2 ** z
+    pad = buffer / EXTENT
+
+    def lon(tx: float) -> float:
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return lon(x - pad), lat(y + 1 + pad), lon(x + 1 + pad), lat(y - pad)
+
+
+def _projector(z: int, x: int, y: int) -> Callable[[float, float], Point]:
+    """Return a function projecting lon/lat into tile-local coordinates."""
+    n = 2 ** z
+
+    def project(lon: float, lat: float) -> Point:
+        lat = max(min(lat, 85.0511), -85.0511)
+        wx = (lon + 180.0) / 360.0 * n
+        sin_lat = math.sin(math.radians(lat))
+        wy = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n
+        return (wx - x) * EXTENT, (wy - y) * EXTENT
+
+    return project
+
+
+def simplify_tolerance(z: int) -> float:
+    """Douglas-Peucker tolerance in tile units; coarser at low zooms."""
+    if z < 12:
+        return 16.0
+    if z < 15:
+        return 8.0
+    return 4.0
+
+
+def _clip_line(points: List[Point], lo: float, hi: float) -> List[List[Point]]:
+    """Clip a polyline to the square [lo, hi]^2 (Liang-Barsky per segment)."""
+    parts: List[List[Point]] = []
+    current: List[Point] = []
+
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        t0, t1 = 0.0, 1.0
+        visible = True
+        for p, q in ((-dx, x0 - lo), (dx, hi - x0), (-dy, y0 - lo), (dy, hi - y0)):
+            if p == 0:
+                if q < 0:
+                    visible = False
+                    break
+                continue
+            r = q / p
+            if p < 0:
+                t0 = max(t0, r)
+            else:
+                t1 = min(t1, r)
+            if t0 > t1:
+                visible = False
+                break
+
+        if not visible:
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+            continue
+
+        start = (x0, y0) if t0 == 0.0 else (x0 + t0 * dx, y0 + t0 * dy)
+        end = (x1, y1) if t1 == 1.0 else (x0 + t1 * dx, y0 + t1 * dy)
+        if not current:
+            current = [start]
+        elif current[-1] != start:
+            if len(current) > 1:
+                parts.append(current)
+            current = [start]
+        current.append(end)
+        if t1 < 1.0:
+            parts.append(current)
+            current = []
+
+    if len(current) > 1:
+        parts.append(current)
+    return parts
+
+
+def _quantize(points: List[Point]) -> List[Tuple[int, int]]:
+    """Round to integer tile units, dropping consecutive duplicates."""
+    out: List[Tuple[int, int]] = []
+    for px, py in points:
+        q = (int(round(px)), int(round(py)))
+        if not out or out[-1] != q:
+            out.append(q)
+    return out
+
+
+def _line_commands(lines: List[List[Tuple[int, int]]]) -> List[int]:
+    cmds: List[int] = []
+    cx = cy = 0
+    for line in lines:
+        (x, y), rest = line[0], line[1:]
+        cmds += [(1 | (1 << 3)), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        cmds.append(2 | (len(rest) << 3))
+        for x, y in rest:
+            cmds += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+    return cmds
+
+
+# --- Layer encoding --------------------------------------------------------
+
+class _LayerBuilder:
+    """Collects features and interns keys/values for one MVT layer."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.features: List[bytes] = []
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, Any], int] = {}
+
+    def _tags(self, properties: Dict[str, Any]) -> List[int]:
+        tags: List[int] = []
+        for k, v in properties.items():
+            if v is None or v == "" or isinstance(v, (dict, list)):
+                continue
+            k_idx = self.keys.setdefault(k, len(self.keys))
+            v_idx = self.values.setdefault((type(v), v), len(self.values))
+            tags += [k_idx, v_idx]
+        return tags
+
+    def add(self, geom_type: int, commands: List[int], properties: Dict[str, Any],
+            feature_id: Optional[int] = None) -> None:
+        payload = b""
+        if feature_id is not None and feature_id >= 0:
+            payload += _key(1, 0) + _varint(feature_id)
+        tags = self._tags(properties)
+        if tags:
+            payload += _packed(2, tags)
+        payload += _key(3, 0) + _varint(geom_type)
+        payload += _packed(4, commands)
+        self.features.append(payload)
+
+    def encode(self) -> bytes:
+        payload = _key(15, 0) + _varint(2)
+        payload += _length_delimited(1, self.name.encode("utf-8"))
+        for feature in self.features:
+            payload += _length_delimited(2, feature)
+        for k in self.keys:
+            payload += _length_delimited(3, k.encode("utf-8"))
+        for _, v in self.values:
+            payload += _length_delimited(4, _encode_value(v))
+        payload += _key(5, 0) + _varint(EXTENT)
+        return _length_delimited(3, payload)
+
+
+def encode_point_layer(name: str, z: int, x: int, y: int,
+                       points: Iterable[Tuple[float, float, Dict[str, Any]]]) -> bytes:
+    """Encode (lon, lat, properties) points falling inside the tile."""
+    project = _projector(z, x, y)
+    layer = _LayerBuilder(name)
+    for lon, lat, properties in points:
+        px, py = project(lon, lat)
+        if not (-BUFFER <= px <= EXTENT + BUFFER and -BUFFER <= py <= EXTENT + BUFFER):
+            continue
+        qx, qy = int(round(px)), int(round(py))
+        layer.add(1, [1 | (1 << 3), _zigzag(qx), _zigzag(qy)], properties)
+    return layer.encode() if layer.features else b""
+
+
+def encode_line_layer(name: str, z: int, x: int, y: int,
+                      lines: Iterable[Tuple[int, Sequence[Sequence[Point]], Dict[str, Any]]]) -> bytes:
+    """Encode (id, [linestring coordinates...], properties) lines clipped to the tile."""
+    project = _projector(z, x, y)
+    tolerance = simplify_tolerance(z)
+    layer = _LayerBuilder(name)
+    for feature_id, feature_lines, properties in lines:
+        parts: List[List[Tuple[int, int]]] = []
+        for coords in feature_lines:
+            projected = [project(lon, lat) for lon, lat in coords]
+            for clipped in _clip_line(projected, -BUFFER, EXTENT + BUFFER):
+                quantized = _quantize(simplify_line(clipped, tolerance))
+                if len(quantized) >= 2:
+                    parts.append(quantized)
+        if parts:
+            layer.add(2, _line_commands(parts), properties, feature_id)
+    return layer.encode() if layer.features else b""
+
+
+# --- Road segment source ---------------------------------------------------
+
+class _RoadSource:
+    """In-memory copy of road_segments with a grid index over line bounding boxes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Optional[GridIndex] = None
+        self._fingerprint: Optional[tuple] = None
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._index = None
+            self._fingerprint = None
+
+    @staticmethod
+    def _read_fingerprint(db) -> tuple:
+        row = db.execute(text(
+            "SELECT count(*), coalesce(max(id), 0), coalesce(sum(length_m), 0) FROM road_segments"
+        )).one()
+        return tuple(row)
+
+    def get(self, db) -> Tuple[GridIndex, tuple]:
+        """Return the index and the fingerprint of the data it was built from."""
+        with self._lock:
+            now = time.monotonic()
+            if self._index is not None and now - self._checked_at < ROAD_FINGERPRINT_INTERVAL:
+                return self._index, self._fingerprint
+
+            fingerprint = self._read_fingerprint(db)
+            self._checked_at = now
+            if self._index is not None and fingerprint == self._fingerprint:
+                return self._index, self._fingerprint
+
+            index: GridIndex = GridIndex(ROAD_INDEX_CELL_SIZE)
+            rows = db.execute(text(
+                "SELECT id, osmid, name, highway, geometry FROM road_segments"
+            )).all()
+            for seg_id, osmid, name, highway, geometry in rows:
+                lines = linestrings(geometry)
+                if not lines:
+                    continue
+                lons = [p[0] for line in lines for p in line]
+                lats = [p[1] for line in lines for p in line]
+                properties = {"osmid": osmid, "name": name, "highway": highway}
+                index.insert((seg_id, lines, properties), min(lons), min(lats), max(lons), max(lats))
+
+            self._index = index
+            self._fingerprint = fingerprint
+            logger.info(f"Loaded {len(index)} road segments for vector tiles")
+            return index, fingerprint
+
+
+_road_source = _RoadSource()
+
+
+# --- Tile cache ------------------------------------------------------------
+
+_tile_cache: LRUCache = LRUCache(maxsize=TILE_CACHE_SIZE)
+_tile_cache_lock = threading.Lock()
+_layer_versions: Dict[str, int] = {layer: 0 for layer in LAYERS}
+# Identity of the data each layer's cached tiles were rendered from
+_layer_sources: Dict[str, Any] = {}
+
+
+def _bump_layer(layer: str) -> None:
+    """Drop cached tiles of a layer. Caller must hold _tile_cache_lock."""
+    _layer_versions[layer] = _layer_versions.get(layer, 0) + 1
+    for key in [k for k in _tile_cache.keys() if k[0] == layer]:
+        del _tile_cache[key]
+
+
+def invalidate_layer(layer: str) -> None:
+    """Drop every cached tile of a layer (call after publishing new data)."""
+    with _tile_cache_lock:
+        _bump_layer(layer)
+        _layer_sources.pop(layer, None)
+    if layer == ROAD_LAYER:
+        _road_source.invalidate()
+    logger.debug(f"Vector tile cache invalidated for layer '{layer}'")
+
+
+def _cached(layer: str, source_id: Any, z: int, x: int, y: int, render: Callable[[], bytes]) -> bytes:
+    with _tile_cache_lock:
+        if _layer_sources.get(layer) != source_id:
+            # The underlying data was replaced behind our back
+            _bump_layer(layer)
+            _layer_sources[layer] = source_id
+        key = (layer, _layer_versions[layer], z, x, y)
+        tile = _tile_cache.get(key)
+    if tile is not None:
+        return tile
+
+    tile = render()
+    with _tile_cache_lock:
+        # Only store if nothing was published while rendering
+        if key[1] == _layer_versions[layer]:
+            _tile_cache[key] = tile
+    return tile
+
+
+def render_construction_tile(snapshot, z: int, x: int, y: int) -> bytes:
+    """Render (or fetch from cache) a construction tile from a ConstructionSnapshot."""
+    def render() -> bytes:
+        features = snapshot.geojson.get("features") or []
+        points = []
+        for position in snapshot.index.query_bbox(*tile_bounds(z, x, y, BUFFER)):
+            feature = features[position]
+            lon, lat = feature["geometry"]["coordinates"][:2]
+            properties = feature.get("properties") or {}
+            points.append((float(lon), float(lat),
+                           {k: properties.get(k) for k in CONSTRUCTION_TILE_FIELDS}))
+        return encode_point_layer(CONSTRUCTION_LAYER, z, x, y, points)
+
+    return _cached(CONSTRUCTION_LAYER, snapshot.etag, z, x, y, render)
+
+
+def render_road_tile(db, z: int, x: int, y: int) -> bytes:
+    """Render (or fetch from cache) a road_segments tile; empty below ``ROAD_MIN_ZOOM``."""
+    if z < ROAD_MIN_ZOOM:
+        return b""
+    index, fingerprint = _road_source.get(db)
+
+    def render() -> bytes:
+        lines = index.query_bbox(*tile_bounds(z, x, y, BUFFER))
+        return encode_line_layer(ROAD_LAYER, z, x, y, lines)
+
+    return _cached(ROAD_LAYER, fingerprint, z, x, y, render)
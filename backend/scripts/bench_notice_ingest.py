@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# When this script is executed directly (python scripts/bench_notice_ingest.py)
+# the package root (backend/) may not be on sys.path. Ensure the project
+# root is first on sys.path so `from app.services import ...` resolves.
+import sys
+from pathlib import Path as _Path
+_ROOT = _Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+
+def synthetic_notices(count: int, offset: int = 0) -> List[Dict[str, Any]]:
+    """Scraper-shaped notice dicts; every tenth one has no URL and is matched by name."""
+    notices = []
+    for i in range(offset, offset + count):
+        start = date(2025, 1, 1) + timedelta(days=i % 365)
+        url = None if i % 10 == 9 else f"https://dig.taipei/TpdigR.net/Map/ShowPWorkData.aspx?caseid={90000000 + i}"
+        notices.append({
+            "start_date": start,
+            "end_date": start + timedelta(days=30),
+            "name": f"汰換管線工程{i}(中正路{i % 500}號)",
+            "type": "道路施工",
+            "unit": "臺北自來水事業處",
+            "road": f"中正路{i % 500}號",
+            "url": url,
+            "geometry": None,
+        })
+    return notices
+
+
+def seed_geometry_cache(session, notices: List[Dict[str, Any]]) -> None:
+    """Pre-resolve every synthetic caseid so the benchmark never calls dig.taipei."""
+    from app.services import geometry_cache
+    from app.services.notice_contruction import extract_caseid_from_url
+
+    now = geometry_cache.utcnow()
+    entries: Dict[str, Any] = {}
+    for i, notice in enumerate(notices):
+        caseid = extract_caseid_from_url(notice["url"]) if notice["url"] else None
+        if caseid:
+            geometry = {"type": "Point", "coordinates": [121.5 + (i % 1000) * 1e-4, 25.0 + (i // 1000) * 1e-4]}
+            geometry_cache.record_success(session, entries, caseid, "", geometry, now)
+    session.commit()
+
+
+def bench(database_url: str, sizes: List[int]) -> None:
+    from app.database import Base
+    from app.services.notice_contruction import ingest_construction_notices
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine, tables=[
+        Base.metadata.tables["construction_notices"],
+        Base.metadata.tables["case_geometry_cache"],
+    ])
+    Session = sessionmaker(bind=engine)
+
+    for size in sizes:
+        with Session() as session:
+            session.execute(text("DELETE FROM construction_notices"))
+            session.execute(text("DELETE FROM case_geometry_cache"))
+            session.commit()
+
+            notices = synthetic_notices(size)
+            seed_geometry_cache(session, notices)
+
+            started = time.perf_counter()
+            fresh = ingest_construction_notices(session, notices)
+            fresh_time = time.perf_counter() - started
+
+            # Same rows again plus 1% new ones: the daily steady state
+            notices += synthetic_notices(size // 100, offset=size)
+            seed_geometry_cache(session, notices[size:])
+            started = time.perf_counter()
+            again = ingest_construction_notices(session, notices)
+            again_time = time.perf_counter() - started
+
+        print(f"{size:>7} rows  fresh:  {fresh_time:7.2f}s ({size / fresh_time:9.0f} rows/s)  {fresh}")
+        print(f"{size:>7} rows  re-run: {again_time:7.2f}s ({len(notices) / again_time:9.0f} rows/s)  {again}")
+
+    engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark bulk notice ingestion. Uses and empties construction_notices and "
+                    "case_geometry_cache in the given database, so point it at a scratch database."
+    )
+    parser.add_argument("database_url", help="SQLAlchemy URL of a scratch database")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # app.config requires DATABASE_URL; the benchmark only uses its own engine
+    os.environ.setdefault("DATABASE_URL", args.database_url)
+    bench(args.database_url, args.sizes)
+
+
+if __name__ == "__main__":
+    main()
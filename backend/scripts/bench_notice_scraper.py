@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+import requests
+from bs4 import BeautifulSoup
+
+# When this script is executed directly (python scripts/bench_notice_scraper.py)
+# the package root (backend/) may not be on sys.path. Ensure the project
+# root is first on sys.path so `from app.services import ...` resolves.
+import sys
+from pathlib import Path as _Path
+_ROOT = _Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+# The scraper never touches the database; don't require a configured one
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services import notice_contruction
+from app.services.notice_page import parse_notice_page
+
+VIEWSTATE_RE = re.compile(r'name="__VIEWSTATE"[^>]*value="([^"]*)"')
+
+
+def page_file(pages_dir: Path, page_num: int) -> Path:
+    return pages_dir / f"page_{page_num:04d}.html"
+
+
+def record(pages_dir: Path, max_pages: int | None) -> int:
+    """Walk PWorkData.aspx sequentially and save every page for replay."""
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    http_session = requests.Session()
+    r = http_session.get(notice_contruction.BASE_URL, timeout=30)
+    r.encoding = "utf-8"
+    (pages_dir / "index.html").write_text(r.text, encoding="utf-8")
+
+    page = parse_notice_page(r.text)
+    total_pages = page.total_pages
+    if max_pages:
+        total_pages = min(total_pages, max_pages)
+    for page_num in range(1, total_pages + 1):
+        form_data = dict(page.form_state)
+        form_data["__EVENTTARGET"] = "GridView1"
+        form_data["__EVENTARGUMENT"] = f"Page${page_num}"
+        resp = http_session.post(notice_contruction.BASE_URL, data=form_data, timeout=30)
+        resp.encoding = "utf-8"
+        page_file(pages_dir, page_num).write_text(resp.text, encoding="utf-8")
+        page = parse_notice_page(resp.text)
+        print(f"Recorded page {page_num}/{total_pages}")
+    http_session.close()
+    return total_pages
+
+
+def legacy_parse_notice_rows(html: str) -> List[dict]:
+    """The original BeautifulSoup extraction, kept as the reference for `parse`."""
+    soup = BeautifulSoup(html, "html.parser")
+    notices = []
+    for tr in soup.select("tr")[1:]:
+        tds = tr.select("td")
+        if len(tds) < 4:
+            continue
+        date_range_str = tds[0].text.strip()
+        notice_type = tds[1].text.strip()
+        unit = tds[2].text.strip()
+        name = tds[3].text.strip()
+        if not name or len(name) < 3 or (name.isdigit() and len(name) <= 2):
+            continue
+        start_date, end_date = notice_contruction.parse_roc_date_range(date_range_str)
+        url = None
+        if tds[3].a:
+            onclick = tds[3].a.get("onclick", "")
+            if onclick:
+                match = re.search(r"window\.open\('([^']+)'\)", onclick)
+                if match:
+                    url = match.group(1)
+        road = None
+        if "(" in name and ")" in name:
+            match = re.search(r"\(([^)]+)\)", name)
+            if match:
+                road = match.group(1)
+        notices.append({
+            "start_date": start_date,
+            "end_date": end_date,
+            "name": name,
+            "type": notice_type if notice_type else None,
+            "unit": unit if unit else None,
+            "road": road if road else name,
+            "url": url,
+            "caseid": notice_contruction.extract_caseid_from_url(url),
+            "geometry": None,
+        })
+    return notices
+
+
+def legacy_form_state(html: str) -> Dict[str, str]:
+    soup = BeautifulSoup(html, "html.parser")
+    return {inp.get("name"): inp.get("value", "") for inp in soup.select("form input") if inp.get("name")}
+
+
+def bench_parse(pages_dir: Path, rounds: int) -> None:
+    """Time BeautifulSoup against the streaming extractor and check the notice dicts are identical."""
+    pages = [path.read_text(encoding="utf-8") for path in sorted(pages_dir.glob("page_*.html"))]
+    if not pages:
+        raise FileNotFoundError(f"No recorded pages in {pages_dir}")
+
+    for html in pages:
+        fast = parse_notice_page(html)
+        if repr(notice_contruction.parse_notice_rows(fast)) != repr(legacy_parse_notice_rows(html)):
+            raise SystemExit("Streaming extractor returned different notices than BeautifulSoup")
+        if fast.form_state != legacy_form_state(html):
+            raise SystemExit("Streaming extractor returned a different form state than BeautifulSoup")
+
+    def timed(parse) -> float:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for html in pages:
+                parse(html)
+        return time.perf_counter() - started
+
+    size_mb = sum(len(html.encode("utf-8")) for html in pages) * rounds / 1e6
+    legacy = timed(lambda html: (legacy_parse_notice_rows(html), legacy_form_state(html)))
+    fast = timed(lambda html: notice_contruction.parse_notice_rows(parse_notice_page(html)))
+    print(f"BeautifulSoup: {legacy:7.2f}s  ({size_mb / legacy:6.1f} MB/s)")
+    print(f"streaming:     {fast:7.2f}s  ({size_mb / fast:6.1f} MB/s)")
+    print(f"identical results over {len(pages)} pages, speedup {legacy / fast:.1f}x")
+
+
+def synthesize(pages_dir: Path, pages: int, rows_per_page: int) -> None:
+    """Write GridView-shaped pages for replaying without a recording."""
+    pages_dir.mkdir(parents=True, exist_ok=True)
+
+    def render(page_num: int) -> str:
+        rows = []
+        for i in range(rows_per_page):
+            caseid = 11200000 + page_num * rows_per_page + i
+            rows.append(
+                "<tr><td>114/12/01-114/12/31</td><td>道路施工</td><td>臺北自來水事業處</td>"
+                f"<td><a href=\"#\" onclick=\"window.open('https://dig.taipei/TpdigR.net/Map/ShowPWorkData.aspx?caseid={caseid}')\">"
+                f"汰換管線工程{caseid}(中正路{i}號)</a></td></tr>"
+            )
+        pager = "".join(
+            f"<td><span>{n}</span></td>" if n == page_num
+            else f"<td><a href=\"javascript:__doPostBack('GridView1','Page${n}')\">{n}</a></td>"
+            for n in range(1, pages + 1)
+        )
+        return (
+            "<html><body><form method=\"post\" action=\"./PWorkData.aspx\">"
+            f"<input type=\"hidden\" name=\"__VIEWSTATE\" id=\"__VIEWSTATE\" value=\"state-{page_num}\" />"
+            f"<input type=\"hidden\" name=\"__EVENTVALIDATION\" id=\"__EVENTVALIDATION\" value=\"valid-{page_num}\" />"
+            "<table id=\"GridView1\"><tr><th>日期</th><th>類型</th><th>單位</th><th>名稱</th></tr>"
+            + "".join(rows)
+            + f"<tr><td colspan=\"4\"><table><tr>{pager}</tr></table></td></tr>"
+            "</table></form></body></html>"
+        )
+
+    (pages_dir / "index.html").write_text(render(1), encoding="utf-8")
+    for page_num in range(1, pages + 1):
+        page_file(pages_dir, page_num).write_text(render(page_num), encoding="utf-8")
+
+
+class ReplayServer:
+    """
+    Serves recorded PWorkData.aspx pages: GET returns the index page and a
+    GridView postback returns the requested page after ``latency`` seconds.
+    In strict mode a postback is rejected unless it carries the __VIEWSTATE
+    of the page before it, like a server that refuses reused form state.
+    """
+
+    def __init__(self, pages_dir: Path, latency: float, strict: bool):
+        self.index = (pages_dir / "index.html").read_bytes()
+        self.pages: Dict[int, bytes] = {}
+        for path in sorted(pages_dir.glob("page_*.html")):
+            self.pages[int(path.stem.split("_")[1])] = path.read_bytes()
+        self.viewstates = {0: self._viewstate(self.index)}
+        self.viewstates.update({n: self._viewstate(body) for n, body in self.pages.items()})
+        self.latency = latency
+        self.strict = strict
+        self.requests = 0
+        self.rejected = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # noqa: A002 - keep the replay quiet
+                pass
+
+            def _send(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send(200, server.index)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                server.requests += 1
+                time.sleep(server.latency)
+                match = re.match(r"Page\$(\d+)", form.get("__EVENTARGUMENT", [""])[0])
+                page_num = int(match.group(1)) if match else 0
+                if page_num not in server.pages:
+                    self._send(404, b"")
+                    return
+                if server.strict and form.get("__VIEWSTATE", [""])[0] != server.viewstates.get(page_num - 1):
+                    server.rejected += 1
+                    self._send(500, b"Invalid postback or callback argument")
+                    return
+                self._send(200, server.pages[page_num])
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/Tpdig/PWorkData.aspx"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def _viewstate(body: bytes) -> str:
+        match = VIEWSTATE_RE.search(body.decode("utf-8", errors="replace"))
+        return match.group(1) if match else ""
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def timed_scrape(server: ReplayServer, concurrency: int) -> tuple[float, List[dict]]:
+    server.requests = server.rejected = 0
+    started = time.perf_counter()
+    notices = notice_contruction.scrape_construction_notices(None, max_pages=None, concurrency=concurrency)
+    return time.perf_counter() - started, notices
+
+
+def replay(pages_dir: Path, latency: float, strict: bool, concurrency: int) -> None:
+    server = ReplayServer(pages_dir, latency, strict)
+    original_url = notice_contruction.BASE_URL
+    notice_contruction.BASE_URL = server.url
+    try:
+        seq_time, seq_notices = timed_scrape(server, 1)
+        print(f"sequential:     {seq_time:7.2f}s  {len(seq_notices)} notices, {server.requests} postbacks")
+        con_time, con_notices = timed_scrape(server, concurrency)
+        print(
+            f"concurrent x{concurrency:<2}: {con_time:7.2f}s  {len(con_notices)} notices, "
+            f"{server.requests} postbacks, {server.rejected} rejected"
+        )
+    finally:
+        notice_contruction.BASE_URL = original_url
+        server.close()
+
+    if con_notices != seq_notices:
+        raise SystemExit("Concurrent scrape returned different notices than the sequential scrape")
+    print(f"identical results, speedup {seq_time / con_time:.1f}x")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Record PWorkData.aspx pages and replay them to benchmark the notice scraper and page parser")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Save live pages for later replay")
+    rec.add_argument("pages_dir", type=Path)
+    rec.add_argument("--max-pages", type=int, default=None)
+
+    rep = sub.add_parser("replay", help="Serve recorded pages locally and time sequential vs concurrent scraping")
+    rep.add_argument("pages_dir", type=Path)
+    rep.add_argument("--synthetic", type=int, default=0, metavar="PAGES",
+                     help="Generate this many GridView-shaped pages into pages_dir first")
+    rep.add_argument("--rows-per-page", type=int, default=20)
+    rep.add_argument("--latency", type=float, default=0.3, help="Seconds the server waits per postback (default: 0.3)")
+    rep.add_argument("--concurrency", type=int, default=4)
+    rep.add_argument("--strict", action="store_true",
+                     help="Reject postbacks that reuse form state, to exercise the sequential fallback")
+
+    par = sub.add_parser("parse", help="Time BeautifulSoup vs the streaming page extractor over recorded pages")
+    par.add_argument("pages_dir", type=Path)
+    par.add_argument("--synthetic", type=int, default=0, metavar="PAGES",
+                     help="Generate this many GridView-shaped pages into pages_dir first")
+    par.add_argument("--rows-per-page", type=int, default=20)
+    par.add_argument("--rounds", type=int, default=5)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "record":
+        pages = record(args.pages_dir, args.max_pages)
+        print(f"Recorded {pages} pages into {args.pages_dir}")
+        return
+
+    if args.synthetic:
+        synthesize(args.pages_dir, args.synthetic, args.rows_per_page)
+    if args.command == "parse":
+        bench_parse(args.pages_dir, args.rounds)
+        return
+    if not (args.pages_dir / "index.html").exists():
+        raise FileNotFoundError(f"No recorded pages in {args.pages_dir}; run `record` or pass --synthetic")
+    replay(args.pages_dir, args.latency, args.strict, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import time
+from datetime import date
+from types import SimpleNamespace
+from typing import List
+
+# When this script is executed directly (python scripts/bench_proximity.py)
+# the package root (backend/) may not be on sys.path. Ensure the project
+# root is first on sys.path so `from app.services import ...` resolves.
+import sys
+from pathlib import Path as _Path
+_ROOT = _Path(__file__).resolve().parents[1]
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+# Roughly the Taipei city bounding box
+MIN_LON, MAX_LON = 121.45, 121.67
+MIN_LAT, MAX_LAT = 24.96, 25.21
+THRESHOLDS = (200.0, 500.0, 1000.0, 2000.0)
+# Synthetic routes: this many ~25 m steps (about 5 km) with a slowly
+# drifting heading, like a street route
+ROUTE_VERTICES = 200
+ROUTE_STEP_DEG = 0.00025
+ROUTE_TURN_SIGMA = 0.3  # radians per step
+
+
+def synthetic_route(rng: random.Random) -> List[List[float]]:
+    lon, lat = rng.uniform(MIN_LON, MAX_LON), rng.uniform(MIN_LAT, MAX_LAT)
+    heading = rng.uniform(0, 2 * math.pi)
+    coords = [[lon, lat]]
+    for _ in range(ROUTE_VERTICES - 1):
+        heading += rng.gauss(0, ROUTE_TURN_SIGMA)
+        lon += math.cos(heading) * ROUTE_STEP_DEG
+        lat += math.sin(heading) * ROUTE_STEP_DEG
+        coords.append([lon, lat])
+    return coords
+
+
+def synthetic_favorites(count: int, rng: random.Random) -> List[SimpleNamespace]:
+    """Place favorites (one point) and route favorites (a ~5 km LineString)."""
+    favorites = []
+    for i in range(count):
+        lat, lon = rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LON, MAX_LON)
+        favorite = SimpleNamespace(
+            id=i + 1, name=f"favorite {i}", type="place", lat=lat, lon=lon,
+            route_start_coords=None, route_end_coords=None, route_feature_collection=None,
+            distance_threshold=rng.choice(THRESHOLDS),
+        )
+        if i % 4 == 3:
+            coords = synthetic_route(rng)
+            favorite.type = "route"
+            favorite.route_start_coords = {"lon": coords[0][0], "lat": coords[0][1]}
+            favorite.route_end_coords = {"lon": coords[-1][0], "lat": coords[-1][1]}
+            favorite.route_feature_collection = {
+                "type": "FeatureCollection",
+                "features": [{"type": "Feature", "geometry": {"type": "LineString", "coordinates": coords}}],
+            }
+        favorites.append(favorite)
+    return favorites
+
+
+def synthetic_snapshot(count: int, rng: random.Random):
+    from app.services.construction_index import ActiveConstruction, build_snapshot
+
+    constructions = [
+        ActiveConstruction(i + 1, rng.uniform(MIN_LON, MAX_LON), rng.uniform(MIN_LAT, MAX_LAT), f"notice {i}", None)
+        for i in range(count)
+    ]
+    return build_snapshot(1, date.today(), constructions)
+
+
+def scalar_nearby(favorites, snapshot) -> int:
+    """
+    The original triple loop: every favorite point against every construction.
+    Routes only contribute their start and end points, so this finds fewer matches.
+    """
+    from app.services.favorite_matches import get_favorite_coordinates
+    from app.services.spatial_index import haversine_meters
+
+    pairs = 0
+    for favorite in favorites:
+        threshold = favorite.distance_threshold
+        for construction in snapshot.constructions:
+            if any(
+                haversine_meters(lat, lon, construction.lat, construction.lon) <= threshold
+                for lat, lon in get_favorite_coordinates(favorite)
+            ):
+                pairs += 1
+    return pairs
+
+
+def timed(label: str, func, favorites, snapshot, rounds: int) -> int:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        pairs = func(favorites, snapshot)
+    elapsed = (time.perf_counter() - started) / rounds
+    checks = len(favorites) * len(snapshot)
+    print(f"{label:<26} {elapsed * 1000:9.1f} ms  {checks / elapsed / 1e6:8.2f} M favorite-construction pairs/s  ({pairs} matches)")
+    return pairs
+
+
+def bench(favorite_count: int, construction_count: int, rounds: int, scalar: bool) -> None:
+    from app.services import favorite_matches, favorite_shapes, proximity
+
+    rng = random.Random(42)
+    favorites = synthetic_favorites(favorite_count, rng)
+    snapshot = synthetic_snapshot(construction_count, rng)
+    print(f"{favorite_count} favorites x {construction_count} ongoing constructions, "
+          f"NumPy {'available' if proximity.np is not None else 'missing'}")
+
+    def kernel(favorites, snapshot) -> int:
+        return sum(len(v) for v in favorite_matches.nearby_by_favorite(favorites, snapshot).values())
+
+    def grid(favorites, snapshot) -> int:
+        saved = favorite_matches.np
+        favorite_matches.np = None
+        try:
+            return kernel(favorites, snapshot)
+        finally:
+            favorite_matches.np = saved
+
+    # Build the route polylines once, as the shape cache does across ticks
+    started = time.perf_counter()
+    favorite_shapes.polylines(favorites)
+    print(f"{'route polylines (cold)':<26} {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+    results = {}
+    if scalar:
+        timed("scalar loop (end points)", scalar_nearby, favorites, snapshot, 1)
+    results["grid"] = timed("grid index + scalar", grid, favorites, snapshot, rounds)
+    if proximity.np is not None:
+        results["kernel"] = timed("vectorized kernel", kernel, favorites, snapshot, rounds)
+    if len(set(results.values())) > 1:
+        raise SystemExit(f"match counts differ: {results}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark favorite/construction proximity checks on synthetic Taipei data"
+    )
+    parser.add_argument("--favorites", type=int, default=1000)
+    parser.add_argument("--constructions", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--skip-scalar", action="store_true", help="Skip the slow original loop")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # app.config requires DATABASE_URL; the benchmark never connects
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    bench(args.favorites, args.constructions, args.rounds, not args.skip_scalar)
+
+
+if __name__ == "__main__":
+    main()
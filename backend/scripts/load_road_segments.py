@@ -17,6 +17,7 @@ if str(_ROOT) not in sys.path:
     sys.path.insert(0, str(_ROOT))
 
 from app.config import settings
+from app.services import vector_tiles
 
 
 def normalize_osmid(value: Any) -> str | None:
@@ -177,6 +178,9 @@ def ingest(file_path: Path) -> int:
             connection.execute(insert_sql, row)
 
     engine.dispose()
+    # Drop cached road tiles; API processes also notice the new data through
+    # the road_segments fingerprint check
+    vector_tiles.invalidate_layer(vector_tiles.ROAD_LAYER)
     return len(rows)
 
 
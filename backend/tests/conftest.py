@@ -0,0 +1,4 @@
+import os
+
+# Settings are read at import time; the tests never need a real database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,124 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import brotli
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.services import construction_scraper
+
+# Several spool reads long, with multi-byte text straddling the chunk edges
+RECORDS = [
+    {
+        "AC_NO": f"11{i:06d}",
+        "SNO": i % 3,
+        "LAT": 25.03 + i * 1e-4,
+        "LON": "121.5" if i % 7 == 0 else 121.5 + i * 1e-4,
+        "PURP": "汰換自來水管線" * (1 + i % 4),
+        "AP_NAME": "臺北自來水事業處",
+        "CB_DA": "1141201",
+        "CE_DA": None,
+    }
+    for i in range(600)
+] + [
+    {"AC_NO": "missing", "LAT": None, "LON": 121.5},
+    {"AC_NO": "invalid", "LAT": "n/a", "LON": 121.5},
+    "not a record",
+]
+
+
+@pytest.fixture
+def upstream_server(monkeypatch):
+    """Serve RECORDS as the GetAppWork response; call the fixture value to serve other records."""
+    served = {"records": RECORDS}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # noqa: A002 - keep the test quiet
+            pass
+
+        def do_GET(self):
+            payload = json.dumps(served["records"], ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(construction_scraper, "BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}/Tpdig")
+    yield lambda records: served.update(records=records)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_streamed_variants_match_converted_payload(upstream_server, tmp_path):
+    file_path = str(tmp_path / "construction.geojson")
+    result = construction_scraper.stream_construction_update(file_path, "key", None)
+
+    geojson = {
+        "type": "FeatureCollection",
+        "features": list(construction_scraper.iter_geojson_features(r for r in RECORDS if isinstance(r, dict))),
+    }
+    expected = json.dumps(geojson, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    paths = construction_scraper.variant_paths(file_path)
+
+    assert result == {"skipped": False, "feature_count": 600, "digest": result["digest"]}
+    with open(paths["identity"], "rb") as f:
+        assert f.read() == expected
+    with open(paths["gzip"], "rb") as f:
+        assert gzip.decompress(f.read()) == expected
+    with open(paths["br"], "rb") as f:
+        assert brotli.decompress(f.read()) == expected
+    with open(file_path, "rb") as f:
+        assert json.load(f) == geojson
+
+    # The snapshot serves the streamed variants as they are
+    snapshot = construction_scraper.get_construction_snapshot(file_path)
+    assert snapshot.body == expected
+    with open(paths["br"], "rb") as f:
+        assert snapshot.encodings["br"] == f.read()
+
+
+@pytest.fixture
+def change_feed(tmp_path, monkeypatch):
+    """A change feed database shared by every "worker" in the test."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'changes.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(construction_scraper, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(construction_scraper, "_snapshots", {})
+    yield
+    engine.dispose()
+
+
+def test_change_feed_is_shared_through_the_database(upstream_server, change_feed, tmp_path, monkeypatch):
+    file_path = str(tmp_path / "construction.geojson")
+    construction_scraper.stream_construction_update(file_path, "key", None)
+    previous = construction_scraper.get_construction_snapshot(file_path)
+    assert previous.generation == 0
+
+    records = [dict(r) for r in RECORDS[1:600]]
+    records[0]["PURP"] = "人行道改善"
+    records.append({"AC_NO": "new", "SNO": 0, "LAT": 25.05, "LON": 121.55})
+    upstream_server(records)
+    construction_scraper.stream_construction_update(file_path, "key", previous)
+
+    # Another worker, with nothing in memory, serves the same generation and delta
+    monkeypatch.setattr(construction_scraper, "_snapshots", {})
+    snapshot = construction_scraper.get_construction_snapshot(file_path)
+    assert snapshot.generation == construction_scraper.current_generation() == 1
+
+    changes = construction_scraper.get_construction_changes(0)
+    assert changes["generation"] == 1 and not changes["resync"]
+    assert [construction_scraper.feature_key(f) for f in changes["added"]] == ["new:0"]
+    assert [construction_scraper.feature_key(f) for f in changes["changed"]] == [
+        construction_scraper.feature_key(f) for f in construction_scraper.iter_geojson_features(records[:1])
+    ]
+    assert changes["removed"] == [
+        construction_scraper.feature_key(f) for f in construction_scraper.iter_geojson_features(RECORDS[:1])
+    ]
+    assert construction_scraper.get_construction_changes(1)["added"] == []
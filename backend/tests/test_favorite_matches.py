@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services import construction_index, favorite_matches
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'matches.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    today = date.today()
+    session.add(models.User(id=1, name="u"))
+    for i in range(20):
+        session.add(models.ConstructionNotice(
+            id=i + 1, name=f"notice {i}", start_date=today, end_date=today,
+            geometry={"type": "Point", "coordinates": [121.5 + i * 1e-3, 25.03]},
+        ))
+    session.add(models.Favorite(id=1, user_id=1, type="place", name="home", lat=25.03, lon=121.505,
+                                distance_threshold=500.0))
+    session.commit()
+    construction_index.invalidate()
+    yield session
+    session.close()
+    construction_index.invalidate()
+
+
+def matches(db):
+    return {(m.favorite_id, m.notice_id): m.distance_m for m in db.query(models.FavoriteConstructionMatch)}
+
+
+def test_new_process_resumes_from_persisted_points(db, monkeypatch):
+    favorite_matches.sync(db)
+    synced = matches(db)
+    assert synced
+
+    # A freshly started worker: no in-process state, and a new snapshot version
+    monkeypatch.setattr(favorite_matches, "_state", favorite_matches._MatchSync())
+    construction_index.invalidate()
+    evaluated = []
+    match_constructions = favorite_matches._match_constructions
+    monkeypatch.setattr(favorite_matches, "_match_constructions",
+                        lambda session, constructions: evaluated.extend(constructions)
+                        or match_constructions(session, constructions))
+    favorite_matches.sync(db)
+    assert evaluated == []
+    assert matches(db) == synced
+
+    # Only the moved construction is re-evaluated
+    notice = db.get(models.ConstructionNotice, 20)
+    notice.geometry = {"type": "Point", "coordinates": [121.505, 25.031]}
+    db.commit()
+    construction_index.invalidate()
+    favorite_matches.sync(db)
+    assert [c.id for c in evaluated] == [20]
+    assert (1, 20) in matches(db)
+
+
+def test_polylines_use_their_own_threshold(db):
+    # A road along latitude 25.02: notice 21 is ~10 m from it, notice 22 ~100 m
+    today = date.today()
+    db.add(models.RoadSegment(id=1, osmid="100", geometry={
+        "type": "LineString", "coordinates": [[121.50, 25.02], [121.51, 25.02]],
+    }))
+    for notice_id, lat in ((21, 25.02009), (22, 25.0209)):
+        db.add(models.ConstructionNotice(id=notice_id, name=f"notice {notice_id}", start_date=today, end_date=today,
+                                         geometry={"type": "Point", "coordinates": [121.505, lat]}))
+    # The point radius is large, but it must not widen the whole road
+    db.add(models.Favorite(id=2, user_id=1, type="road", name="road", road_osmids=["100"],
+                           distance_threshold=1000.0, road_distance_threshold=None))
+    db.commit()
+    construction_index.invalidate()
+    favorite_matches.refresh_favorite(db, 2)
+
+    assert {notice_id for favorite_id, notice_id in matches(db) if favorite_id == 2} == {21}
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.services import notice_contruction
+
+
+def test_full_scan_watermark_survives_new_sessions(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(notice_contruction, "scrape_construction_notices", lambda *args, **kwargs: [])
+
+    with Session() as session:
+        assert notice_contruction.full_scan_due(session)
+        result = notice_contruction.update_construction_notices(session, clear_existing=False, incremental=True)
+        assert result["mode"] == "full"
+
+    # A restarted process (or another worker) sees the same watermark
+    with Session() as session:
+        assert not notice_contruction.full_scan_due(session)
+        result = notice_contruction.update_construction_notices(session, clear_existing=False, incremental=True)
+        assert result["mode"] == "incremental"
+        later = datetime.now(timezone.utc) + timedelta(hours=notice_contruction.settings.NOTICE_FULL_SCAN_INTERVAL_HOURS)
+        assert notice_contruction.full_scan_due(session, now=later)
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+
+from app.services import notice_contruction
+from app.services.notice_page import parse_notice_page
+from scripts.bench_notice_scraper import ReplayServer, legacy_form_state, legacy_parse_notice_rows
+
+PAGES_DIR = Path(__file__).parent / "fixtures" / "notice_pages"
+# Small per-postback delay so concurrent pages complete out of order
+LATENCY = 0.02
+
+
+@pytest.fixture
+def replay_server(monkeypatch):
+    """Serve the fixture pages locally and point the scraper at them."""
+    servers = []
+
+    def start(strict: bool = False) -> ReplayServer:
+        server = ReplayServer(PAGES_DIR, LATENCY, strict)
+        servers.append(server)
+        monkeypatch.setattr(notice_contruction, "BASE_URL", server.url)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+@pytest.mark.parametrize("page", sorted(p.name for p in PAGES_DIR.glob("*.html")))
+def test_extractor_matches_beautifulsoup(page):
+    html = (PAGES_DIR / page).read_text(encoding="utf-8")
+    parsed = parse_notice_page(html)
+
+    assert repr(notice_contruction.parse_notice_rows(parsed)) == repr(legacy_parse_notice_rows(html))
+    assert parsed.form_state == legacy_form_state(html)
+    assert parsed.form_state["__VIEWSTATE"]
+
+
+def scrape(concurrency: int):
+    return notice_contruction.scrape_construction_notices(None, max_pages=None, concurrency=concurrency)
+
+
+def test_concurrent_scrape_matches_sequential(replay_server):
+    server = replay_server()
+    sequential = scrape(1)
+    concurrent = scrape(4)
+
+    assert concurrent == sequential
+    assert server.rejected == 0
+    assert len(sequential) == 21
+    assert [n["caseid"] for n in sequential[:2]] == ["11200005", "11200006"]
+    unlinked = next(n for n in sequential if n["name"] == "人行道改善工程")
+    assert unlinked["url"] is None and unlinked["caseid"] is None
+
+
+def test_rejected_form_state_falls_back_to_sequential(replay_server):
+    server = replay_server(strict=True)
+    concurrent = scrape(4)
+
+    assert server.rejected > 0
+    assert concurrent == scrape(1)